@@ -1,19 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app.core.database import get_db
-from app.schemas.poll_schema import PollCreate, PollOut, VoteCreate, LikeToggle
-from app.services.poll_service import PollService
-from app.core.websocket_manager import ws_manager
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from collections import Counter
+import time
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Tuple
+from app.core.config import settings
+from app.core.database import DbRunner, get_db_runner
+from app.schemas.poll_schema import BulkVoteItem, PollCreate, PollOut, PollPage, VoteCreate, LikeToggle
+from app.utils.ndjson import PayloadTooLarge, iter_limited, iter_ndjson_lines
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.serialization import FastJSONResponse, loads
+from app.services.async_poll_service import AsyncPollService
+from app.services.export_service import EXPORT_MEDIA_TYPES, stream_export, stream_export_async
+from app.core.idempotency import idempotency
+from app.core.trending import trending
+from app.core.websocket_manager import ACTIVITY_TOPIC, COUNTERS_TOPIC, NEW_POLLS_TOPIC, poll_topic, ws_manager
 
 router = APIRouter(prefix="/polls", tags=["Polls"])
 
-def get_service(db: Session = Depends(get_db)) -> PollService:
-    return PollService(db)
+def get_service(run: DbRunner = Depends(get_db_runner)) -> AsyncPollService:
+    return AsyncPollService(run)
 
-@router.post("/create_poll")
-async def create_poll(payload: PollCreate, service: PollService = Depends(get_service)):
-    poll = service.create_poll(
+def publish_activity(poll_id: int, votes: int = 0, likes: int = 0):
+    """Report votes/likes to every worker's trending board."""
+    payload = {"poll_id": poll_id, "votes": votes, "likes": likes, "at": time.time()}
+    ws_manager.publish({"type": "poll_activity", "payload": payload}, topic=ACTIVITY_TOPIC)
+
+@router.post("/create_poll", response_model=PollOut)
+async def create_poll(request: Request, payload: PollCreate, service: AsyncPollService = Depends(get_service)):
+    return await idempotency.run(request, payload.created_by, service.run, lambda: _create_poll(payload, service))
+
+async def _create_poll(payload: PollCreate, service: AsyncPollService):
+    poll = await service.create_poll(
         question=payload.question,
         options=[o.text for o in payload.options],
         created_by=payload.created_by
@@ -21,62 +39,108 @@ async def create_poll(payload: PollCreate, service: PollService = Depends(get_se
     if isinstance(poll, dict) and "error" in poll:
         raise HTTPException(status_code=400, detail=poll["error"])
 
-    # Serialize options for WS
-    options_data = [
-        {"id": option.id, "text": option.text, "votes_count": option.votes_count}
-        for option in poll.options
-    ]
-
     # prepare broadcast message
-    data = {
-        "type": "poll_created",
-        "payload": {
-            "id": poll.id,
-            "question": poll.question,
-            "created_by": poll.created_by,
-            "options": options_data,
-            "likes_count": len(poll.likes or [])
-        }
-    }
-    await ws_manager.broadcast(data)
-
-    # HTTP response
-    return PollOut(
-        id=poll.id,
-        question=poll.question,
-        created_by=poll.created_by,
-        options=options_data,
-        likes_count=len(poll.likes or [])
-    )
+    data = {"type": "poll_created", "payload": poll}
+    ws_manager.publish(data, topic=NEW_POLLS_TOPIC)
+
+    # HTTP response: the snapshot already has PollOut's shape
+    return FastJSONResponse(poll)
+
+
+
+@router.get("/list_polls", response_model=PollPage)
+async def list_polls(
+    after_id: Optional[str] = Query(None, description="Opaque cursor returned as next_cursor"),
+    limit: int = Query(20, ge=1, le=100),
+    service: AsyncPollService = Depends(get_service),
+):
+    try:
+        last_id = decode_cursor(after_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
+    # fetch one extra row to know whether another page exists
+    result = await service.list_polls(after_id=last_id, limit=limit + 1)
+    if isinstance(result, dict) and "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])  # ✅ FIXED
+
+    has_more = len(result) > limit
+    polls = result[:limit]
+
+    next_cursor = encode_cursor(polls[-1]["id"]) if has_more else None
+    return FastJSONResponse({"items": polls, "next_cursor": next_cursor})
 
 
-@router.get("/list_polls", response_model=List[PollOut])
-def list_polls(service: PollService = Depends(get_service)):
-    polls = service.list_polls()
+@router.get("/search", response_model=PollPage)
+async def search_polls(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find in questions and options"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor returned as next_cursor"),
+    limit: int = Query(20, ge=1, le=100),
+    service: AsyncPollService = Depends(get_service),
+):
+    """Polls matching every word of `q` (the last one as a prefix), best match first."""
+    try:
+        offset = decode_cursor(cursor, prefix="s") or 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if offset >= settings.SEARCH_MAX_RESULTS:
+        raise HTTPException(status_code=400, detail="Refine the search to see more results")
+
+    limit = min(limit, settings.SEARCH_MAX_RESULTS - offset)
+    result = await service.search_polls(q, offset=offset, limit=limit + 1)
+    if isinstance(result, dict) and "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+
+    has_more = len(result) > limit and offset + limit < settings.SEARCH_MAX_RESULTS
+    polls = result[:limit]
+    next_cursor = encode_cursor(offset + limit, prefix="s") if has_more else None
+    return FastJSONResponse({"items": polls, "next_cursor": next_cursor})
+
+
+@router.get("/trending", response_model=dict)
+async def trending_polls(
+    limit: int = Query(20, ge=1, le=settings.TRENDING_SIZE),
+    service: AsyncPollService = Depends(get_service),
+):
+    """The most active polls right now, best first; votes and likes count less by half every TRENDING_HALF_LIFE_S."""
+    if not trending.enabled:
+        raise HTTPException(status_code=404, detail="Trending polls are disabled")
+    polls = await service.trending_polls(limit=limit)
     if isinstance(polls, dict) and "error" in polls:
-        raise HTTPException(status_code=400, detail=polls["error"])  # ✅ FIXED
-
-    out = []
-    for p in polls:
-        likes_count = len(p.likes or [])
-        options_out = [
-            {"id": option.id, "text": option.text, "votes_count": option.votes_count}
-            for option in p.options
-        ]
-        out.append(PollOut(
-            id=p.id,
-            question=p.question,
-            created_by=p.created_by,
-            options=options_out,
-            likes_count=likes_count
-        ))
-    return out
+        raise HTTPException(status_code=400, detail=polls["error"])
+    return FastJSONResponse({"items": polls})
+
+
+@router.get("/export/{resource}")
+async def export(
+    resource: Literal["polls", "options", "votes"],
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    poll_id: Optional[int] = Query(None, description="Only rows for this poll"),
+):
+    """
+    Stream polls, option tallies or raw votes as NDJSON or CSV. Rows are read in
+    EXPORT_BATCH_SIZE batches from a server-side cursor and written as they arrive,
+    so memory stays flat however large the table is. Off (404) unless EXPORT_ENABLED.
+    """
+    if not settings.EXPORT_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if settings.DATABASE_ASYNC:
+        body = stream_export_async(resource, fmt, poll_id)
+    else:
+        body = stream_export(resource, fmt, poll_id)
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{resource}.{fmt}"'},
+    )
 
 
 @router.post("/{poll_id}/vote", response_model=dict)
-async def vote_on_poll(poll_id: int, payload: VoteCreate, service: PollService = Depends(get_service)):
-    result = service.vote(poll_id=poll_id, option_id=payload.option_id, voter=payload.voter)
+async def vote_on_poll(request: Request, poll_id: int, payload: VoteCreate, service: AsyncPollService = Depends(get_service)):
+    return await idempotency.run(request, payload.voter, service.run, lambda: _vote_on_poll(poll_id, payload, service))
+
+async def _vote_on_poll(poll_id: int, payload: VoteCreate, service: AsyncPollService):
+    result = await service.vote(poll_id=poll_id, option_id=payload.option_id, voter=payload.voter)
     
     if isinstance(result, dict) and "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
@@ -98,7 +162,7 @@ async def vote_on_poll(poll_id: int, payload: VoteCreate, service: PollService =
                 "votes_count": old_option.votes_count
             }
         }
-        await ws_manager.broadcast(data_old)
+        ws_manager.publish(data_old, topic=poll_topic(poll_id))
 
     # Broadcast new option
     data_new = {
@@ -109,7 +173,15 @@ async def vote_on_poll(poll_id: int, payload: VoteCreate, service: PollService =
             "votes_count": new_option.votes_count
         }
     }
-    await ws_manager.broadcast(data_new)
+    ws_manager.publish(data_new, topic=poll_topic(poll_id))
+    publish_activity(poll_id, votes=1)
+
+    if result.get("promoted_shards"):
+        # let the other workers write this poll's votes to its counter slots too
+        ws_manager.publish(
+            {"type": "counters_sharded", "payload": {"poll_id": poll_id, "shards": result["promoted_shards"]}},
+            topic=COUNTERS_TOPIC,
+        )
 
     # Return response with both options if applicable
     return {
@@ -123,12 +195,148 @@ async def vote_on_poll(poll_id: int, payload: VoteCreate, service: PollService =
 
 
 
+async def _bulk_payload(request: Request) -> AsyncIterator[Any]:
+    """
+    Raw vote objects from a JSON array / {"votes": [...]} body or an NDJSON stream.
+    Bodies over BULK_VOTE_MAX_BODY_BYTES and NDJSON lines over BULK_VOTE_MAX_LINE_BYTES
+    raise PayloadTooLarge while they are read, so neither is ever buffered whole.
+    """
+    max_bytes = settings.BULK_VOTE_MAX_BODY_BYTES
+    if int(request.headers.get("content-length") or 0) > max_bytes:
+        raise PayloadTooLarge(f"Body is larger than {max_bytes} bytes")
+    chunks = iter_limited(request.stream(), max_bytes)
+    if "ndjson" in request.headers.get("content-type", ""):
+        async for line in iter_ndjson_lines(chunks, settings.BULK_VOTE_MAX_LINE_BYTES):
+            try:
+                yield loads(line)
+            except ValueError:
+                yield None
+        return
+    raw_body = bytearray()
+    async for chunk in chunks:
+        raw_body += chunk
+    try:
+        body = loads(bytes(raw_body))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array of votes")
+    if isinstance(body, dict):
+        body = body.get("votes")
+    if not isinstance(body, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array of votes")
+    if len(body) > settings.BULK_VOTE_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {settings.BULK_VOTE_MAX_ITEMS} votes per request")
+    for raw in body:
+        yield raw
+
+
+@router.post("/bulk_vote", response_model=dict)
+async def bulk_vote(request: Request, service: AsyncPollService = Depends(get_service)):
+    """
+    Record many votes in one request. Accepts a JSON array of {poll_id, option_id, voter}
+    objects, or an application/x-ndjson stream with one object per line that is applied
+    in chunks as it arrives. Each chunk is its own transaction; results are reported per
+    item, and every option whose count changed gets a single WebSocket update at the end.
+    A body over BULK_VOTE_MAX_BODY_BYTES, or an NDJSON line over BULK_VOTE_MAX_LINE_BYTES,
+    gets a 413.
+    """
+    results: List[Dict[str, Any]] = []
+    touched: Dict[int, Tuple[int, int]] = {}
+    votes_per_poll: Counter = Counter()
+    chunk: List[Tuple[int, Tuple[int, int, str]]] = []
+    truncated = False
+
+    async def apply_chunk():
+        outcome = await service.bulk_vote([item for _, item in chunk])
+        if "error" in outcome:
+            statuses = ["failed"] * len(chunk)
+        else:
+            statuses = outcome["statuses"]
+            touched.update(outcome["counts"])
+        for (index, (poll_id, _, _)), status in zip(chunk, statuses):
+            results[index]["status"] = status
+            if status in ("recorded", "moved"):
+                votes_per_poll[poll_id] += 1
+        chunk.clear()
+
+    index = 0
+    too_large = None
+    try:
+        async for raw in _bulk_payload(request):
+            if index >= settings.BULK_VOTE_MAX_ITEMS:
+                truncated = True
+                break
+            try:
+                vote = BulkVoteItem.model_validate(raw)
+            except ValidationError:
+                results.append({"index": index, "status": "invalid"})
+            else:
+                results.append({"index": index, "status": "pending"})
+                chunk.append((index, (vote.poll_id, vote.option_id, vote.voter)))
+                if len(chunk) >= settings.BULK_VOTE_CHUNK_SIZE:
+                    await apply_chunk()
+            index += 1
+    except PayloadTooLarge as exc:
+        too_large = exc
+        chunk.clear()  # the rest of a rejected body is never applied
+    if chunk:
+        await apply_chunk()
+
+    # one update per option with its final count, however many votes moved it
+    for option_id, (poll_id, votes_count) in touched.items():
+        data = {"type": "vote", "payload": {"poll_id": poll_id, "option_id": option_id, "votes_count": votes_count}}
+        ws_manager.publish(data, topic=poll_topic(poll_id))
+    for poll_id, votes in votes_per_poll.items():
+        publish_activity(poll_id, votes=votes)
+    if too_large is not None:
+        applied = sum(votes_per_poll.values())
+        detail = f"{too_large}" + (f"; {applied} earlier votes were already applied" if applied else "")
+        raise HTTPException(status_code=413, detail=detail)
+
+    return {
+        "message": "Bulk votes processed",
+        "summary": dict(Counter(result["status"] for result in results)),
+        "results": results,
+        **({"truncated": True} if truncated else {}),
+    }
+
+
+@router.get("/{poll_id}/history", response_model=dict)
+async def vote_history(
+    poll_id: int,
+    bucket: Literal["minute", "hour"] = Query("minute"),
+    since: Optional[int] = Query(None, description="Unix time of the first bucket; defaults to 6h (minute) or 7d (hour) ago"),
+    service: AsyncPollService = Depends(get_service),
+):
+    history = await service.vote_history(poll_id, bucket=bucket, since=since)
+    if isinstance(history, dict) and "error" in history:
+        raise HTTPException(status_code=400, detail=history["error"])
+    if history is None:
+        raise HTTPException(status_code=404, detail="Poll not found")
+    return FastJSONResponse(history)
+
+
 @router.post("/{poll_id}/like", response_model=dict)
-async def toggle_like(poll_id: int, payload: LikeToggle, service: PollService = Depends(get_service)):
-    count = service.toggle_like(poll_id=poll_id, user_identifier=payload.user_identifier)
-    if isinstance(count, dict) and "error" in count:
-        raise HTTPException(status_code=400, detail=count["error"])  # ✅ FIXED
+async def toggle_like(request: Request, poll_id: int, payload: LikeToggle, service: AsyncPollService = Depends(get_service)):
+    return await idempotency.run(request, payload.user_identifier, service.run, lambda: _toggle_like(poll_id, payload, service))
+
+async def _toggle_like(poll_id: int, payload: LikeToggle, service: AsyncPollService):
+    result = await service.toggle_like(poll_id=poll_id, user_identifier=payload.user_identifier)
+    if isinstance(result, dict) and "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])  # ✅ FIXED
+    count, liked = result
 
     data = {"type": "like", "payload": {"poll_id": poll_id, "likes_count": count}}
-    await ws_manager.broadcast(data)
-    return {"message": "Like toggled", "likes_count": count}
+    ws_manager.publish(data, topic=poll_topic(poll_id))
+    if liked:
+        publish_activity(poll_id, likes=1)
+    return {"message": "Like toggled", "likes_count": count, "liked": liked}
+
+
+@router.get("/{poll_id}", response_model=PollOut)
+async def get_poll(poll_id: int, service: AsyncPollService = Depends(get_service)):
+    poll = await service.get_poll(poll_id)
+    if isinstance(poll, dict) and "error" in poll:
+        raise HTTPException(status_code=400, detail=poll["error"])
+    if poll is None:
+        raise HTTPException(status_code=404, detail="Poll not found")
+    return FastJSONResponse(poll)
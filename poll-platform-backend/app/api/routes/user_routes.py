@@ -1,16 +1,18 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.models.user import User
 from app.schemas.user_schema import UserCreate
-from app.core.database import get_db
-from app.services.user_service import UserService  # service class containing create_user
+from app.core.database import DbRunner, get_db_runner
+from app.core.websocket_manager import USERS_TOPIC, ws_manager
+from app.services.async_user_service import AsyncUserService  # service class containing create_user
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
-def get_user_service(db: Session = Depends(get_db)) -> UserService:
-    return UserService(db)
+def get_user_service(run: DbRunner = Depends(get_db_runner)) -> AsyncUserService:
+    return AsyncUserService(run)
 
 @router.post("/create_user")
-async def create_user(payload: UserCreate, service: UserService = Depends(get_user_service)):
-    data = service.create_user(email=payload.email, name=payload.name)
-    return data
\ No newline at end of file
+async def create_user(payload: UserCreate, service: AsyncUserService = Depends(get_user_service)):
+    data = await service.create_user(email=payload.email, name=payload.name)
+    if data.get("status") == "success":
+        # lets other workers' user-existence caches learn about the new user
+        ws_manager.publish({"type": "user_created", "payload": {"email": data["email"]}}, topic=USERS_TOPIC)
+    return data
@@ -1,4 +1,5 @@
 # app/core/config.py
+from typing import Optional
 from pydantic import BaseModel
 
 class Settings(BaseModel):
@@ -6,6 +7,119 @@ class Settings(BaseModel):
     DATABASE_URL: str = "sqlite:///./polls.db"
     DEBUG: bool = True
 
+    # Serve requests through the async engine (aiosqlite/asyncpg) instead of a threadpool
+    DATABASE_ASYNC: bool = False
+    ASYNC_DATABASE_URL: Optional[str] = None  # derived from DATABASE_URL when unset
+
+    # Storage profile: "tuned" (WAL + pragmas below) or "default" (SQLite/driver defaults)
+    STORAGE_PROFILE: str = "tuned"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024
+    # Connection pool for server databases (PostgreSQL/MySQL)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_RECYCLE_S: int = 1800
+    # Create missing tables and apply pending migrations when a worker starts. Turn off when
+    # `python -m app.manage migrate` runs once per deploy, so workers boot without the schema round trips
+    DATABASE_INIT_SCHEMA: bool = True
+
+    # Read-through cache of poll snapshots, one per worker. Other workers' writes only reach it as relayed
+    # events, so with WORKERS > 1 it stays off unless WS_PUBSUB_BACKEND relays between processes
+    POLL_CACHE_ENABLED: bool = True
+    POLL_CACHE_MAX_ENTRIES: int = 10000
+    POLL_CACHE_TTL_S: float = 300.0
+
+    # User-existence cache consulted before every vote/like/poll creation
+    USER_CACHE_MAX_ENTRIES: int = 100000
+    USER_CACHE_TTL_S: float = 600.0
+    USER_CACHE_NEGATIVE_TTL_S: float = 5.0
+    USER_BLOOM_FILTER_ENABLED: bool = False  # load every email into a Bloom filter at startup (not with the memory pub/sub)
+    USER_BLOOM_CAPACITY: int = 1_000_000
+    USER_BLOOM_ERROR_RATE: float = 0.01
+
+    # Sharded counters for viral polls: once a poll takes COUNTER_SHARD_PROMOTE_VOTES_PER_S votes
+    # (averaged over COUNTER_SHARD_WINDOW_S) its option counts are spread over COUNTER_SHARDS rows
+    COUNTER_SHARDS_ENABLED: bool = False
+    COUNTER_SHARDS: int = 16
+    COUNTER_SHARD_PROMOTE_VOTES_PER_S: float = 50.0
+    COUNTER_SHARD_WINDOW_S: float = 10.0
+
+    # Poll search: "fts5" (SQLite FTS5 table), "memory" (in-process inverted index) or
+    # "auto" (FTS5 when the database has it, memory otherwise)
+    SEARCH_BACKEND: str = "auto"
+    SEARCH_MAX_RESULTS: int = 1000  # deepest result a search page can reach
+    SEARCH_CANDIDATES: int = 1000  # only the newest matches are ranked, so common words stay fast
+
+    # Trending polls (GET /polls/trending, "polls:trending" WebSocket topic): the TRENDING_SIZE polls
+    # with the most activity, each vote or like weighing less by half every TRENDING_HALF_LIFE_S.
+    # Ranked per worker from relayed activity, so with WORKERS > 1 it needs a cross-process WS_PUBSUB_BACKEND
+    TRENDING_ENABLED: bool = True
+    TRENDING_SIZE: int = 50
+    TRENDING_HALF_LIFE_S: float = 3600.0
+    TRENDING_VOTE_WEIGHT: float = 1.0
+    TRENDING_LIKE_WEIGHT: float = 2.0
+
+    # Per-option vote counts rolled up by minute and hour for trend charts
+    VOTE_HISTORY_ENABLED: bool = True
+
+    # Buffered tally mode: votes are aggregated in memory and flushed in batches
+    VOTE_BUFFER_ENABLED: bool = False
+    VOTE_BUFFER_FLUSH_MS: int = 250
+    VOTE_BUFFER_MAX_VOTES: int = 500
+
+    # Idempotency-Key on create_poll, vote and like: the first response is stored for IDEMPOTENCY_TTL_S
+    # and replayed to retries with the same key and user
+    IDEMPOTENCY_ENABLED: bool = True
+    IDEMPOTENCY_TTL_S: float = 24 * 3600.0
+    IDEMPOTENCY_MAX_ENTRIES: int = 100000   # responses kept in memory per worker
+    IDEMPOTENCY_LOCK_TIMEOUT_S: float = 30.0  # an unfinished claim older than this is taken over
+
+    # Bulk vote ingestion (POST /polls/bulk_vote)
+    BULK_VOTE_CHUNK_SIZE: int = 1000   # items applied per transaction
+    BULK_VOTE_MAX_ITEMS: int = 100000  # per request
+    BULK_VOTE_MAX_BODY_BYTES: int = 16 * 1024 * 1024  # larger bodies get 413
+    BULK_VOTE_MAX_LINE_BYTES: int = 4096  # one NDJSON line
+
+    # Streaming exports (GET /polls/export/...): rows fetched per server-side cursor batch
+    EXPORT_ENABLED: bool = False        # the routes are unauthenticated: they 404 unless enabled
+    EXPORT_VOTER_EMAILS: bool = False   # include each vote's voter email in the votes export
+    EXPORT_BATCH_SIZE: int = 5000
+
+    # Request/SQL/WebSocket metrics on /metrics (Prometheus text format)
+    METRICS_ENABLED: bool = True
+    METRICS_SLOW_REQUEST_MS: float = 500.0  # log slower requests with their SQL; 0 disables
+
+    # Budget checked by `python -m app.manage profile-startup`: time from a cold interpreter to a
+    # started app (imports, create_app, lifespan startup) and the resident memory at that point
+    STARTUP_TIME_BUDGET_MS: float = 2500.0
+    STARTUP_RSS_BUDGET_MB: float = 96.0
+
+    # WebSocket broadcast pipeline
+    WS_QUEUE_SIZE: int = 256               # outbound frames buffered per connection
+    WS_BROADCAST_TICK_MS: int = 50         # coalescing window; 0 flushes on every publish
+    WS_SLOW_CONSUMER_POLICY: str = "resync"  # "resync" or "drop" when a queue overflows
+
+    # WebSocket connection lifecycle
+    WS_MAX_CONNECTIONS: int = 50_000       # per process; further clients are closed with 1013, 0 = unlimited
+    WS_PING_INTERVAL_S: float = 20.0       # protocol-level ping interval (uvicorn --ws-ping-interval)
+    WS_PING_TIMEOUT_S: float = 20.0        # close connections whose pong is this late (uvicorn --ws-ping-timeout)
+    WS_IDLE_TIMEOUT_S: float = 0.0         # >0: also JSON-ping quiet sockets and close those silent this long
+    WS_INBOUND_RATE: float = 5.0           # client messages per second, sustained
+    WS_INBOUND_BURST: int = 20             # client messages allowed in a burst
+    WS_MAX_MESSAGE_BYTES: int = 16384      # UTF-8 encoded size of one client message
+    WS_MAX_POLLS_PER_MESSAGE: int = 1000   # poll ids per subscribe/resume; clients send more in batches
+    WS_REPLAY_BUFFER: int = 10_000         # recent sequenced frames kept for reconnecting clients; 0 disables
+
+    # Cross-process fan-out: "memory" (single process) or "socket" (local TCP hub)
+    WS_PUBSUB_BACKEND: str = "memory"
+    WORKERS: int = 1  # processes serving the app (uvicorn --workers); per-worker state needs "socket" above 1
+    WS_PUBSUB_HOST: str = "127.0.0.1"
+    WS_PUBSUB_PORT: int = 8765
+    WS_PUBSUB_MAX_FRAME_BYTES: int = 8 * 1024 * 1024  # larger events are delivered in their own worker only
+    WS_PUBSUB_OUTBOX: int = 10000  # events queued while the hub is unreachable, sent on reconnect
+
     class Config:
         env_file = ".env"
 
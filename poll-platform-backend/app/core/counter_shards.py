@@ -0,0 +1,82 @@
+# app/core/counter_shards.py
+import threading
+import time
+import zlib
+from typing import Dict, Mapping, Optional, Tuple
+
+from app.core.config import settings
+
+
+def counter_slot(voter: str, shards: int) -> int:
+    """Stable slot for a voter, so moving a vote decrements the slot it was counted in."""
+    return zlib.crc32(voter.encode()) % shards
+
+
+class HotCounterRegistry:
+    """
+    Which polls count votes in sharded slots, and the per-poll vote rates that decide
+    when a poll is promoted. Knowing a poll is sharded only changes which rows a vote
+    writes: a worker that has not heard of a promotion yet still counts correctly on
+    options.votes_count, it just contends on that row.
+    """
+
+    MAX_TRACKED = 10000
+
+    def __init__(
+        self,
+        shards: int = settings.COUNTER_SHARDS,
+        promote_votes_per_s: float = settings.COUNTER_SHARD_PROMOTE_VOTES_PER_S,
+        window_s: float = settings.COUNTER_SHARD_WINDOW_S,
+    ):
+        self.shards = shards
+        self.promote_votes_per_s = promote_votes_per_s
+        self.window_s = window_s
+        self._sharded: Dict[int, int] = {}
+        self._windows: Dict[int, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def shards_for(self, poll_id: int) -> int:
+        """Number of counter slots of a sharded poll, 0 for a regular one."""
+        return self._sharded.get(poll_id, 0)
+
+    def note_vote(self, poll_id: int) -> bool:
+        """Count a vote on an unsharded poll. True (once) when its rate crosses the promotion threshold."""
+        now = time.monotonic()
+        with self._lock:
+            if poll_id in self._sharded:
+                return False
+            started, count = self._windows.get(poll_id, (now, 0))
+            if now - started >= self.window_s:
+                started, count = now, 0
+            count += 1
+            if count >= self.promote_votes_per_s * self.window_s:
+                self._windows.pop(poll_id, None)
+                return True
+            self._windows[poll_id] = (started, count)
+            if len(self._windows) > self.MAX_TRACKED:
+                self._windows = {
+                    pid: window for pid, window in self._windows.items() if now - window[0] < self.window_s
+                }
+            return False
+
+    def mark_sharded(self, poll_id: int, shards: int):
+        with self._lock:
+            self._sharded[poll_id] = shards
+            self._windows.pop(poll_id, None)
+
+    def load(self, sharded: Mapping[int, int]):
+        with self._lock:
+            self._sharded.update(sharded)
+
+    def apply_event(self, topic: Optional[str], message: dict):
+        """Learn about promotions made by other workers."""
+        if message.get("type") == "counters_sharded":
+            payload = message["payload"]
+            self.mark_sharded(payload["poll_id"], payload["shards"])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"sharded_polls": len(self._sharded), "tracked_polls": len(self._windows)}
+
+
+hot_counters = HotCounterRegistry()
@@ -1,19 +1,108 @@
 
 # app/core/database.py
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from typing import Awaitable, Callable, Dict, TypeVar
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.core.migrations import run_migrations
 
 DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-)
+
+def sqlite_pragmas(profile: str) -> Dict[str, object]:
+    """Per-connection PRAGMAs for a storage profile."""
+    if profile == "default":
+        return {}
+    if profile == "tuned":
+        return {
+            "journal_mode": "WAL",          # readers no longer block the writer (and vice versa)
+            "synchronous": settings.SQLITE_SYNCHRONOUS,
+            "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+            "mmap_size": settings.SQLITE_MMAP_SIZE,
+            "cache_size": -settings.SQLITE_CACHE_SIZE_KB,  # negative means KiB
+            "temp_store": "MEMORY",
+        }
+    raise ValueError(f"Unknown STORAGE_PROFILE: {profile}")
+
+
+def engine_options(url: str, profile: str) -> dict:
+    if url.startswith("sqlite"):
+        # the connect-time busy timeout (seconds) has to agree with the PRAGMA
+        timeout = settings.SQLITE_BUSY_TIMEOUT_MS / 1000 if profile == "tuned" else 5.0
+        options = {"connect_args": {"check_same_thread": False, "timeout": timeout}}
+        if url.startswith("sqlite+aiosqlite"):
+            options["connect_args"].pop("check_same_thread")
+        return options
+    if profile == "default":
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE_S,
+        "pool_pre_ping": True,
+    }
+
+
+def install_pragmas(sync_engine, profile: str):
+    pragmas = sqlite_pragmas(profile) if sync_engine.dialect.name == "sqlite" else {}
+    if not pragmas:
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def build_engine(url: str, profile: str = settings.STORAGE_PROFILE):
+    new_engine = create_engine(url, **engine_options(url, profile))
+    install_pragmas(new_engine, profile)
+    if settings.METRICS_ENABLED:
+        instrument_engine(new_engine)
+    return new_engine
+
+
+engine = build_engine(DATABASE_URL)
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 
+T = TypeVar("T")
+# run(fn) executes fn(session) without blocking the event loop
+DbRunner = Callable[[Callable[[Session], T]], Awaitable[T]]
+
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+_async_session_factory = None
+
+
+def async_database_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return _ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def get_async_session_factory():
+    """Async engine and session factory, created on first use so the async driver stays optional."""
+    global _async_session_factory
+    if _async_session_factory is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        url = settings.ASYNC_DATABASE_URL or async_database_url(DATABASE_URL)
+        async_engine = create_async_engine(url, **engine_options(url, settings.STORAGE_PROFILE))
+        install_pragmas(async_engine.sync_engine, settings.STORAGE_PROFILE)
+        if settings.METRICS_ENABLED:
+            instrument_engine(async_engine.sync_engine)
+        _async_session_factory = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+    return _async_session_factory
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -21,5 +110,25 @@ def get_db():
     finally:
         db.close()
 
+
+async def get_db_runner():
+    """
+    Yields a runner that executes repository/service code for one request off the event
+    loop: on the async engine via AsyncSession.run_sync when DATABASE_ASYNC is set,
+    otherwise on a regular Session in the threadpool.
+    """
+    if settings.DATABASE_ASYNC:
+        async with get_async_session_factory()() as session:
+            yield session.run_sync
+    else:
+        db = SessionLocal()
+        try:
+            yield lambda fn: run_in_threadpool(fn, db)
+        finally:
+            db.close()
+
+
 def init_db():
+    """Create missing tables, then apply pending migrations to the tables that already existed."""
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
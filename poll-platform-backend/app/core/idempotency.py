@@ -0,0 +1,177 @@
+# app/core/idempotency.py
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response
+
+from app.core.config import settings
+from app.core.database import DbRunner
+from app.repositories.idempotency_repository import IdempotencyRepository, StoredResponse
+from app.utils.serialization import dumps_bytes
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+PURGE_INTERVAL_S = 600.0  # how often expired rows are deleted from the table
+
+Slot = Tuple[str, str]  # (user, key)
+
+
+class IdempotencyCache:
+    """
+    Replays the first response of a write request to every retry sent with the same
+    Idempotency-Key by the same user, within `ttl_s`.
+
+    Finished responses live in a bounded LRU, so a retry storm costs a dictionary lookup,
+    and in the idempotency_keys table, so they survive restarts and reach other workers.
+    A duplicate that arrives while the first request is still running waits for its
+    result (same worker) or gets 409 (another worker holds the claim). 5xx outcomes are
+    not stored: the retry runs the request again.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.IDEMPOTENCY_MAX_ENTRIES,
+        ttl_s: float = settings.IDEMPOTENCY_TTL_S,
+        lock_timeout_s: float = settings.IDEMPOTENCY_LOCK_TIMEOUT_S,
+    ):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.lock_timeout_s = lock_timeout_s
+        self.enabled = settings.IDEMPOTENCY_ENABLED
+        self._entries: "OrderedDict[Slot, Tuple[float, StoredResponse]]" = OrderedDict()
+        self._inflight: Dict[Slot, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self.executed = 0
+        self.replayed = 0
+        self.coalesced = 0
+        self.conflicts = 0
+
+    def lookup(self, slot: Slot) -> Optional[StoredResponse]:
+        with self._lock:
+            entry = self._entries.get(slot)
+            if entry is None:
+                return None
+            expires_at, stored = entry
+            if expires_at < time.monotonic():
+                del self._entries[slot]
+                return None
+            self._entries.move_to_end(slot)
+            return stored
+
+    def remember(self, slot: Slot, stored: StoredResponse):
+        with self._lock:
+            self._entries[slot] = (time.monotonic() + self.ttl_s, stored)
+            self._entries.move_to_end(slot)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def run(self, request: Request, user: str, run: DbRunner, handler: Callable[[], Awaitable[Any]]) -> Any:
+        """Run a write route's handler once per (Idempotency-Key, user); without the header just run it."""
+        key = request.headers.get(HEADER)
+        if not self.enabled or not key:
+            return await handler()
+        if len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"{HEADER} must be at most {MAX_KEY_LENGTH} characters")
+
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (request.method.encode(), request.url.path.encode(), await request.body()):
+            digest.update(part + b"\0")
+        fingerprint = digest.hexdigest()
+        slot = (user, key)
+
+        stored = self.lookup(slot)
+        if stored is not None:
+            self.replayed += 1
+            return self._response(stored, fingerprint, replayed=True)
+        pending = self._inflight.get(slot)
+        if pending is not None:
+            self.coalesced += 1
+            return self._response(await asyncio.shield(pending), fingerprint, replayed=True)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[slot] = future
+        try:
+            stored, replayed = await self._claim_and_run(slot, fingerprint, run, handler)
+            future.set_result(stored)
+            return self._response(stored, fingerprint, replayed=replayed)
+        except BaseException:
+            future.set_result((fingerprint, 500, dumps_bytes({"detail": "Internal Server Error"})))
+            raise
+        finally:
+            self._inflight.pop(slot, None)
+
+    async def _claim_and_run(
+        self, slot: Slot, fingerprint: str, run: DbRunner, handler: Callable[[], Awaitable[Any]]
+    ) -> Tuple[StoredResponse, bool]:
+        user, key = slot
+        now = int(time.time())
+        if now - self._last_purge >= PURGE_INTERVAL_S:
+            self._last_purge = now
+            await run(lambda db: IdempotencyRepository(db).purge_expired(int(now - self.ttl_s)))
+
+        claim = await run(lambda db: IdempotencyRepository(db).claim(
+            key, user, fingerprint, now, ttl_s=self.ttl_s, lock_timeout_s=self.lock_timeout_s
+        ))
+        if isinstance(claim, dict):
+            return (fingerprint, 503, dumps_bytes({"detail": claim["error"]})), False
+        if claim == "busy":
+            self.conflicts += 1
+            detail = f"A request with this {HEADER} is still being processed. Retry shortly."
+            return (fingerprint, 409, dumps_bytes({"detail": detail})), False
+        if claim != "claimed":
+            self.replayed += 1
+            self.remember(slot, claim)
+            return claim, True
+
+        self.executed += 1
+        try:
+            status_code, body = await self._execute(handler)
+        except BaseException:
+            await run(lambda db: IdempotencyRepository(db).release(key, user))
+            raise
+        stored = (fingerprint, status_code, body)
+        if status_code >= 500:
+            await run(lambda db: IdempotencyRepository(db).release(key, user))
+        elif await run(lambda db: IdempotencyRepository(db).complete(key, user, status_code, body)) is None:
+            self.remember(slot, stored)
+        return stored, False
+
+    @staticmethod
+    async def _execute(handler: Callable[[], Awaitable[Any]]) -> Tuple[int, bytes]:
+        """(status code, JSON body) of the handler's response or of the HTTPException it raised."""
+        try:
+            result = await handler()
+        except HTTPException as exc:
+            return exc.status_code, dumps_bytes({"detail": exc.detail})
+        if isinstance(result, Response):
+            return result.status_code, bytes(result.body)
+        return 200, dumps_bytes(result)
+
+    @staticmethod
+    def _response(stored: StoredResponse, fingerprint: str, replayed: bool) -> Response:
+        stored_fingerprint, status_code, body = stored
+        if stored_fingerprint != fingerprint:
+            body = dumps_bytes({"detail": f"This {HEADER} was already used for a different request"})
+            return Response(content=body, status_code=422, media_type="application/json")
+        headers = {"Idempotent-Replayed": "true"} if replayed else None
+        return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+        return {
+            "size": size,
+            "in_flight": len(self._inflight),
+            "executed": self.executed,
+            "replayed": self.replayed,
+            "coalesced": self.coalesced,
+            "conflicts": self.conflicts,
+        }
+
+
+idempotency = IdempotencyCache()
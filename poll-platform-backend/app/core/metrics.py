@@ -0,0 +1,179 @@
+# app/core/metrics.py
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.utils.logger import logger
+
+LATENCY_BUCKETS_S = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+# (statement, seconds) for every SQL statement run on behalf of the current request
+_request_queries: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_queries", default=None)
+
+# collector() -> [(name, type, help, value)] sampled when /metrics is scraped
+Collector = Callable[[], Iterable[Tuple[str, str, str, float]]]
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense, one per label set."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}" if pairs else ""
+
+
+class Metrics:
+    """
+    In-process metrics registry rendered in the Prometheus text format. Request and
+    broadcast observations happen on the event loop; gauges (WebSocket connections,
+    queue depths, cache stats) are sampled from registered collectors at scrape time.
+    With several workers each process reports its own numbers.
+    """
+
+    def __init__(self, slow_request_ms: float = settings.METRICS_SLOW_REQUEST_MS):
+        self.slow_request_ms = slow_request_ms
+        self.requests: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self.request_seconds: Dict[Tuple[str, str], Histogram] = {}
+        self.request_queries: Dict[Tuple[str, str], Histogram] = {}
+        self.request_sql_seconds: Dict[Tuple[str, str], Histogram] = {}
+        self.broadcast_seconds = Histogram(LATENCY_BUCKETS_S)
+        self._collectors: Dict[str, Collector] = {}
+
+    def add_collector(self, name: str, collector: Collector):
+        """Register (or replace) the collector known as `name`."""
+        self._collectors[name] = collector
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, queries: List[Tuple[str, float]]):
+        key = (method, route)
+        sql_seconds = sum(duration for _, duration in queries)
+        self.requests[(method, route, str(status))] += 1
+        self.request_seconds.setdefault(key, Histogram(LATENCY_BUCKETS_S)).observe(seconds)
+        self.request_queries.setdefault(key, Histogram(QUERY_COUNT_BUCKETS)).observe(len(queries))
+        self.request_sql_seconds.setdefault(key, Histogram(LATENCY_BUCKETS_S)).observe(sql_seconds)
+
+        if self.slow_request_ms and seconds * 1000 >= self.slow_request_ms:
+            listing = "\n".join(f"  {duration * 1000:8.2f} ms  {' '.join(statement.split())[:200]}" for statement, duration in queries)
+            logger.warning(
+                "Slow request %s %s -> %s: %.1f ms, %d queries (%.1f ms SQL)%s",
+                method, route, status, seconds * 1000, len(queries), sql_seconds * 1000,
+                "\n" + listing if listing else "",
+            )
+
+    def render(self) -> str:
+        lines: List[str] = []
+
+        def header(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def histogram(name: str, label_names: Sequence[str], series: Dict[tuple, Histogram]):
+            for label_values, hist in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(hist.buckets + (float("inf"),), hist.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    labels = _labels(tuple(label_names) + ("le",), tuple(label_values) + (le,))
+                    lines.append(f"{name}_bucket{labels} {cumulative}")
+                labels = _labels(label_names, label_values)
+                lines.append(f"{name}_sum{labels} {hist.sum}")
+                lines.append(f"{name}_count{labels} {hist.count}")
+
+        header("http_requests_total", "counter", "HTTP requests by route and status.")
+        for (method, route, status), count in sorted(self.requests.items()):
+            lines.append(f"http_requests_total{_labels(('method', 'route', 'status'), (method, route, status))} {count}")
+        header("http_request_duration_seconds", "histogram", "HTTP request latency by route.")
+        histogram("http_request_duration_seconds", ("method", "route"), self.request_seconds)
+        header("http_request_sql_queries", "histogram", "SQL statements executed per request.")
+        histogram("http_request_sql_queries", ("method", "route"), self.request_queries)
+        header("http_request_sql_seconds", "histogram", "Time spent in SQL per request.")
+        histogram("http_request_sql_seconds", ("method", "route"), self.request_sql_seconds)
+        header("ws_broadcast_flush_seconds", "histogram", "Time to encode and enqueue one broadcast tick.")
+        histogram("ws_broadcast_flush_seconds", (), {(): self.broadcast_seconds})
+
+        for collector in self._collectors.values():
+            for name, kind, help_text, value in collector():
+                header(name, kind, help_text)
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def stats_collector(prefix: str, stats: Callable[[], dict], counters: Iterable[str] = ()) -> Collector:
+    """Expose a component's stats() dict as `<prefix>_<key>` gauges (or counters)."""
+    counters = set(counters)
+
+    def collect():
+        for key, value in stats().items():
+            kind = "counter" if key in counters else "gauge"
+            name = f"{prefix}_{key}_total" if kind == "counter" else f"{prefix}_{key}"
+            yield name, kind, f"{prefix} {key.replace('_', ' ')}.", value
+
+    return collect
+
+
+def instrument_engine(sync_engine):
+    """Time every statement on this engine and attribute it to the current request, if any."""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start"].pop()
+        queries = _request_queries.get()
+        if queries is not None:
+            queries.append((statement, time.perf_counter() - started))
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and SQL statements per route template."""
+
+    def __init__(self, app, registry: Metrics = metrics):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        queries: List[Tuple[str, float]] = []
+        token = _request_queries.set(queries)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_queries.reset(token)
+            route = scope.get("route")
+            # label by route template, never by raw path, to keep series bounded
+            path = getattr(route, "path", None) or "unmatched"
+            self.registry.observe_request(scope["method"], path, status, time.perf_counter() - started, queries)
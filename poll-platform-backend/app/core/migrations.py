@@ -0,0 +1,217 @@
+# app/core/migrations.py
+"""
+Versioned schema migrations, applied at startup right after create_all.
+
+create_all only creates missing tables, so every change to an existing table (a column,
+an index, a backfilled counter) is a migration here. Each one inspects the live schema
+before touching it: on a database create_all has just built, it only records its version.
+A migration runs in one transaction that starts by claiming its version row, so when
+several workers start at once one applies it and the others skip it.
+"""
+import time
+from typing import Callable, List, Set, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, insert, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError, OperationalError, SQLAlchemyError
+
+from app.utils.logger import logger
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, server_default=func.now()),
+)
+
+
+def _columns(conn: Connection, table: str) -> Set[str]:
+    return {c["name"] for c in inspect(conn).get_columns(table)}
+
+
+def _indexes(conn: Connection, table: str) -> Set[str]:
+    inspector = inspect(conn)
+    names = {i["name"] for i in inspector.get_indexes(table)}
+    return names | {u["name"] for u in inspector.get_unique_constraints(table)}
+
+
+def _like_counter(conn: Connection):
+    """Unique (poll_id, user_identifier) likes and a backfilled polls.likes_count."""
+    if "uq_likes_poll_user" not in _indexes(conn, "likes"):
+        # keep the oldest like per (poll, user) so the unique index can be built
+        conn.execute(text(
+            "DELETE FROM likes WHERE id NOT IN "
+            "(SELECT MIN(id) FROM likes GROUP BY poll_id, user_identifier)"
+        ))
+        conn.execute(text("CREATE UNIQUE INDEX uq_likes_poll_user ON likes (poll_id, user_identifier)"))
+    if "likes_count" not in _columns(conn, "polls"):
+        conn.execute(text("ALTER TABLE polls ADD COLUMN likes_count INTEGER NOT NULL DEFAULT 0"))
+        conn.execute(text(
+            "UPDATE polls SET likes_count = (SELECT COUNT(*) FROM likes WHERE likes.poll_id = polls.id)"
+        ))
+
+
+def _vote_upsert(conn: Connection):
+    """votes.voted_at and the unique (poll_id, voter) index the vote upsert relies on."""
+    if "voted_at" not in _columns(conn, "votes"):
+        conn.execute(text("ALTER TABLE votes ADD COLUMN voted_at DATETIME"))
+    if "uq_votes_poll_voter" not in _indexes(conn, "votes"):
+        # keep each voter's latest vote so the unique index can be built
+        removed = conn.execute(text(
+            "DELETE FROM votes WHERE id NOT IN "
+            "(SELECT MAX(id) FROM votes GROUP BY poll_id, voter)"
+        )).rowcount
+        conn.execute(text("CREATE UNIQUE INDEX uq_votes_poll_voter ON votes (poll_id, voter)"))
+        if removed:
+            conn.execute(text(
+                "UPDATE options SET votes_count = (SELECT COUNT(*) FROM votes WHERE votes.option_id = options.id)"
+            ))
+
+
+def _lookup_indexes(conn: Connection):
+    """Indexes on the foreign keys PollRepository filters and aggregates by."""
+    for name, table, columns in (
+        ("ix_options_poll_id", "options", "poll_id"),
+        ("ix_votes_option_id", "votes", "option_id"),
+        ("ix_option_counter_shards_poll_id", "option_counter_shards", "poll_id"),
+    ):
+        if name not in _indexes(conn, table):
+            conn.execute(text(f"CREATE INDEX {name} ON {table} ({columns})"))
+
+
+def _poll_search(conn: Connection):
+    """FTS5 index over poll questions and option texts, kept in sync by triggers (SQLite with FTS5 only)."""
+    if conn.dialect.name != "sqlite" or not conn.execute(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar():
+        return  # searches fall back to the in-memory index
+    if "poll_search" in inspect(conn).get_table_names():
+        return
+    # prefix indexes let a typed prefix of up to 6 characters read one doclist, newest first,
+    # instead of merging the full doclist of every word it covers
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE poll_search USING fts5("
+        "question, options, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4 5 6')"
+    ))
+    # the rowid is the poll id; options holds the poll's option texts separated by spaces
+    rebuild_options = (
+        "UPDATE poll_search SET options = coalesce("
+        "(SELECT group_concat(text, ' ') FROM options WHERE poll_id = {ref}.poll_id), '') "
+        "WHERE rowid = {ref}.poll_id"
+    )
+    for trigger in (
+        "CREATE TRIGGER poll_search_polls_ai AFTER INSERT ON polls BEGIN "
+        "INSERT INTO poll_search (rowid, question, options) VALUES (new.id, new.question, ''); END",
+        "CREATE TRIGGER poll_search_polls_au AFTER UPDATE OF question ON polls BEGIN "
+        "UPDATE poll_search SET question = new.question WHERE rowid = new.id; END",
+        "CREATE TRIGGER poll_search_polls_ad AFTER DELETE ON polls BEGIN "
+        "DELETE FROM poll_search WHERE rowid = old.id; END",
+        "CREATE TRIGGER poll_search_options_ai AFTER INSERT ON options BEGIN "
+        "UPDATE poll_search SET options = options || ' ' || new.text WHERE rowid = new.poll_id; END",
+        f"CREATE TRIGGER poll_search_options_au AFTER UPDATE OF text ON options BEGIN {rebuild_options.format(ref='new')}; END",
+        f"CREATE TRIGGER poll_search_options_ad AFTER DELETE ON options BEGIN {rebuild_options.format(ref='old')}; END",
+    ):
+        conn.execute(text(trigger))
+    conn.execute(text(
+        "INSERT INTO poll_search (rowid, question, options) "
+        "SELECT polls.id, polls.question, "
+        "coalesce((SELECT group_concat(text, ' ') FROM options WHERE options.poll_id = polls.id), '') FROM polls"
+    ))
+
+
+def _activity_timestamps(conn: Connection):
+    """likes.liked_at and the time indexes the trending board is rebuilt from at startup."""
+    if "liked_at" not in _columns(conn, "likes"):
+        conn.execute(text("ALTER TABLE likes ADD COLUMN liked_at DATETIME"))
+    for name, table, column in (("ix_votes_voted_at", "votes", "voted_at"), ("ix_likes_liked_at", "likes", "liked_at")):
+        if name not in _indexes(conn, table):
+            conn.execute(text(f"CREATE INDEX {name} ON {table} ({column})"))
+
+
+def _vote_bucket_shards(conn: Connection):
+    """option_vote_buckets.shard in the bucket key, so sharded votes spread their history rows like their counters."""
+    if "shard" in _columns(conn, "option_vote_buckets"):
+        return
+    if conn.dialect.name != "sqlite":
+        conn.execute(text("ALTER TABLE option_vote_buckets ADD COLUMN shard INTEGER NOT NULL DEFAULT 0"))
+        conn.execute(text("ALTER TABLE option_vote_buckets DROP CONSTRAINT uq_vote_buckets_option_bucket"))
+        conn.execute(text(
+            "ALTER TABLE option_vote_buckets ADD CONSTRAINT uq_vote_buckets_option_bucket_shard "
+            "UNIQUE (option_id, bucket_s, bucket_start, shard)"
+        ))
+        return
+    # SQLite cannot drop a table constraint: rebuild the table with the new key
+    conn.execute(text("ALTER TABLE option_vote_buckets RENAME TO option_vote_buckets_old"))
+    conn.execute(text(
+        "CREATE TABLE option_vote_buckets ("
+        "id INTEGER NOT NULL PRIMARY KEY, "
+        "option_id INTEGER NOT NULL REFERENCES options (id), "
+        "bucket_s INTEGER NOT NULL, "
+        "bucket_start INTEGER NOT NULL, "
+        "shard INTEGER DEFAULT '0' NOT NULL, "
+        "delta INTEGER NOT NULL, "
+        "CONSTRAINT uq_vote_buckets_option_bucket_shard UNIQUE (option_id, bucket_s, bucket_start, shard))"
+    ))
+    conn.execute(text(
+        "INSERT INTO option_vote_buckets (id, option_id, bucket_s, bucket_start, shard, delta) "
+        "SELECT id, option_id, bucket_s, bucket_start, 0, delta FROM option_vote_buckets_old"
+    ))
+    conn.execute(text("DROP TABLE option_vote_buckets_old"))
+
+
+# (version, name, migrate) in order; never edit or renumber one that has shipped
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "lookup_indexes", _lookup_indexes),  # first: the backfills below count through these
+    (2, "like_counter", _like_counter),
+    (3, "vote_upsert", _vote_upsert),
+    (4, "poll_search", _poll_search),
+    (5, "activity_timestamps", _activity_timestamps),
+    (6, "vote_bucket_shards", _vote_bucket_shards),
+]
+
+
+def applied_versions(bind: Engine) -> Set[int]:
+    with bind.connect() as conn:
+        return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def pending_migrations(bind: Engine) -> List[str]:
+    """`<version>_<name>` of every migration not applied yet; all of them on a database never migrated."""
+    try:
+        done = applied_versions(bind)
+    except SQLAlchemyError:
+        done = set()
+    return [f"{version}_{name}" for version, name, _ in MIGRATIONS if version not in done]
+
+
+def _apply(bind: Engine, version: int, name: str, migrate: Callable[[Connection], None]) -> bool:
+    try:
+        with bind.begin() as conn:
+            # claim the version first: a concurrent worker blocks here, then fails on the key
+            conn.execute(insert(schema_migrations).values(version=version, name=name))
+            migrate(conn)
+        return True
+    except IntegrityError:
+        return False  # applied by another process meanwhile
+
+
+def run_migrations(bind: Engine, lock_wait_s: float = 600.0) -> List[int]:
+    """Apply every pending migration. Returns the versions this call applied."""
+    schema_migrations.create(bind, checkfirst=True)
+    done = applied_versions(bind)
+    applied = []
+    for version, name, migrate in MIGRATIONS:
+        if version in done:
+            continue
+        deadline = time.monotonic() + lock_wait_s
+        while True:
+            try:
+                if _apply(bind, version, name, migrate):
+                    logger.info("Applied migration %s_%s", version, name)
+                    applied.append(version)
+                break
+            except OperationalError as exc:
+                # SQLite gives up after its busy timeout while another worker runs a long migration
+                if "locked" not in str(exc.orig) or time.monotonic() > deadline:
+                    raise
+                time.sleep(0.5)
+    return applied
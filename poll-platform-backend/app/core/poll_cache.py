@@ -0,0 +1,217 @@
+# app/core/poll_cache.py
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.models.poll import Poll
+
+LIKES = "likes"  # version key of a snapshot's likes_count; options are keyed by option id
+
+_write_versions = itertools.count(1)
+
+
+def next_write_version() -> int:
+    """
+    Process-wide stamp for a count returned by a write. Repositories take it after the
+    UPDATE ... RETURNING and before the commit: the row stays locked until then, so for one
+    option (or poll) the stamps order the same way as the commits, whichever thread applies
+    its result to the cache first. Fill tokens come from the same sequence.
+    """
+    return next(_write_versions)
+
+
+def snapshot_from_poll(poll: Poll) -> dict:
+    """The PollOut-shaped dict that is cached and served for a poll."""
+    return {
+        "id": poll.id,
+        "question": poll.question,
+        "created_by": poll.created_by,
+        "options": [
+            {"id": option.id, "text": option.text, "votes_count": option.votes_count}
+            for option in poll.options
+        ],
+        "likes_count": poll.likes_count,
+    }
+
+
+def snapshots_from_rows(poll_rows: Sequence[tuple], option_rows: Sequence[tuple]) -> List[dict]:
+    """
+    Snapshots straight from (id, question, created_by, likes_count) poll rows and
+    (poll_id, id, text, votes_count) option rows, in poll_rows order.
+    """
+    options: Dict[int, list] = {row[0]: [] for row in poll_rows}
+    for poll_id, option_id, text, votes_count in option_rows:
+        options[poll_id].append({"id": option_id, "text": text, "votes_count": votes_count})
+    return [
+        {
+            "id": poll_id,
+            "question": question,
+            "created_by": created_by,
+            "options": options[poll_id],
+            "likes_count": likes_count,
+        }
+        for poll_id, question, created_by, likes_count in poll_rows
+    ]
+
+
+class PollCache:
+    """
+    LRU + TTL cache of poll snapshots (question, options with counts, likes).
+
+    Reads go through get()/get_many(); writes keep entries current in place via
+    set_option_count()/set_likes_count() instead of evicting them, so a hot poll
+    stays cached while it is being voted on. Cached snapshots are shared and must
+    be treated as read-only by callers.
+
+    Two races are closed with write versions (see next_write_version):
+    - a read-through fill takes fill_token() before it reads the database, and put()
+      drops the snapshot if a write to that poll reached the cache since, so a snapshot
+      read just before a vote committed never replaces the vote's count;
+    - each cached count remembers the version it was written with, so a vote whose
+      thread reports back late cannot overwrite a newer count. A write stamped before
+      the entry was filled may or may not be in it; that entry is dropped instead.
+    """
+
+    def __init__(self, max_entries: int = settings.POLL_CACHE_MAX_ENTRIES, ttl_s: float = settings.POLL_CACHE_TTL_S):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        # poll id -> (expires_at, snapshot, fill version, {option id | LIKES: write version})
+        self._entries: "OrderedDict[int, Tuple[float, dict, int, Dict[Hashable, int]]]" = OrderedDict()
+        # poll id -> version of the last write that reached the cache, oldest first; bounded,
+        # polls that fell off count as written at `_forgotten` (so older fills are dropped)
+        self._written: "OrderedDict[int, int]" = OrderedDict()
+        self._forgotten = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_fills = 0
+        self.stale_writes = 0
+
+    def _lookup(self, poll_id: int, now: float) -> Optional[dict]:
+        entry = self._entries.get(poll_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, snapshot = entry[:2]
+        if expires_at < now:
+            del self._entries[poll_id]
+            self.evictions += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(poll_id)
+        self.hits += 1
+        return snapshot
+
+    def get(self, poll_id: int) -> Optional[dict]:
+        with self._lock:
+            return self._lookup(poll_id, time.monotonic())
+
+    def get_many(self, poll_ids: Iterable[int]) -> Dict[int, dict]:
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for poll_id in poll_ids:
+                snapshot = self._lookup(poll_id, now)
+                if snapshot is not None:
+                    found[poll_id] = snapshot
+        return found
+
+    @staticmethod
+    def fill_token() -> int:
+        """Take before reading the snapshots to put(); writes that reach the cache later win."""
+        return next_write_version()
+
+    def put(self, snapshot: dict, token: Optional[int] = None):
+        """Cache a snapshot. With the fill_token() taken before it was read, drop it if a write raced the read."""
+        poll_id = snapshot["id"]
+        with self._lock:
+            if token is None:
+                token = next_write_version()  # fresh from the database row just written (create_poll)
+            elif self._written.get(poll_id, self._forgotten) > token:
+                self.stale_fills += 1
+                return
+            self._entries[poll_id] = (time.monotonic() + self.ttl_s, snapshot, token, {})
+            self._entries.move_to_end(poll_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _note_write(self, poll_id: int):
+        self._written[poll_id] = next_write_version()
+        self._written.move_to_end(poll_id)
+        while len(self._written) > self.max_entries:
+            _, self._forgotten = self._written.popitem(last=False)
+
+    def invalidate(self, poll_id: int):
+        with self._lock:
+            self._note_write(poll_id)
+            self._entries.pop(poll_id, None)
+
+    def _write(self, poll_id: int, key: Hashable, version: Optional[int]) -> Optional[Tuple[float, dict, int, dict]]:
+        """The entry to update for a write of `key` at `version`, or None (entry dropped or write stale)."""
+        self._note_write(poll_id)
+        entry = self._entries.get(poll_id)
+        if entry is None:
+            return None
+        _, _, filled_at, versions = entry
+        if version is not None and version <= versions.get(key, 0):
+            self.stale_writes += 1
+            return None
+        if version is None or (key not in versions and version <= filled_at):
+            # unordered, or stamped before the fill: the snapshot may already be newer
+            del self._entries[poll_id]
+            return None
+        versions[key] = version
+        return entry
+
+    def set_option_count(self, poll_id: int, option_id: int, votes_count: int, version: Optional[int] = None):
+        with self._lock:
+            entry = self._write(poll_id, option_id, version)
+            if entry is None:
+                return
+            expires_at, snapshot, filled_at, versions = entry
+            options = [
+                {**option, "votes_count": votes_count} if option["id"] == option_id else option
+                for option in snapshot["options"]
+            ]
+            # replace rather than mutate: readers may hold the previous snapshot
+            self._entries[poll_id] = (expires_at, {**snapshot, "options": options}, filled_at, versions)
+
+    def set_likes_count(self, poll_id: int, likes_count: int, version: Optional[int] = None):
+        with self._lock:
+            entry = self._write(poll_id, LIKES, version)
+            if entry is None:
+                return
+            expires_at, snapshot, filled_at, versions = entry
+            self._entries[poll_id] = (expires_at, {**snapshot, "likes_count": likes_count}, filled_at, versions)
+
+    def apply_event(self, topic: Optional[str], message: dict):
+        """
+        Drop snapshots that events relayed from other workers touch: their counts cannot be
+        ordered against this worker's writes, so the next read refills from the database.
+        This worker's own writes update the cache in PollService with their versions.
+        """
+        if message.get("type") in ("vote", "like"):
+            self.invalidate(message["payload"]["poll_id"])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "stale_fills": self.stale_fills,
+                "stale_writes": self.stale_writes,
+            }
+
+
+poll_cache = PollCache()
@@ -0,0 +1,223 @@
+# app/core/pubsub.py
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Callable, Deque, Optional, Set
+
+from app.core.config import settings
+from app.utils.logger import logger
+from app.utils.serialization import dumps_bytes, loads
+
+# deliver(topic, message, relayed) hands an event to this process's local subscribers;
+# relayed is True for events published by another process
+Deliver = Callable[..., None]
+
+
+class PubSubBackend(ABC):
+    """
+    Carries WebSocket events between processes. Each process publishes an event once;
+    the backend delivers it to the local WebSocketManager and to every other process,
+    which relay it to their own sockets.
+    """
+
+    def __init__(self):
+        self._deliver: Optional[Deliver] = None
+
+    def attach(self, deliver: Deliver):
+        self._deliver = deliver
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abstractmethod
+    def publish(self, topic: Optional[str], message: dict):
+        """Deliver `message` on `topic` locally and to every other process."""
+
+
+class InProcessBackend(PubSubBackend):
+    """Single-process deployments: events go straight to the local manager."""
+
+    def publish(self, topic: Optional[str], message: dict):
+        self._deliver(topic, message)
+
+
+class LocalSocketBackend(PubSubBackend):
+    """
+    Fan-out between workers over a TCP hub on host:port, no external broker needed.
+
+    Every process tries to bind the hub port at startup; the one that succeeds runs the
+    hub, and all processes (including the hub's own) connect to it as peers. The hub
+    relays each newline-delimited JSON frame to every peer except the sender. If the
+    hub process exits, the remaining peers reconnect and one of them takes over.
+    Peers that stop reading are disconnected once their write buffer passes
+    `max_buffer` bytes. Frames are at most `max_frame` bytes; larger events stay local.
+    While the hub is unreachable, up to `outbox_size` events are queued and sent on
+    reconnect (the oldest go first when it overflows).
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        retry_s: float = 0.5,
+        max_buffer: int = 4 * 1024 * 1024,
+        max_frame: int = settings.WS_PUBSUB_MAX_FRAME_BYTES,
+        outbox_size: int = settings.WS_PUBSUB_OUTBOX,
+    ):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.retry_s = retry_s
+        self.max_buffer = max_buffer
+        self.max_frame = max_frame
+        self.outbox_size = outbox_size
+        self._outbox: Deque[bytes] = deque()
+        self._dropped = 0
+        self.origin = f"{os.getpid()}:{id(self)}"
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._peers: Set[asyncio.StreamWriter] = set()
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+        self.connected = asyncio.Event()
+
+    @property
+    def is_hub(self) -> bool:
+        return self._server is not None
+
+    def publish(self, topic: Optional[str], message: dict):
+        self._deliver(topic, message)
+        frame = dumps_bytes({"origin": self.origin, "topic": topic, "message": message}) + b"\n"
+        if len(frame) > self.max_frame:
+            logger.warning("Pub/sub event of %d bytes is over %d; delivered locally only", len(frame), self.max_frame)
+            return
+        writer = self._writer
+        if writer is None or writer.is_closing():
+            if len(self._outbox) >= self.outbox_size:
+                self._outbox.popleft()
+                if not self._dropped:
+                    logger.warning("Pub/sub outbox full while the hub is down; dropping the oldest events")
+                self._dropped += 1
+            self._outbox.append(frame)
+            return
+        writer.write(frame)
+
+    def _flush_outbox(self, writer: asyncio.StreamWriter):
+        if self._dropped:
+            logger.warning("Pub/sub hub is back; %d events were dropped while it was down", self._dropped)
+            self._dropped = 0
+        while self._outbox:
+            writer.write(self._outbox.popleft())
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._server is not None:
+            self._server.close()
+            for peer in list(self._peers):
+                peer.close()
+            self._server = None
+
+    async def _run(self):
+        while True:
+            await self._try_become_hub()
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port, limit=self.max_frame)
+            except OSError:
+                await asyncio.sleep(self.retry_s)
+                continue
+            self._flush_outbox(writer)
+            self._writer = writer
+            self.connected.set()
+            try:
+                while True:
+                    line = await self._readline(reader)
+                    if line is None:
+                        continue
+                    if not line:
+                        break
+                    self._receive(line)
+            except (OSError, asyncio.IncompleteReadError):
+                pass
+            finally:
+                self._writer = None
+                self.connected.clear()
+                writer.close()
+            logger.warning("Lost the pub/sub hub; queueing events until it is back")
+            await asyncio.sleep(self.retry_s)
+
+    async def _readline(self, reader: asyncio.StreamReader) -> Optional[bytes]:
+        """The next frame, b"" at EOF, or None for a frame over max_frame (skipped, not fatal)."""
+        try:
+            return await reader.readline()
+        except ValueError:
+            logger.warning("Skipped a pub/sub frame over %d bytes", self.max_frame)
+            return None
+
+    def _receive(self, line: bytes):
+        try:
+            frame = loads(line)
+        except ValueError:
+            return
+        if frame.get("origin") == self.origin:
+            return
+        self._deliver(frame.get("topic"), frame.get("message") or {}, relayed=True)
+
+    async def _try_become_hub(self):
+        if self._server is not None:
+            return
+        try:
+            self._server = await asyncio.start_server(self._serve_peer, self.host, self.port, limit=self.max_frame)
+            logger.info("Pub/sub hub listening on %s:%s", self.host, self.port)
+        except OSError:
+            pass  # another process already runs the hub
+
+    async def _serve_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._peers.add(writer)
+        try:
+            while True:
+                line = await self._readline(reader)
+                if line is None:
+                    continue
+                if not line:
+                    break
+                for peer in list(self._peers):
+                    if peer is writer:
+                        continue
+                    if peer.transport.get_write_buffer_size() > self.max_buffer:
+                        logger.warning("Disconnecting slow pub/sub peer")
+                        self._peers.discard(peer)
+                        peer.close()
+                        continue
+                    peer.write(line)
+        except (OSError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass  # peer went away, or the hub is shutting down
+        finally:
+            self._peers.discard(writer)
+            writer.close()
+
+
+def events_reach_all_workers(
+    backend: str = settings.WS_PUBSUB_BACKEND, workers: int = settings.WORKERS
+) -> bool:
+    """Whether every worker sees every event: a single worker, or a backend that relays between processes."""
+    return workers <= 1 or backend != "memory"
+
+
+def create_backend(name: str = settings.WS_PUBSUB_BACKEND) -> PubSubBackend:
+    if name == "memory":
+        return InProcessBackend()
+    if name == "socket":
+        return LocalSocketBackend(settings.WS_PUBSUB_HOST, settings.WS_PUBSUB_PORT)
+    raise ValueError(f"Unknown WS_PUBSUB_BACKEND: {name}")
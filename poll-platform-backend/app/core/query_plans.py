@@ -0,0 +1,52 @@
+# app/core/query_plans.py
+from typing import Dict, List, Tuple
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import Executable
+
+from app.models.poll import Like, Option, OptionCounterShard, OptionVoteBucket, Vote
+from app.models.user import User
+from app.repositories.poll_repository import OPTION_VOTES
+
+
+def hot_lookups() -> Dict[str, Executable]:
+    """The per-request lookups the repositories run, with sample parameters."""
+    return {
+        "vote by (poll, voter)": select(Vote.option_id).where(Vote.poll_id == 1, Vote.voter == "user@example.com"),
+        "like by (poll, user)": delete(Like).where(Like.poll_id == 1, Like.user_identifier == "user@example.com"),
+        "options of polls": select(Option.id, OPTION_VOTES).where(Option.poll_id.in_([1, 2, 3])),
+        "counter slots of poll": select(OptionCounterShard.id).where(OptionCounterShard.poll_id == 1),
+        "votes of option": select(func.count(Vote.id)).where(Vote.option_id == 1),
+        "likes of poll": select(func.count(Like.id)).where(Like.poll_id == 1),
+        "vote history of poll": (
+            select(OptionVoteBucket.delta)
+            .join(Option, Option.id == OptionVoteBucket.option_id)
+            .where(Option.poll_id == 1, OptionVoteBucket.bucket_s == 60, OptionVoteBucket.bucket_start >= 0)
+        ),
+        "recent votes (trending rebuild)": select(Vote.poll_id, Vote.voted_at).where(Vote.voted_at >= "2024-01-01"),
+        "recent likes (trending rebuild)": select(Like.poll_id, Like.liked_at).where(Like.liked_at >= "2024-01-01"),
+        "user by email": select(User.id).where(User.email == "user@example.com"),
+    }
+
+
+def explain(bind: Engine, stmt: Executable) -> List[str]:
+    sql = str(stmt.compile(dialect=bind.dialect, compile_kwargs={"literal_binds": True}))
+    prefix = "EXPLAIN QUERY PLAN " if bind.dialect.name == "sqlite" else "EXPLAIN "
+    with bind.connect() as conn:
+        rows = conn.execute(text(prefix + sql)).all()
+    return [row[-1] for row in rows]
+
+
+def is_table_scan(plan: List[str]) -> bool:
+    """A full scan of a table (or of a whole index) rather than an index seek."""
+    return any(line.lstrip().startswith("SCAN ") or "Seq Scan" in line for line in plan)
+
+
+def check_query_plans(bind: Engine) -> List[Tuple[str, List[str], bool]]:
+    """(lookup, plan lines, uses index seeks only) for every hot lookup."""
+    results = []
+    for name, stmt in hot_lookups().items():
+        plan = explain(bind, stmt)
+        results.append((name, plan, not is_table_scan(plan)))
+    return results
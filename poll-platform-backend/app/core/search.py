@@ -0,0 +1,272 @@
+# app/core/search.py
+import heapq
+import itertools
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.pubsub import events_reach_all_workers
+
+SEARCH_TABLE = "poll_search"
+QUESTION_WEIGHT = 2.0  # a term in the question counts double a term in an option
+MAX_TERMS = 8
+# an index that can't hear other workers' poll_created events reads new polls from the DB at most this often,
+# re-reading the last CATCH_UP_OVERLAP ids in case polls committed out of id order
+CATCH_UP_INTERVAL_S = 1.0
+CATCH_UP_OVERLAP = 50
+
+# same word boundaries as FTS5's unicode61 tokenizer: letters and digits, no underscore
+_WORD = re.compile(r"[^\W_]+")
+_HIGHLIGHT = re.compile("\x02([^\x03]*)\x03")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased words without diacritics, as FTS5 (remove_diacritics 2) indexes them."""
+    text = text.lower()
+    if not text.isascii():
+        text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return _WORD.findall(text)
+
+
+def fts_query(terms: List[str]) -> str:
+    """FTS5 MATCH expression: every term must match, the last one as a prefix (search as you type)."""
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def score(terms: List[str], question_hits: Iterable[str]) -> float:
+    """
+    Rank of a poll matching every term: QUESTION_WEIGHT per term found in its question
+    (`question_hits` are the question's matching tokens), 1 per term found only in an option.
+    """
+    hits = set(question_hits)
+    *exact, last = terms
+    in_question = sum(term in hits for term in exact) + any(token.startswith(last) for token in hits)
+    return in_question * QUESTION_WEIGHT + len(terms) - in_question
+
+
+def highlighted_tokens(highlighted: str) -> List[str]:
+    """Tokens FTS5's highlight(..., char(2), char(3)) marked as matches."""
+    return tokenize(" ".join(_HIGHLIGHT.findall(highlighted)))
+
+
+def top(scores: Dict[int, float], offset: int, limit: int) -> List[int]:
+    """Poll ids by descending score, newest first on ties."""
+    return heapq.nsmallest(offset + limit, scores, key=lambda poll_id: (-scores[poll_id], -poll_id))[offset:]
+
+
+def fts_available(bind: Engine) -> bool:
+    return bind.dialect.name == "sqlite" and inspect(bind).has_table(SEARCH_TABLE)
+
+
+def _weight(arrays: List[array], poll_id: int) -> Optional[float]:
+    """QUESTION_WEIGHT, 1.0 or None: how a poll is hit by one of a term's posting arrays."""
+    weight = None
+    for ids in arrays:
+        i = bisect_left(ids, 2 * poll_id)
+        if i < len(ids) and ids[i] >> 1 == poll_id:
+            if ids[i] & 1 or (i + 1 < len(ids) and ids[i + 1] >> 1 == poll_id):
+                return QUESTION_WEIGHT
+            weight = 1.0
+    return weight
+
+
+def _lookup(arrays: List[array], probes: int) -> Callable[[int], Optional[float]]:
+    """
+    Membership test for one term. Binary search per posting array, unless the term spans
+    so many arrays (a short prefix) that one pass into a dict is cheaper for `probes` lookups.
+    """
+    if len(arrays) <= 4 or probes * len(arrays) < 4 * sum(len(ids) for ids in arrays):
+        return lambda poll_id: _weight(arrays, poll_id)
+    weights: Dict[int, float] = {}
+    for ids in arrays:
+        for entry in ids:
+            if entry & 1:
+                weights[entry >> 1] = QUESTION_WEIGHT
+            else:
+                weights.setdefault(entry >> 1, 1.0)
+    return weights.get
+
+
+class InvertedIndex:
+    """
+    In-memory fallback for databases without FTS5, answering exactly like the FTS5 query:
+    all terms, the last one as a prefix, the newest `candidates` matches ranked by score().
+
+    Each token maps to an ascending array of 2 * poll_id + 1 for a question hit and
+    2 * poll_id for an option hit. A search walks the rarest term's postings newest
+    first and keeps the polls every other term also hits. Loaded at startup and kept
+    current from poll_created events, so every worker has its own copy; events that
+    arrive while loading are held back and applied for polls the load did not see.
+    Without those events (`catches_up`), searches first read newer polls from the DB.
+    """
+
+    def __init__(self, candidates: int = settings.SEARCH_CANDIDATES):
+        self.candidates = candidates
+        self.enabled = False
+        self._postings: Dict[str, array] = {}
+        self._vocabulary: Optional[List[str]] = None  # sorted, rebuilt lazily for prefix lookups
+        self._polls = 0
+        self._loaded_through = 0  # highest poll id read by load()
+        self._backlog: Optional[List[dict]] = None  # poll_created payloads received mid-load
+        self._lock = threading.Lock()
+        self.catches_up = False
+        self._caught_up_at = 0.0
+
+    def _add(self, poll_id: int, question: str, options: Iterable[str]):
+        in_question = set(tokenize(question))
+        in_options = {token for text in options for token in tokenize(text)}
+        for token in in_question | in_options:
+            entries = [2 * poll_id] if token in in_options else []
+            if token in in_question:
+                entries.append(2 * poll_id + 1)
+            ids = self._postings.get(token)
+            if ids is None:
+                ids = self._postings[token] = array("q")
+            for entry in entries:
+                if not ids or ids[-1] < entry:
+                    ids.append(entry)
+                else:  # relayed from another worker out of id order
+                    i = bisect_left(ids, entry)
+                    if i == len(ids) or ids[i] != entry:
+                        ids.insert(i, entry)
+        self._polls += 1
+        self._vocabulary = None
+
+    def add(self, poll_id: int, question: str, options: Iterable[str]):
+        with self._lock:
+            self._add(poll_id, question, options)
+
+    def _has(self, poll_id: int, question: str) -> bool:
+        tokens = tokenize(question)
+        ids = self._postings.get(tokens[0]) if tokens else None
+        if ids is None:
+            return False
+        i = bisect_left(ids, 2 * poll_id + 1)
+        return i < len(ids) and ids[i] == 2 * poll_id + 1
+
+    def catch_up_from(self) -> Optional[int]:
+        """The poll id to read newer polls from before searching, or None if not due yet."""
+        now = time.monotonic()
+        with self._lock:
+            if not self.catches_up or now - self._caught_up_at < CATCH_UP_INTERVAL_S:
+                return None
+            self._caught_up_at = now
+            return max(0, self._loaded_through - CATCH_UP_OVERLAP)
+
+    def catch_up(self, rows: Iterable[Tuple[int, str, Optional[str]]]):
+        """Index (poll_id, question, option text) rows ordered by poll id that the index does not have yet."""
+        for poll_id, poll_rows in itertools.groupby(rows, key=lambda row: row[0]):
+            poll_rows = list(poll_rows)
+            question = poll_rows[0][1]
+            with self._lock:
+                if poll_id <= self._loaded_through and self._has(poll_id, question):
+                    continue
+                self._add(poll_id, question, (option for _, _, option in poll_rows if option is not None))
+                self._loaded_through = max(self._loaded_through, poll_id)
+
+    def _tokens(self, term: str, prefix: bool) -> List[str]:
+        if not prefix:
+            return [term] if term in self._postings else []
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        start = bisect_left(self._vocabulary, term)
+        tokens = []
+        for token in self._vocabulary[start:]:
+            if not token.startswith(term):
+                break
+            tokens.append(token)
+        return tokens
+
+    def search(self, terms: List[str], offset: int, limit: int) -> List[int]:
+        with self._lock:
+            postings = [
+                [self._postings[token] for token in self._tokens(term, prefix=i == len(terms) - 1)]
+                for i, term in enumerate(terms)
+            ]
+            frequencies = [sum(len(ids) for ids in arrays) for arrays in postings]
+            if not all(frequencies):
+                return []
+            rarest = min(range(len(terms)), key=frequencies.__getitem__)
+            lookups = [
+                None if i == rarest else _lookup(arrays, frequencies[rarest])
+                for i, arrays in enumerate(postings)
+            ]
+
+            scores: Dict[int, float] = {}
+            # newest first; a question hit (odd) comes before an option hit of the same poll
+            for entry in heapq.merge(*(reversed(ids) for ids in postings[rarest]), reverse=True):
+                poll_id = entry >> 1
+                if poll_id in scores:
+                    continue
+                total = QUESTION_WEIGHT if entry & 1 else 1.0
+                for lookup in lookups:
+                    if lookup is not None:
+                        weight = lookup(poll_id)
+                        if weight is None:
+                            break
+                        total += weight
+                else:
+                    scores[poll_id] = total
+                    if len(scores) >= self.candidates:
+                        break
+        return top(scores, offset, limit)
+
+    def _add_payload(self, payload: dict):
+        if payload["id"] > self._loaded_through:
+            self.add(payload["id"], payload["question"], (option["text"] for option in payload["options"]))
+
+    def load(self, rows: Iterable[Tuple[int, str, Optional[str]]]):
+        """Index (poll_id, question, option text) rows ordered by poll id, then start answering searches."""
+        with self._lock:
+            self._backlog = []
+        last_id = 0
+        for poll_id, poll_rows in itertools.groupby(rows, key=lambda row: row[0]):
+            poll_rows = list(poll_rows)
+            with self._lock:
+                self._add(poll_id, poll_rows[0][1], (option for _, _, option in poll_rows if option is not None))
+            last_id = poll_id
+        with self._lock:
+            self._loaded_through = last_id
+            backlog, self._backlog = self._backlog, None
+        for payload in backlog:
+            self._add_payload(payload)
+        self.enabled = True
+
+    def apply_event(self, topic: Optional[str], message: dict):
+        """Index polls created by any worker."""
+        if message.get("type") != "poll_created":
+            return
+        with self._lock:
+            if self._backlog is not None:
+                self._backlog.append(message["payload"])
+                return
+        self._add_payload(message["payload"])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"polls": self._polls, "terms": len(self._postings)}
+
+
+search_index = InvertedIndex()
+
+
+def use_memory_index(
+    bind: Engine, backend: str = settings.SEARCH_BACKEND, shared: bool = events_reach_all_workers()
+) -> bool:
+    """
+    Whether searches go to the in-memory index ("memory", or "auto" without the FTS5 table).
+    When events don't reach every worker, FTS5 answers instead of "memory" wherever it exists.
+    """
+    if backend == "memory" and shared:
+        return True
+    return backend in ("memory", "auto") and not fts_available(bind)
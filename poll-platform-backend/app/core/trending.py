@@ -0,0 +1,112 @@
+# app/core/trending.py
+import math
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+
+REBUILD_HALF_LIVES = 10  # activity older than this weighs under 0.1% and is not replayed at startup
+RENORMALIZE_AT = 30.0    # exponent past which stored scores are rescaled to a new origin
+
+
+def activity_time(at: datetime) -> float:
+    """Unix time of a naive UTC timestamp as the database's now() stores it."""
+    return at.replace(tzinfo=timezone.utc).timestamp() if at.tzinfo is None else at.timestamp()
+
+
+class TrendingBoard:
+    """
+    Top-K polls by time-decayed activity: each vote or like adds its weight, halving every
+    `half_life_s`. Scores are kept "forward decayed", i.e. weight * e^(rate * (t - origin)),
+    so they never have to be decayed in place and the relative order of two polls only
+    changes when one of them gets activity. That makes the sorted top-K list exact under
+    increments alone: a poll outside it can only enter by being recorded, and reads are
+    O(K) whatever the number of polls.
+    """
+
+    def __init__(
+        self,
+        size: int = settings.TRENDING_SIZE,
+        half_life_s: float = settings.TRENDING_HALF_LIFE_S,
+        vote_weight: float = settings.TRENDING_VOTE_WEIGHT,
+        like_weight: float = settings.TRENDING_LIKE_WEIGHT,
+    ):
+        self.size = size
+        self.half_life_s = half_life_s
+        self.vote_weight = vote_weight
+        self.like_weight = like_weight
+        self.enabled = False
+        self._rate = math.log(2) / half_life_s
+        self._origin = time.time()
+        self._scores: Dict[int, float] = {}
+        self._top: List[Tuple[float, int]] = []  # ascending (score, poll_id), at most `size`
+        self._lock = threading.Lock()
+
+    def record(self, poll_id: int, weight: float, at: Optional[float] = None) -> bool:
+        """Add activity to a poll. True when the top-K membership or order changed."""
+        at = time.time() if at is None else at
+        with self._lock:
+            if self._rate * (at - self._origin) > RENORMALIZE_AT:
+                self._renormalize(at)
+            old = self._scores.get(poll_id, 0.0)
+            new = old + weight * math.exp(self._rate * (at - self._origin))
+            self._scores[poll_id] = new
+
+            top = self._top
+            position = bisect_left(top, (old, poll_id))
+            if position < len(top) and top[position] == (old, poll_id):
+                del top[position]
+            else:
+                if len(top) >= self.size and new <= top[0][0]:
+                    return False
+                position = None
+            insort(top, (new, poll_id))
+            if len(top) > self.size:
+                del top[0]
+                return True
+            return position is None or top[position] != (new, poll_id)
+
+    def _renormalize(self, now: float):
+        """Move the origin to `now`, scaling every score alike and forgetting polls that have gone quiet."""
+        factor = math.exp(-self._rate * (now - self._origin))
+        floor = min(self.vote_weight, self.like_weight) / 2 ** REBUILD_HALF_LIVES
+        kept = {poll_id for _, poll_id in self._top}
+        self._scores = {
+            poll_id: score * factor
+            for poll_id, score in self._scores.items() if score * factor >= floor or poll_id in kept
+        }
+        self._top = [(score * factor, poll_id) for score, poll_id in self._top]
+        self._origin = now
+
+    def ranking(self, limit: Optional[int] = None) -> List[dict]:
+        """[{"poll_id", "score"}] best first, scores as of now."""
+        with self._lock:
+            factor = math.exp(-self._rate * (time.time() - self._origin))
+            top = self._top[::-1][:limit]
+        return [{"poll_id": poll_id, "score": round(score * factor, 4)} for score, poll_id in top]
+
+    def load(self, activity: Iterable[Tuple[str, int, datetime]]):
+        """Replay ("vote" | "like", poll_id, timestamp) activity read from the database."""
+        weights = {"vote": self.vote_weight, "like": self.like_weight}
+        for kind, poll_id, at in activity:
+            if at is not None:
+                self.record(poll_id, weights[kind], activity_time(at))
+        self.enabled = True
+
+    def apply_event(self, topic: Optional[str], message: dict) -> bool:
+        """Record activity reported by any worker. True when the ranking changed."""
+        if message.get("type") != "poll_activity":
+            return False
+        payload = message["payload"]
+        weight = payload.get("votes", 0) * self.vote_weight + payload.get("likes", 0) * self.like_weight
+        return bool(weight) and self.record(payload["poll_id"], weight, payload.get("at"))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"tracked_polls": len(self._scores), "top_size": len(self._top)}
+
+
+trending = TrendingBoard()
@@ -0,0 +1,112 @@
+# app/core/user_cache.py
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+from app.core.config import settings
+
+
+class BloomFilter:
+    """Compact set-membership filter: no false negatives, ~`error_rate` false positives at `capacity`."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class UserExistenceCache:
+    """
+    Bounded LRU of "does this email belong to a user" answers. Positive answers live
+    for `ttl_s`, negative ones for the much shorter `negative_ttl_s` so a user created
+    elsewhere is picked up quickly. An optional Bloom filter, loaded with every email at
+    startup, answers "no" for unknown emails without touching the cache or the database.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.USER_CACHE_MAX_ENTRIES,
+        ttl_s: float = settings.USER_CACHE_TTL_S,
+        negative_ttl_s: float = settings.USER_CACHE_NEGATIVE_TTL_S,
+    ):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.negative_ttl_s = negative_ttl_s
+        self.bloom: Optional[BloomFilter] = None
+        self._entries: "OrderedDict[str, Tuple[float, bool]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bloom_rejects = 0
+
+    def lookup(self, email: str) -> Optional[bool]:
+        """True/False when the answer is known without a query, None on a miss."""
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is not None:
+                expires_at, exists = entry
+                if expires_at >= time.monotonic():
+                    self._entries.move_to_end(email)
+                    self.hits += 1
+                    return exists
+                del self._entries[email]
+            if self.bloom is not None and email not in self.bloom:
+                self.bloom_rejects += 1
+                return False
+            self.misses += 1
+            return None
+
+    def remember(self, email: str, exists: bool):
+        ttl = self.ttl_s if exists else self.negative_ttl_s
+        with self._lock:
+            self._entries[email] = (time.monotonic() + ttl, exists)
+            self._entries.move_to_end(email)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if exists and self.bloom is not None:
+                self.bloom.add(email)
+
+    def mark_created(self, email: str):
+        self.remember(email, True)
+
+    def load_bloom(self, emails: Iterable[str], capacity: int, error_rate: float):
+        bloom = BloomFilter(capacity, error_rate)
+        for email in emails:
+            bloom.add(email)
+        with self._lock:
+            self.bloom = bloom
+
+    def apply_event(self, topic: Optional[str], message: dict):
+        """Learn about users created by other workers."""
+        if message.get("type") == "user_created":
+            self.mark_created(message["payload"]["email"])
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.bloom_rejects
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "bloom_rejects": self.bloom_rejects,
+                "hit_rate": round((self.hits + self.bloom_rejects) / lookups, 4) if lookups else 0.0,
+            }
+
+
+user_cache = UserExistenceCache()
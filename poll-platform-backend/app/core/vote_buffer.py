@@ -0,0 +1,256 @@
+# app/core/vote_buffer.py
+import asyncio
+import threading
+from collections import defaultdict, namedtuple
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.poll_cache import next_write_version
+from app.repositories.poll_repository import PollRepository
+from app.utils.logger import logger
+
+OptionCount = namedtuple("OptionCount", ["id", "votes_count"])
+
+
+class VoteBuffer:
+    """
+    In-process vote aggregator for the opt-in buffered tally mode.
+
+    Votes are validated against the database (reads only) and recorded as per-option
+    deltas plus a per-voter last-choice map. A background task flushes both to the
+    votes/options tables in one batched transaction every `flush_ms` or `max_votes`
+    votes, whichever comes first. Counts returned to callers are the persisted count
+    plus the pending delta, so they stay monotonic for clients while a flush is pending.
+
+    The lock is never held across database I/O (under the async engine that I/O needs
+    the event loop, which a blocked lock would stall). Instead a flush bumps a
+    generation counter around its commit, and a vote whose reads overlapped a commit
+    is simply re-read.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        flush_ms: int = settings.VOTE_BUFFER_FLUSH_MS,
+        max_votes: int = settings.VOTE_BUFFER_MAX_VOTES,
+    ):
+        self.session_factory = session_factory
+        self.flush_ms = flush_ms
+        self.max_votes = max_votes
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._choices: Dict[Tuple[int, str], int] = {}
+        self._deltas: Dict[int, int] = defaultdict(int)
+        self._pending = 0
+        # batch being written by a flush that has not committed yet
+        self._inflight_choices: Dict[Tuple[int, str], int] = {}
+        self._inflight_deltas: Dict[int, int] = {}
+        self._generation = 0
+        self._committing = False
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _buffered_choice(self, key: Tuple[int, str]) -> Optional[int]:
+        choice = self._choices.get(key)
+        return choice if choice is not None else self._inflight_choices.get(key)
+
+    def _buffered_delta(self, option_id: int) -> int:
+        return self._deltas.get(option_id, 0) + self._inflight_deltas.get(option_id, 0)
+
+    def record(self, repo: PollRepository, poll_id: int, option_id: int, voter: str) -> dict:
+        key = (poll_id, voter)
+        try:
+            while True:
+                # start from a fresh read snapshot on every attempt
+                repo.db.rollback()
+                with self._lock:
+                    generation, committing = self._generation, self._committing
+                    buffered = self._buffered_choice(key)
+
+                previous = buffered if buffered is not None else repo.get_voter_choice(poll_id, voter)
+                if previous == option_id:
+                    return {"error": "You have already voted for this option."}
+                option_ids = [option_id] if previous is None else [option_id, previous]
+                counts = repo.get_option_counts(poll_id, option_ids)
+                if option_id not in counts:
+                    return {"error": "The selected option does not exist."}
+                # never wait on the lock while holding a read lock a committing flush needs
+                repo.db.rollback()
+
+                with self._lock:
+                    if committing or self._generation != generation or self._buffered_choice(key) != buffered:
+                        continue  # a flush committed or this voter voted again meanwhile
+                    return self._apply(key, option_id, previous, counts)
+        except SQLAlchemyError:
+            return {"error": "Database error occurred."}
+        finally:
+            # release the read transaction so it never holds up a flush's write lock
+            repo.db.rollback()
+
+    def _apply(self, key: Tuple[int, str], option_id: int, previous: Optional[int], counts: Dict[int, int]) -> dict:
+        self._choices[key] = option_id
+        self._deltas[option_id] += 1
+        result = {"new_option": OptionCount(option_id, counts[option_id] + self._buffered_delta(option_id))}
+        if previous in counts:
+            self._deltas[previous] -= 1
+            result["old_option"] = OptionCount(previous, counts[previous] + self._buffered_delta(previous))
+        self._pending += 1
+        result["version"] = next_write_version()  # under the lock, so in the order the counts were computed
+
+        if self._pending >= self.max_votes:
+            self._request_flush()
+        return result
+
+    def record_many(
+        self, repo: PollRepository, items: List[Tuple[int, int, str]]
+    ) -> Union[Tuple[List[str], Dict[int, Tuple[int, int]], int], dict]:
+        """
+        Buffer many (poll_id, option_id, voter) votes at once, with the same statuses,
+        counts and version as PollRepository.apply_votes_bulk. Bulk votes go through the
+        buffer rather than straight to the tables, so a voter's buffered choice and a bulk
+        item never both move the same previous vote.
+        """
+        poll_ids = list({poll_id for poll_id, _, _ in items})
+        keys = list({(poll_id, voter) for poll_id, _, voter in items})
+        try:
+            while True:
+                repo.db.rollback()
+                with self._lock:
+                    generation, committing = self._generation, self._committing
+
+                options = repo.get_polls_option_counts(poll_ids)
+                current = repo.get_voter_choices(keys)
+                repo.db.rollback()
+
+                with self._lock:
+                    if committing or self._generation != generation:
+                        continue  # a flush committed meanwhile: re-read
+                    return self._apply_many(items, options, current)
+        except SQLAlchemyError:
+            return {"error": "Database error occurred."}
+        finally:
+            repo.db.rollback()
+
+    def _apply_many(
+        self,
+        items: List[Tuple[int, int, str]],
+        options: Dict[int, Tuple[int, int]],
+        current: Dict[Tuple[int, str], int],
+    ) -> Tuple[List[str], Dict[int, Tuple[int, int]], int]:
+        statuses = []
+        touched = set()
+        for poll_id, option_id, voter in items:
+            if options.get(option_id, (None,))[0] != poll_id:
+                statuses.append("invalid_option")
+                continue
+            key = (poll_id, voter)
+            buffered = self._buffered_choice(key)
+            previous = buffered if buffered is not None else current.get(key)
+            if previous == option_id:
+                statuses.append("duplicate")
+                continue
+            if previous is not None:
+                self._deltas[previous] -= 1
+                touched.add(previous)
+            statuses.append("recorded" if previous is None else "moved")
+            self._choices[key] = option_id
+            self._deltas[option_id] += 1
+            touched.add(option_id)
+            self._pending += 1
+
+        counts = {
+            option_id: (options[option_id][0], options[option_id][1] + self._buffered_delta(option_id))
+            for option_id in touched
+        }
+        version = next_write_version() if counts else 0
+        if self._pending >= self.max_votes:
+            self._request_flush()
+        return statuses, counts, version
+
+    def flush(self) -> int:
+        """Write everything buffered so far in one transaction. Returns the number of votes flushed."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                choices, deltas, flushed = self._choices, self._deltas, self._pending
+                self._inflight_choices, self._inflight_deltas = choices, deltas
+                self._choices, self._deltas, self._pending = {}, defaultdict(int), 0
+
+            db = self.session_factory()
+            try:
+                error = PollRepository(db).apply_vote_batch(choices, deltas, commit=False)
+                if not error:
+                    with self._lock:
+                        self._committing = True
+                        self._generation += 1
+                    try:
+                        db.commit()
+                    except SQLAlchemyError:
+                        error = {"error": "Unable to commit buffered votes."}
+                    with self._lock:
+                        self._committing = False
+                        self._generation += 1
+                        if not error:
+                            self._inflight_choices, self._inflight_deltas = {}, {}
+                if error:
+                    db.rollback()
+                    # put the batch back under anything recorded since, so the next tick retries it
+                    logger.error("Vote buffer flush failed: %s", error["error"])
+                    with self._lock:
+                        self._choices = {**choices, **self._choices}
+                        for option_id, delta in self._deltas.items():
+                            deltas[option_id] += delta
+                        self._deltas = deltas
+                        self._pending += flushed
+                        self._inflight_choices, self._inflight_deltas = {}, {}
+                    return 0
+                return flushed
+            finally:
+                db.close()
+
+    def _request_flush(self):
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_ms / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await asyncio.to_thread(self.flush)
+
+    def start(self):
+        if self._task is not None:
+            return
+        self.enabled = True
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush task and write out whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush)
+        self.enabled = False
+
+
+vote_buffer = VoteBuffer()
@@ -1,29 +1,586 @@
 
 # app/core/websocket_manager.py
-from typing import Set
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Hashable, Iterable, List, Optional, Set, Tuple
 from fastapi import WebSocket
-import json
 import asyncio
+import itertools
+import time
+import uuid
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.pubsub import PubSubBackend, create_backend
+from app.utils.logger import logger
+from app.utils.serialization import dumps, loads
+
+RESYNC_FRAME = dumps({"type": "resync"})
+PING_FRAME = dumps({"type": "ping"})
+PONG_FRAME = dumps({"type": "pong"})
+
+# close codes (RFC 6455)
+CLOSE_GOING_AWAY = 1001
+CLOSE_POLICY_VIOLATION = 1008
+CLOSE_MESSAGE_TOO_BIG = 1009
+CLOSE_TRY_AGAIN_LATER = 1013
+
+ALL_TOPIC = "*"                 # legacy firehose: every event
+NEW_POLLS_TOPIC = "polls:new"   # poll_created events
+TRENDING_TOPIC = "polls:trending"  # trending ranking whenever it changes
+INTERNAL_PREFIX = "internal:"   # server-to-server events; listeners only, never sent to sockets
+USERS_TOPIC = INTERNAL_PREFIX + "users"
+COUNTERS_TOPIC = INTERNAL_PREFIX + "counters"
+ACTIVITY_TOPIC = INTERNAL_PREFIX + "activity"
+
+_NO_CONNECTIONS: frozenset = frozenset()  # subscribers of a topic nobody follows
+
+
+def poll_topic(poll_id: int) -> str:
+    return f"poll:{poll_id}"
+
+
+class TooManyPolls(ValueError):
+    """A subscribe/resume message listed more poll ids than WS_MAX_POLLS_PER_MESSAGE."""
+
+
+class FrameQueue:
+    """
+    Bounded single-consumer queue of outbound frames with asyncio.Queue's put_nowait/get
+    interface. asyncio.Queue costs ~3.5 KB per instance (three deques, an Event, getter and
+    putter bookkeeping); this is a deque and one waiter, which adds up across 50k sockets.
+    """
+
+    __slots__ = ("_frames", "_maxsize", "_waiter")
+
+    def __init__(self, maxsize: int):
+        self._frames: Deque[str] = deque()
+        self._maxsize = maxsize
+        self._waiter: Optional[asyncio.Future] = None
+
+    def qsize(self) -> int:
+        return len(self._frames)
+
+    def empty(self) -> bool:
+        return not self._frames
+
+    def put_nowait(self, frame: str):
+        if self._maxsize and len(self._frames) >= self._maxsize:
+            raise asyncio.QueueFull
+        self._frames.append(frame)
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def get_nowait(self) -> str:
+        if not self._frames:
+            raise asyncio.QueueEmpty
+        return self._frames.popleft()
+
+    async def get(self) -> str:
+        while not self._frames:
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        return self._frames.popleft()
+
+
+class Connection:
+    """One accepted socket with its bounded outbound queue, writer task and inbound token bucket."""
+
+    # one per client on the broadcast path: no per-instance __dict__ across tens of thousands of sockets
+    __slots__ = ("websocket", "queue", "writer", "topics", "last_seen", "tokens", "refilled_at", "paused")
+
+    def __init__(self, websocket: WebSocket, queue_size: int, burst: int):
+        self.websocket = websocket
+        self.queue = FrameQueue(queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        self.topics: Set[str] = set()
+        self.last_seen = time.monotonic()
+        self.tokens = float(burst)
+        self.refilled_at = self.last_seen
+        self.paused = False  # skipped by flush() until the client resumes
+
 
 class WebSocketManager:
-    def __init__(self):
-        self.active_connections: Set[WebSocket] = set()
+    """
+    Broadcast pipeline: publishers only enqueue, never await sockets.
+
+    publish() stores the event under a coalescing key, so several vote/like events for
+    the same poll and option within one tick collapse into their latest state. A flusher
+    task encodes each pending event once per tick and puts the frame on every
+    connection's bounded queue. Each connection drains its own queue in a writer task,
+    so a slow client only delays itself. A connection whose queue overflows is either
+    resynced (queue cleared, told to refetch) or dropped, per WS_SLOW_CONSUMER_POLICY.
+
+    Events are published to a topic ("poll:<id>" or "polls:new") and only reach the
+    connections indexed under it. New connections start on the "*" firehose until they
+    send their first subscribe/unsubscribe message.
+
+    publish() goes through a pluggable pub/sub backend so that, with several workers,
+    each event is published once and every process relays it to its own sockets.
+
+    Every event frame carries a per-process sequence number ("seq") and the last
+    `replay_size` frames are kept in a ring. A reconnecting (or resynced) client sends
+    {"action": "resume", "epoch": ..., "seq": <last seen>, "polls": [...]} and gets just
+    the frames it missed; if they are gone (or it was talking to another process, i.e.
+    another epoch) it gets a compact snapshot of its polls followed by the frames
+    sequenced while that snapshot was read.
+
+    Dead connections are normally found by the server's protocol-level ping/pong, which
+    browsers answer on their own. With `idle_timeout_s` set, a heartbeat task also sends
+    {"type": "ping"} to connections quiet for `ping_interval_s` and closes those that sent
+    nothing for `idle_timeout_s`, for servers that don't ping. Client messages are size-
+    and rate-limited per connection (token bucket), and clients beyond `max_connections`
+    are closed with 1013.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = settings.WS_QUEUE_SIZE,
+        tick_ms: int = settings.WS_BROADCAST_TICK_MS,
+        slow_consumer_policy: str = settings.WS_SLOW_CONSUMER_POLICY,
+        backend: Optional[PubSubBackend] = None,
+        max_connections: int = settings.WS_MAX_CONNECTIONS,
+        ping_interval_s: float = settings.WS_PING_INTERVAL_S,
+        idle_timeout_s: float = settings.WS_IDLE_TIMEOUT_S,
+        inbound_rate: float = settings.WS_INBOUND_RATE,
+        inbound_burst: int = settings.WS_INBOUND_BURST,
+        max_message_bytes: int = settings.WS_MAX_MESSAGE_BYTES,
+        max_polls_per_message: int = settings.WS_MAX_POLLS_PER_MESSAGE,
+        replay_size: int = settings.WS_REPLAY_BUFFER,
+    ):
+        self.queue_size = queue_size
+        self.tick_ms = tick_ms
+        self.slow_consumer_policy = slow_consumer_policy
+        self.max_connections = max_connections
+        self.ping_interval_s = ping_interval_s
+        self.idle_timeout_s = idle_timeout_s
+        self.inbound_rate = inbound_rate
+        self.inbound_burst = inbound_burst
+        self.max_message_bytes = max_message_bytes
+        self.max_polls_per_message = max_polls_per_message
+        self.replay_size = replay_size
+        self.epoch = uuid.uuid4().hex[:12]
+        self.seq = 0
+        self._replay: Deque[Tuple[int, Optional[str], str]] = deque(maxlen=replay_size or None)
+        # (poll_ids, newer_than) -> {"polls": [...], "new_polls": [...]} for resume snapshots
+        self.snapshot_loader: Optional[Callable[[List[int], Optional[int]], Awaitable[Optional[dict]]]] = None
+        self.active_connections: Dict[WebSocket, Connection] = {}
+        self.topics: Dict[str, Set[Connection]] = {}
+        self._pending: Dict[Hashable, Tuple[Optional[str], dict]] = {}
+        self._unique_keys = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self.frames_enqueued = 0
+        self.slow_consumers = 0
+        self.rejected_connections = 0
+        self.idle_evictions = 0
+        self.rate_limited = 0
+        self.replays = 0
+        self.snapshots = 0
+        self.backend = backend or create_backend()
+        self.backend.attach(self.publish_local)
+        self._listeners: List[Tuple[Callable[[Optional[str], dict], None], bool]] = []
+
+    def add_listener(self, listener: Callable[[Optional[str], dict], None], relayed_only: bool = False):
+        """
+        Call `listener(topic, message)` for every event this process receives, local or relayed,
+        or with `relayed_only` only for events published by other processes.
+        """
+        if all(registered != listener for registered, _ in self._listeners):
+            self._listeners.append((listener, relayed_only))
 
-    async def connect(self, websocket: WebSocket):
+    async def start(self):
+        await self.backend.start()
+
+    async def connect(self, websocket: WebSocket) -> bool:
+        """Accept the socket and register it; False (socket closed with 1013) when at the connection limit."""
         await websocket.accept()
-        self.active_connections.add(websocket)
+        if self.max_connections and len(self.active_connections) >= self.max_connections:
+            self.rejected_connections += 1
+            await self._close(websocket, CLOSE_TRY_AGAIN_LATER, "Too many connections")
+            return False
+        conn = Connection(websocket, self.queue_size, self.inbound_burst)
+        conn.writer = asyncio.create_task(self._write_loop(conn))
+        self.active_connections[websocket] = conn
+        self._join(conn, ALL_TOPIC)
+        self._ensure_started()
+        if self.idle_timeout_s > 0 and self.ping_interval_s > 0 and (self._heartbeat is None or self._heartbeat.done()):
+            self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+        return True
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        conn = self.active_connections.pop(websocket, None)
+        if conn is None:
+            return
+        for topic in list(conn.topics):
+            self._leave(conn, topic)
+        if conn.writer and conn.writer is not asyncio.current_task():
+            conn.writer.cancel()
+
+    def _join(self, conn: Connection, topic: str):
+        conn.topics.add(topic)
+        self.topics.setdefault(topic, set()).add(conn)
+
+    def _leave(self, conn: Connection, topic: str):
+        conn.topics.discard(topic)
+        members = self.topics.get(topic)
+        if members is not None:
+            members.discard(conn)
+            if not members:
+                del self.topics[topic]
+
+    def subscribe(self, websocket: WebSocket, topics: Iterable[str]) -> List[str]:
+        conn = self.active_connections.get(websocket)
+        if conn is None:
+            return []
+        topics = set(topics)
+        if ALL_TOPIC not in topics:
+            # an explicit subscription opts the connection out of the firehose
+            self._leave(conn, ALL_TOPIC)
+        for topic in topics:
+            self._join(conn, topic)
+        return sorted(conn.topics)
+
+    def unsubscribe(self, websocket: WebSocket, topics: Iterable[str]) -> List[str]:
+        conn = self.active_connections.get(websocket)
+        if conn is None:
+            return []
+        self._leave(conn, ALL_TOPIC)
+        for topic in topics:
+            self._leave(conn, topic)
+        return sorted(conn.topics)
+
+    async def receive(self, websocket: WebSocket, text: str) -> bool:
+        """
+        Account for one client message and apply it. Returns False once the connection
+        has been closed for breaking the size or rate limit.
+        """
+        conn = self.active_connections.get(websocket)
+        if conn is None:
+            return False
+        now = time.monotonic()
+        conn.last_seen = now
+        # a character is 1-4 bytes in UTF-8: only encode when the character count cannot decide
+        if len(text) > self.max_message_bytes or (
+            len(text) * 4 > self.max_message_bytes and len(text.encode()) > self.max_message_bytes
+        ):
+            await self.evict(websocket, CLOSE_MESSAGE_TOO_BIG, "Message too big")
+            return False
+        conn.tokens = min(self.inbound_burst, conn.tokens + (now - conn.refilled_at) * self.inbound_rate)
+        conn.refilled_at = now
+        if conn.tokens < 1:
+            self.rate_limited += 1
+            await self.evict(websocket, CLOSE_POLICY_VIOLATION, "Rate limit exceeded")
+            return False
+        conn.tokens -= 1
+
+        try:
+            message = loads(text)
+        except ValueError:
+            message = None
+        if isinstance(message, dict) and message.get("action") == "resume":
+            await self._resume(conn, message)
+        elif not isinstance(message, dict) or not self.handle_client_message(websocket, message):
+            self._offer(conn, dumps({"type": "error", "message": "Unsupported message"}))
+        return True
+
+    def handle_client_message(self, websocket: WebSocket, message: dict) -> bool:
+        """
+        Apply a control message: subscriptions, e.g.
+        {"action": "subscribe", "polls": [1, 2], "new_polls": true, "trending": true}, and heartbeats
+        ({"action": "pong"} answers a server ping, {"action": "ping"} gets a pong).
+        Returns False if the message is not a control message.
+        """
+        action = message.get("action")
+        conn = self.active_connections.get(websocket)
+        if action == "pong":
+            return True  # receiving it already marked the connection alive
+        if action == "ping":
+            if conn is not None:
+                self._offer(conn, PONG_FRAME)
+            return True
+        if action not in ("subscribe", "unsubscribe"):
+            return False
+        try:
+            topics = self._message_topics(message)
+        except (TypeError, ValueError) as exc:
+            if conn is not None:
+                self._offer(conn, dumps({"type": "error", "message": self._topics_error(exc, "Invalid poll ids")}))
+            return True
+        if conn is not None:
+            conn.paused = False  # a client that (re)subscribes instead of resuming has refetched
+        if action == "subscribe":
+            current = self.subscribe(websocket, topics)
+        else:
+            current = self.unsubscribe(websocket, topics)
+        if conn is not None:
+            # frames up to `seq` for these topics are already queued ahead of this ack
+            self._offer(conn, dumps({"type": "subscriptions", "topics": current, "epoch": self.epoch, "seq": self.seq}))
+        return True
+
+    def _message_topics(self, message: dict) -> List[str]:
+        poll_ids = message.get("polls") or []
+        if len(poll_ids) > self.max_polls_per_message:
+            raise TooManyPolls(f"At most {self.max_polls_per_message} poll ids per message")
+        topics = [poll_topic(int(poll_id)) for poll_id in poll_ids]
+        if message.get("new_polls"):
+            topics.append(NEW_POLLS_TOPIC)
+        if message.get("trending"):
+            topics.append(TRENDING_TOPIC)
+        if message.get("all"):
+            topics.append(ALL_TOPIC)
+        return topics
+
+    @staticmethod
+    def _topics_error(exc: Exception, default: str) -> str:
+        return str(exc) if isinstance(exc, TooManyPolls) else default
+
+    async def _resume(self, conn: Connection, message: dict):
+        """
+        Subscribe to the message's topics, then replay what the client missed or snapshot it.
+        A client with more polls than fit in one message sends them in several resume messages,
+        all but the last with "more": true; those only subscribe and hold live frames back until
+        the last one replays or snapshots every subscribed topic in order.
+        """
+        try:
+            topics = self._message_topics(message)
+            seq = int(message.get("seq") or 0)
+        except (TypeError, ValueError) as exc:
+            self._offer(conn, dumps({"type": "error", "message": self._topics_error(exc, "Invalid resume message")}))
+            return
+        if message.get("more"):
+            conn.paused = True
+            self.subscribe(conn.websocket, topics)
+            return
+        self.subscribe(conn.websocket, topics)
+        if message.get("epoch") == self.epoch and self._replay_since(conn, seq):
+            self.replays += 1
+            return
+
+        poll_ids = sorted(int(topic[len("poll:"):]) for topic in conn.topics if topic.startswith("poll:"))
+        newer_than = max(poll_ids) if message.get("new_polls") and poll_ids else None
+        for _ in range(3):
+            # frames sequenced while the snapshot is read are replayed right after it
+            conn.paused = True
+            since = self.seq
+            snapshot = await self.snapshot_loader(poll_ids, newer_than) if self.snapshot_loader else None
+            if conn.websocket not in self.active_connections:
+                return
+            if snapshot is None:
+                break
+            self.snapshots += 1
+            self._offer(conn, dumps({"type": "snapshot", "epoch": self.epoch, "seq": since, **snapshot}))
+            if self._replay_since(conn, since):
+                return
+        # no usable snapshot: fall back to a full refetch on the client
+        conn.paused = False
+        self._offer(conn, RESYNC_FRAME)
+
+    def _replay_since(self, conn: Connection, seq: int) -> bool:
+        """Queue the buffered frames after `seq` for the connection's topics and unpause it; False if any are gone."""
+        if seq > self.seq:
+            return False
+        first = self._replay[0][0] if self._replay else self.seq + 1
+        if seq + 1 < first:
+            return False
+        frames = [
+            text for _, topic, text in itertools.islice(self._replay, seq + 1 - first, None)
+            if topic is None or topic in conn.topics or ALL_TOPIC in conn.topics
+        ]
+        if len(frames) >= self.queue_size - conn.queue.qsize():
+            return False  # would overflow the queue; a snapshot is smaller
+        for text in frames:
+            conn.queue.put_nowait(text)
+        self.frames_enqueued += len(frames)
+        conn.paused = False
+        self._offer(conn, dumps({"type": "resumed", "epoch": self.epoch, "seq": self.seq, "replayed": len(frames)}))
+        return True
+
+    def publish(self, message: dict, topic: Optional[str] = None):
+        """
+        Publish an event to every process. Safe to call from request handlers; never blocks.
+        `topic=None` addresses every connection.
+        """
+        self.backend.publish(topic, message)
+
+    def publish_local(self, topic: Optional[str], message: dict, relayed: bool = False):
+        """Queue an event for this process's sockets on the next tick."""
+        for listener, relayed_only in self._listeners:
+            if relayed or not relayed_only:
+                listener(topic, message)
+        if topic is not None and topic.startswith(INTERNAL_PREFIX):
+            return
+        if not self.replay_size:
+            # without replay an event nobody is listening to now can be dropped
+            if not self.active_connections:
+                return
+            if topic is not None and topic not in self.topics and ALL_TOPIC not in self.topics:
+                return
+        self._pending[self._coalesce_key(message)] = (topic, message)
+        self._ensure_started()
+        if self.tick_ms <= 0:
+            self._wakeup.set()
+
+    def _coalesce_key(self, message: dict) -> Hashable:
+        payload = message.get("payload") or {}
+        if message.get("type") == "vote":
+            return ("vote", payload.get("poll_id"), payload.get("option_id"))
+        if message.get("type") == "like":
+            return ("like", payload.get("poll_id"))
+        if message.get("type") == "trending":
+            return ("trending",)  # only the latest ranking matters
+        # everything else (e.g. poll_created) is delivered as-is
+        return ("event", next(self._unique_keys))
+
+    def _ensure_started(self):
+        if self._flusher is None or self._flusher.done():
+            self._wakeup = asyncio.Event()
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            if self.tick_ms > 0:
+                await asyncio.sleep(self.tick_ms / 1000)
+            else:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+            if self._pending:
+                self.flush()
+
+    def _recipients(self, topic: Optional[str]) -> Iterable[Connection]:
+        """The connections an event on `topic` goes to, iterating the live subscriber sets without copying them."""
+        if topic is None:
+            return self.active_connections.values()
+        members = self.topics.get(topic, _NO_CONNECTIONS)
+        firehose = self.topics.get(ALL_TOPIC, _NO_CONNECTIONS)
+        if not firehose:
+            return members
+        if not members:
+            return firehose
+        return itertools.chain(members, (conn for conn in firehose if conn not in members))
+
+    def flush(self):
+        """Sequence and encode every pending event once and fan the same frame out to its topic's queues."""
+        started = time.perf_counter()
+        pending, self._pending = self._pending, {}
+        overflowed: Set[Connection] = set()
+        for topic, message in pending.values():
+            recipients = self._recipients(topic)
+            if not recipients and not self.replay_size:
+                continue
+            self.seq += 1
+            text = dumps({**message, "seq": self.seq})
+            if self.replay_size:
+                self._replay.append((self.seq, topic, text))
+            for conn in recipients:
+                if conn.paused or conn in overflowed:
+                    continue
+                try:
+                    conn.queue.put_nowait(text)
+                    self.frames_enqueued += 1
+                except asyncio.QueueFull:
+                    overflowed.add(conn)
+        # only now, since dropping a connection changes the subscriber sets iterated above
+        for conn in overflowed:
+            self._handle_slow_consumer(conn)
+        metrics.broadcast_seconds.observe(time.perf_counter() - started)
+
+    def _offer(self, conn: Connection, text: str) -> bool:
+        try:
+            conn.queue.put_nowait(text)
+            self.frames_enqueued += 1
+            return True
+        except asyncio.QueueFull:
+            self._handle_slow_consumer(conn)
+            return False
+
+    def _handle_slow_consumer(self, conn: Connection):
+        self.slow_consumers += 1
+        if self.slow_consumer_policy == "drop":
+            logger.warning("Dropping slow WebSocket consumer %s", conn.websocket.client)
+            self.disconnect(conn.websocket)
+            asyncio.create_task(self._close(conn.websocket, CLOSE_TRY_AGAIN_LATER, "Too slow"))
+            return
+        # resync: discard the backlog and tell the client to resume from its last seq
+        # (or refetch current state); with replay, hold live frames until it does
+        while not conn.queue.empty():
+            conn.queue.get_nowait()
+        conn.queue.put_nowait(RESYNC_FRAME)
+        conn.paused = bool(self.replay_size)
+
+    async def _write_loop(self, conn: Connection):
+        try:
+            while True:
+                text = await conn.queue.get()
+                await conn.websocket.send_text(text)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.disconnect(conn.websocket)
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.ping_interval_s)
+            self.sweep()
+
+    def sweep(self, now: Optional[float] = None):
+        """Close idle connections and ping the quiet ones. Runs every ping interval."""
+        now = time.monotonic() if now is None else now
+        for conn in list(self.active_connections.values()):
+            quiet = now - conn.last_seen
+            if self.idle_timeout_s > 0 and quiet >= self.idle_timeout_s:
+                self.idle_evictions += 1
+                self.disconnect(conn.websocket)
+                asyncio.create_task(self._close(conn.websocket, CLOSE_GOING_AWAY, "Idle timeout"))
+            elif quiet >= self.ping_interval_s:
+                self._offer(conn, PING_FRAME)
+
+    async def evict(self, websocket: WebSocket, code: int, reason: str = ""):
+        self.disconnect(websocket)
+        await self._close(websocket, code, reason)
+
+    def stats(self) -> dict:
+        depths = [conn.queue.qsize() for conn in self.active_connections.values()]
+        return {
+            "connections": len(self.active_connections),
+            "topics": len(self.topics),
+            "pending_events": len(self._pending),
+            "queued_frames": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "frames_enqueued": self.frames_enqueued,
+            "slow_consumers": self.slow_consumers,
+            "rejected_connections": self.rejected_connections,
+            "idle_evictions": self.idle_evictions,
+            "rate_limited": self.rate_limited,
+            "seq": self.seq,
+            "replay_frames": len(self._replay),
+            "replays": self.replays,
+            "snapshots": self.snapshots,
+        }
+
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int, reason: str = ""):
+        try:
+            await websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+    async def stop(self):
+        """Flush what is pending and stop all background tasks."""
+        await self.backend.stop()
+        if self._pending:
+            self.flush()
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        for websocket in list(self.active_connections):
+            self.disconnect(websocket)
 
-    async def broadcast(self, message: dict):
-        text = json.dumps(message)
-        # iterate over snapshot to avoid runtime mutation issues
-        for conn in list(self.active_connections):
-            try:
-                await conn.send_text(text)
-            except Exception:
-                self.disconnect(conn)
 
 ws_manager = WebSocketManager()
@@ -1,15 +1,107 @@
 # app/main.py
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-import uvicorn
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
 import asyncio
 
 
 from app.core.config import settings
-from app.core.database import init_db
+from app.core.database import SessionLocal, engine, get_db_runner, init_db
+from app.core.migrations import pending_migrations
+from app.repositories.poll_repository import PollRepository
+from app.repositories.user_repository import UserRepository
+from app.services.async_poll_service import AsyncPollService
 from app.api.router import router as api_router
-from app.core.websocket_manager import ws_manager
+from app.core.websocket_manager import TRENDING_TOPIC, ws_manager
+from app.core.vote_buffer import vote_buffer
+from app.core.poll_cache import poll_cache
+from app.core.pubsub import events_reach_all_workers
+from app.core.user_cache import user_cache
+from app.core.counter_shards import hot_counters
+from app.core.search import search_index, use_memory_index
+from app.core.trending import REBUILD_HALF_LIVES, trending
+from app.core.idempotency import idempotency
+from app.core.metrics import MetricsMiddleware, metrics, stats_collector
+
+
+def register_metric_collectors():
+    collectors = {
+        "ws": stats_collector(
+            "ws", ws_manager.stats,
+            counters=(
+                "frames_enqueued", "slow_consumers", "rejected_connections", "idle_evictions", "rate_limited",
+                "replays", "snapshots",
+            ),
+        ),
+        "poll_cache": stats_collector("poll_cache", poll_cache.stats, counters=("hits", "misses", "evictions")),
+        "user_cache": stats_collector("user_cache", user_cache.stats, counters=("hits", "misses", "bloom_rejects")),
+        "vote_buffer": stats_collector("vote_buffer", lambda: {"pending_votes": vote_buffer.pending}),
+        "counter_shards": stats_collector("counter_shards", hot_counters.stats),
+        "search_index": stats_collector("search_index", search_index.stats),
+        "trending": stats_collector("trending", trending.stats),
+        "idempotency": stats_collector(
+            "idempotency", idempotency.stats, counters=("executed", "replayed", "coalesced", "conflicts"),
+        ),
+    }
+    for name, collector in collectors.items():
+        metrics.add_collector(name, collector)
+
+
+def load_user_bloom():
+    db = SessionLocal()
+    try:
+        user_cache.load_bloom(
+            UserRepository(db).iter_emails(),
+            capacity=settings.USER_BLOOM_CAPACITY,
+            error_rate=settings.USER_BLOOM_ERROR_RATE,
+        )
+    finally:
+        db.close()
+
+
+def load_sharded_polls():
+    db = SessionLocal()
+    try:
+        hot_counters.load(PollRepository(db).get_sharded_polls())
+    finally:
+        db.close()
+
+
+def load_search_index():
+    db = SessionLocal()
+    try:
+        search_index.load(PollRepository(db).iter_search_rows())
+    finally:
+        db.close()
+
+
+def load_trending():
+    """Replay the votes and likes recent enough to still weigh in the trending ranking."""
+    since = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(
+        seconds=trending.half_life_s * REBUILD_HALF_LIVES
+    )
+    db = SessionLocal()
+    try:
+        trending.load(PollRepository(db).iter_activity_since(since))
+    finally:
+        db.close()
+
+
+def apply_trending_event(topic: Optional[str], message: dict):
+    """Feed activity from every worker to the board and push ranking changes to this worker's sockets."""
+    if trending.apply_event(topic, message):
+        ws_manager.publish_local(TRENDING_TOPIC, {"type": "trending", "payload": {"polls": trending.ranking()}})
+
+
+async def load_resume_snapshot(poll_ids: List[int], newer_than: Optional[int]) -> Optional[dict]:
+    """Snapshot for a WebSocket client whose missed events are no longer buffered."""
+    async with asynccontextmanager(get_db_runner)() as run:
+        snapshot = await AsyncPollService(run).resume_snapshot(poll_ids[:500], newer_than=newer_than)
+    return None if "error" in snapshot else snapshot
+
 
 # -------------------------
 # Lifespan for startup/shutdown
@@ -17,12 +109,58 @@ from app.core.websocket_manager import ws_manager
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # --- Startup ---
-    init_db()
-    print("✅ Database initialized")
+    if settings.DATABASE_INIT_SCHEMA:
+        init_db()
+        print("✅ Database initialized")
+    elif pending := pending_migrations(engine):
+        print(f"⚠️ Schema is behind ({', '.join(pending)} pending): run `python -m app.manage migrate`")
+    if settings.USER_BLOOM_FILTER_ENABLED and settings.WS_PUBSUB_BACKEND == "memory":
+        # users created by other workers would never reach this worker's filter and read as unknown
+        print("⚠️ USER_BLOOM_FILTER_ENABLED needs a cross-process WS_PUBSUB_BACKEND: Bloom filter not loaded")
+    elif settings.USER_BLOOM_FILTER_ENABLED:
+        await asyncio.to_thread(load_user_bloom)
+        print("✅ User Bloom filter loaded")
+    ws_manager.add_listener(user_cache.apply_event)
+    if settings.POLL_CACHE_ENABLED and not events_reach_all_workers():
+        print(f"⚠️ POLL_CACHE_ENABLED with {settings.WORKERS} workers needs a cross-process WS_PUBSUB_BACKEND: poll cache off")
+    elif settings.POLL_CACHE_ENABLED:
+        # votes and likes relayed from other workers drop the snapshots they touch
+        ws_manager.add_listener(poll_cache.apply_event, relayed_only=True)
+    if settings.COUNTER_SHARDS_ENABLED:
+        await asyncio.to_thread(load_sharded_polls)
+        ws_manager.add_listener(hot_counters.apply_event)
+        print("✅ Sharded vote counters enabled")
+    if use_memory_index(engine):
+        if events_reach_all_workers():
+            # listen first: polls created while loading are applied once the load is done
+            ws_manager.add_listener(search_index.apply_event)
+        else:
+            # other workers' poll_created events never arrive here: searches read new polls from the DB
+            search_index.catches_up = True
+            print(f"⚠️ In-memory search with {settings.WORKERS} workers and no cross-process WS_PUBSUB_BACKEND: "
+                  "catching up from the database on search")
+        await asyncio.to_thread(load_search_index)
+        print("✅ In-memory search index loaded")
+    if settings.TRENDING_ENABLED and not events_reach_all_workers():
+        # each worker would rank only the activity it served itself
+        print(f"⚠️ TRENDING_ENABLED with {settings.WORKERS} workers needs a cross-process WS_PUBSUB_BACKEND: trending off")
+    elif settings.TRENDING_ENABLED:
+        ws_manager.add_listener(apply_trending_event)
+        await asyncio.to_thread(load_trending)
+        print("✅ Trending polls rebuilt")
+    ws_manager.snapshot_loader = load_resume_snapshot
+    await ws_manager.start()
+    if settings.VOTE_BUFFER_ENABLED:
+        vote_buffer.start()
+        print("✅ Buffered vote tally enabled")
 
     yield  # Application runs here
 
     # --- Shutdown ---
+    if vote_buffer.enabled:
+        await vote_buffer.stop()
+        print("✅ Buffered votes flushed")
+    await ws_manager.stop()
     print("🛑 Application shutting down")
 
 # -------------------------
@@ -40,6 +178,9 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    if settings.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+
     # Include API routers first
     app.include_router(api_router, prefix="")
 
@@ -48,23 +189,25 @@ def create_app() -> FastAPI:
     def health():
         return {"status": "ok", "app": settings.APP_NAME}
 
+    if settings.METRICS_ENABLED:
+        register_metric_collectors()
+
+        @app.get("/metrics", include_in_schema=False)
+        def prometheus_metrics():
+            return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
     # -------------------------
     # WebSocket endpoint
     # -------------------------
    
     @app.websocket("/ws")
     async def websocket_endpoint(ws: WebSocket):
-        await ws_manager.connect(ws)
+        if not await ws_manager.connect(ws):
+            return
         print(f"🟢 WebSocket connected: {ws.client}")
         try:
-            while True:
-               
-                    msg = await ws.receive_text()
-                    print(f"Received: {msg}")
-                    await ws_manager.broadcast({"message": msg})
-                # except asyncio.TimeoutError:
-                #     # send heartbeat every 30s
-                #     await ws_manager.broadcast({"message":"ping"})
+            while await ws_manager.receive(ws, await ws.receive_text()):
+                pass
         except WebSocketDisconnect:
             ws_manager.disconnect(ws)
             print(f"🔴 WebSocket disconnected: {ws.client}")
@@ -77,18 +220,31 @@ def create_app() -> FastAPI:
 
 
 # -------------------------
-# Create app instance
+# App instance, built on first access (`uvicorn app.main:app`) rather than on import
 # -------------------------
-app = create_app()
+_app: Optional[FastAPI] = None
+
+
+def __getattr__(name: str):
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # -------------------------
 # Uvicorn entrypoint
 # -------------------------
 if __name__ == "__main__":
+    import uvicorn  # only needed when the app serves itself; `uvicorn app.main:app` already has it
+
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=8000,
         reload=True,
-        log_level="info"
+        log_level="info",
+        ws_ping_interval=settings.WS_PING_INTERVAL_S,
+        ws_ping_timeout=settings.WS_PING_TIMEOUT_S,
     )
@@ -0,0 +1,147 @@
+# app/manage.py
+"""
+One-off maintenance commands.
+
+Usage:
+    python -m app.manage migrate
+    python -m app.manage check-query-plans
+    python -m app.manage reconcile-likes
+    python -m app.manage reconcile-votes
+    python -m app.manage profile-startup
+"""
+import argparse
+import json
+import subprocess
+import sys
+from collections import defaultdict
+
+from app.core.config import settings
+
+from app.core.database import SessionLocal, engine, init_db
+from app.core.migrations import MIGRATIONS, applied_versions
+from app.repositories.poll_repository import PollRepository
+from app.repositories.user_repository import UserRepository  # noqa: F401  registers the users table
+from app.repositories.idempotency_repository import IdempotencyRepository  # noqa: F401  registers the idempotency_keys table
+
+
+def migrate() -> int:
+    """Create missing tables and apply pending migrations (the app also does this at startup)."""
+    init_db()
+    done = applied_versions(engine)
+    for version, name, _ in MIGRATIONS:
+        print(f"{'✅' if version in done else '❌'} {version}_{name}")
+    return 0 if done >= {version for version, _, _ in MIGRATIONS} else 1
+
+
+def check_query_plans() -> int:
+    """Print the plan of every hot lookup; fail if any of them scans a table instead of seeking an index."""
+    from app.core.query_plans import check_query_plans as check
+
+    init_db()
+    failed = 0
+    for name, plan, seeks in check(engine):
+        print(f"{'✅' if seeks else '❌'} {name}")
+        for line in plan:
+            print(f"     {line}")
+        failed += not seeks
+    return 1 if failed else 0
+
+
+def _run_reconcile(reconcile, label: str) -> int:
+    init_db()  # applies the migrations the reconcile statements rely on
+    db = SessionLocal()
+    try:
+        result = reconcile(PollRepository(db))
+    finally:
+        db.close()
+    if isinstance(result, dict) and "error" in result:
+        print(f"❌ {result['error']}")
+        return 1
+    print(f"✅ Rebuilt {label} for {result} rows")
+    return 0
+
+
+def reconcile_likes() -> int:
+    return _run_reconcile(lambda repo: repo.reconcile_like_counts(), "polls.likes_count")
+
+
+def reconcile_votes() -> int:
+    return _run_reconcile(lambda repo: repo.reconcile_vote_counts(), "options.votes_count")
+
+
+# run in a fresh interpreter: the phases of a worker boot, then peak RSS, as one JSON line
+_STARTUP_PROBE = """
+import asyncio, json, resource, sys, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+application = app.main.create_app()
+created = time.perf_counter()
+
+async def boot():
+    async with application.router.lifespan_context(application):
+        return time.perf_counter()
+
+ready = asyncio.run(boot())
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 ** 2 if sys.platform == "darwin" else 1024)
+print(json.dumps({"import_ms": (imported - started) * 1000, "create_app_ms": (created - imported) * 1000,
+                  "lifespan_ms": (ready - created) * 1000, "rss_mb": rss}))
+"""
+
+
+def profile_startup(top: int = 10) -> int:
+    """Boot the app in a fresh interpreter; report time per phase, peak RSS and the slowest imports against the budget."""
+    probe = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _STARTUP_PROBE], capture_output=True, text=True
+    )
+    if probe.returncode != 0:
+        print(probe.stderr.strip().splitlines()[-1] if probe.stderr.strip() else "❌ Startup failed")
+        return 1
+    report = json.loads(probe.stdout.strip().splitlines()[-1])
+
+    # "import time: self [us] | cumulative | imported package" per module, from -X importtime
+    modules = []
+    for line in probe.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line and "self [us]" not in line:
+            own, _, name = line[len("import time:"):].split("|")
+            modules.append((int(own) / 1000, name.strip()))
+    by_package = defaultdict(float)
+    for own_ms, name in modules:
+        by_package[name.split(".")[0]] += own_ms
+
+    total_ms = report["import_ms"] + report["create_app_ms"] + report["lifespan_ms"]
+    time_ok = total_ms <= settings.STARTUP_TIME_BUDGET_MS
+    rss_ok = report["rss_mb"] <= settings.STARTUP_RSS_BUDGET_MB
+    print(
+        f"{'✅' if time_ok else '❌'} startup {total_ms:.0f} ms (budget {settings.STARTUP_TIME_BUDGET_MS:.0f} ms): "
+        f"imports {report['import_ms']:.0f} ms, create_app {report['create_app_ms']:.0f} ms, "
+        f"lifespan {report['lifespan_ms']:.0f} ms"
+    )
+    print(f"{'✅' if rss_ok else '❌'} peak RSS {report['rss_mb']:.1f} MB (budget {settings.STARTUP_RSS_BUDGET_MB:.0f} MB)")
+    print("Import time by top-level package:")
+    for name, own_ms in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+        print(f"     {own_ms:8.1f} ms  {name}")
+    print("Slowest modules (own time):")
+    for own_ms, name in sorted(modules, reverse=True)[:top]:
+        print(f"     {own_ms:8.1f} ms  {name}")
+    return 0 if time_ok and rss_ok else 1
+
+
+COMMANDS = {
+    "migrate": migrate,
+    "check-query-plans": check_query_plans,
+    "reconcile-likes": reconcile_likes,
+    "reconcile-votes": reconcile_votes,
+    "profile-startup": profile_startup,
+}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.manage")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args(argv)
+    return COMMANDS[args.command]()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,15 @@
+# app/models/idempotency.py
+from sqlalchemy import Column, Integer, LargeBinary, String, UniqueConstraint
+from app.core.database import Base
+
+class IdempotencyKey(Base):
+    """Outcome of a write request sent with an Idempotency-Key header, replayed to its retries."""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (UniqueConstraint("key", "user", name="uq_idempotency_keys_key_user"),)
+    id = Column(Integer, primary_key=True)
+    key = Column(String(255), nullable=False)
+    user = Column(String, nullable=False)  # who sent it: voter, user_identifier or created_by
+    fingerprint = Column(String(32), nullable=False)  # hash of method, path and body
+    status_code = Column(Integer, nullable=True)  # NULL while the first request is still running
+    body = Column(LargeBinary, nullable=True)  # the JSON response
+    created_at = Column(Integer, nullable=False, index=True)  # unix time the key was claimed
@@ -1,6 +1,6 @@
 
 # app/models/poll.py
-from sqlalchemy import Column, Integer, String, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, DateTime, Integer, String, ForeignKey, UniqueConstraint, func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
@@ -9,6 +9,7 @@ class Poll(Base):
     id = Column(Integer, primary_key=True, index=True)
     question = Column(String, nullable=False)
     created_by = Column(String, nullable=False)  # placeholder; can be user id/email later
+    likes_count = Column(Integer, default=0, server_default="0", nullable=False)  # denormalized from likes
 
     options = relationship("Option", back_populates="poll", cascade="all, delete-orphan")
     votes = relationship("Vote", back_populates="poll", cascade="all, delete-orphan")
@@ -19,21 +20,51 @@ class Option(Base):
     id = Column(Integer, primary_key=True, index=True)
     text = Column(String, nullable=False)
     votes_count = Column(Integer, default=0, nullable=False)
-    poll_id = Column(Integer, ForeignKey("polls.id"))
+    poll_id = Column(Integer, ForeignKey("polls.id"), index=True)
     poll = relationship("Poll", back_populates="options")
 
 class Vote(Base):
     __tablename__ = "votes"
+    __table_args__ = (UniqueConstraint("poll_id", "voter", name="uq_votes_poll_voter"),)
     id = Column(Integer, primary_key=True, index=True)
     poll_id = Column(Integer, ForeignKey("polls.id"), nullable=False)
-    option_id = Column(Integer, ForeignKey("options.id"), nullable=False)
+    option_id = Column(Integer, ForeignKey("options.id"), nullable=False, index=True)
     voter = Column(String, nullable=False)  # placeholder for user identifier (email/id)
+    voted_at = Column(DateTime, default=func.now(), index=True)  # when the current choice was made
     poll = relationship("Poll", back_populates="votes")
 
+class OptionCounterShard(Base):
+    """One slot of a sharded vote counter: an option's count is votes_count plus all of its slots."""
+    __tablename__ = "option_counter_shards"
+    __table_args__ = (UniqueConstraint("option_id", "shard", name="uq_counter_shards_option_shard"),)
+    id = Column(Integer, primary_key=True)
+    poll_id = Column(Integer, ForeignKey("polls.id"), nullable=False, index=True)
+    option_id = Column(Integer, ForeignKey("options.id"), nullable=False)
+    shard = Column(Integer, nullable=False)
+    count = Column(Integer, nullable=False, default=0)  # may go negative; only the sum is meaningful
+
+class OptionVoteBucket(Base):
+    """
+    Net votes an option gained (or lost to other options) within one time bucket. Votes on
+    a poll with sharded counters land in the voter's counter slot, so a bucket is the sum of
+    its shard rows; every other vote uses shard 0.
+    """
+    __tablename__ = "option_vote_buckets"
+    __table_args__ = (
+        UniqueConstraint("option_id", "bucket_s", "bucket_start", "shard", name="uq_vote_buckets_option_bucket_shard"),
+    )
+    id = Column(Integer, primary_key=True)
+    option_id = Column(Integer, ForeignKey("options.id"), nullable=False)
+    bucket_s = Column(Integer, nullable=False)      # bucket width: 60 (minute) or 3600 (hour)
+    bucket_start = Column(Integer, nullable=False)  # unix time the bucket starts at
+    shard = Column(Integer, nullable=False, default=0, server_default="0")
+    delta = Column(Integer, nullable=False, default=0)
+
 class Like(Base):
     __tablename__ = "likes"
+    __table_args__ = (UniqueConstraint("poll_id", "user_identifier", name="uq_likes_poll_user"),)
     id = Column(Integer, primary_key=True, index=True)
     poll_id = Column(Integer, ForeignKey("polls.id"), nullable=False)
     user_identifier = Column(String, nullable=False)  # placeholder for user identifier (email/id)
+    liked_at = Column(DateTime, default=func.now(), index=True)
     poll = relationship("Poll", back_populates="likes")
-    # optionally add UniqueConstraint to avoid multiple likes per user in future
@@ -0,0 +1,96 @@
+# app/repositories/idempotency_repository.py
+from typing import Optional, Tuple, Union
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.models.idempotency import IdempotencyKey
+
+# (fingerprint, status_code, body) of a finished request
+StoredResponse = Tuple[str, int, bytes]
+
+
+class IdempotencyRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def claim(
+        self, key: str, user: str, fingerprint: str, now: int, ttl_s: float, lock_timeout_s: float
+    ) -> Union[str, StoredResponse, dict]:
+        """
+        Claim a key for the request about to run. Returns "claimed" when the caller should
+        run it, the stored response when an earlier request with this key finished, or
+        "busy" while another process is still running it. Expired rows and claims older than
+        `lock_timeout_s` (a process that died mid-request) are taken over.
+        """
+        try:
+            self.db.execute(insert(IdempotencyKey).values(key=key, user=user, fingerprint=fingerprint, created_at=now))
+            self.db.commit()
+            return "claimed"
+        except IntegrityError:
+            self.db.rollback()
+        except SQLAlchemyError:
+            self.db.rollback()
+            return {"error": "Unable to check the Idempotency-Key right now. Please try again."}
+
+        try:
+            row = self.db.execute(
+                select(IdempotencyKey.fingerprint, IdempotencyKey.status_code, IdempotencyKey.body, IdempotencyKey.created_at)
+                .where(IdempotencyKey.key == key, IdempotencyKey.user == user)
+            ).one_or_none()
+            if row is None:  # released since the insert failed
+                return self.claim(key, user, fingerprint, now, ttl_s, lock_timeout_s)
+            expired = row.created_at < now - ttl_s
+            if row.status_code is not None and not expired:
+                return row.fingerprint, row.status_code, row.body
+            if row.status_code is None and not expired and row.created_at >= now - lock_timeout_s:
+                return "busy"
+            # compare-and-set on created_at so only one process takes a stale claim over
+            taken = self.db.execute(
+                update(IdempotencyKey)
+                .where(
+                    IdempotencyKey.key == key, IdempotencyKey.user == user,
+                    IdempotencyKey.created_at == row.created_at,
+                )
+                .values(fingerprint=fingerprint, status_code=None, body=None, created_at=now)
+            ).rowcount
+            self.db.commit()
+            return "claimed" if taken else "busy"
+        except SQLAlchemyError:
+            self.db.rollback()
+            return {"error": "Unable to check the Idempotency-Key right now. Please try again."}
+
+    def complete(self, key: str, user: str, status_code: int, body: bytes) -> Optional[dict]:
+        try:
+            self.db.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.key == key, IdempotencyKey.user == user)
+                .values(status_code=status_code, body=body)
+            )
+            self.db.commit()
+        except SQLAlchemyError:
+            self.db.rollback()
+            return {"error": "Unable to store the response for this Idempotency-Key."}
+        return None
+
+    def release(self, key: str, user: str):
+        """Drop an unfinished claim so a retry runs the request again."""
+        try:
+            self.db.execute(
+                delete(IdempotencyKey).where(
+                    IdempotencyKey.key == key, IdempotencyKey.user == user, IdempotencyKey.status_code.is_(None)
+                )
+            )
+            self.db.commit()
+        except SQLAlchemyError:
+            self.db.rollback()
+
+    def purge_expired(self, before: int) -> int:
+        try:
+            deleted = self.db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < before)).rowcount
+            self.db.commit()
+            return deleted
+        except SQLAlchemyError:
+            self.db.rollback()
+            return 0
@@ -1,7 +1,30 @@
+import time
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import Select, bindparam, delete, func, insert, select, text, tuple_, update
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import SQLAlchemyError
-from typing import List, Optional, Union
-from app.models.poll import Poll, Option, Vote, Like
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from app.core.config import settings
+from app.core.counter_shards import counter_slot
+from app.core.poll_cache import next_write_version
+from app.core.search import fts_query, highlighted_tokens, score, top
+from app.models.poll import Poll, Option, OptionCounterShard, OptionVoteBucket, Vote, Like
+
+# widths of the vote history rollups, in seconds
+VOTE_HISTORY_BUCKETS = {"minute": 60, "hour": 3600}
+
+# an option's count: its votes_count column plus its sharded counter slots, if it has any
+OPTION_VOTES = (
+    Option.votes_count
+    + func.coalesce(
+        select(func.sum(OptionCounterShard.count))
+        .where(OptionCounterShard.option_id == Option.id)
+        .correlate(Option)
+        .scalar_subquery(),
+        0,
+    )
+).label("votes_count")
 
 
 class PollRepository:
@@ -29,85 +52,547 @@ class PollRepository:
         except SQLAlchemyError:
             return {"error": "Unable to fetch polls at the moment. Please refresh or try again later."}
 
-    def get_poll(self, poll_id: int) -> Union[Optional[Poll], dict]:
+    POLL_COLUMNS = (Poll.id, Poll.question, Poll.created_by, Poll.likes_count)
+    OPTION_COLUMNS = (Option.poll_id, Option.id, Option.text, OPTION_VOTES)
+
+    def _with_option_rows(self, poll_rows: List[tuple]) -> Tuple[List[tuple], List[tuple]]:
+        option_rows = []
+        if poll_rows:
+            option_rows = self.db.execute(
+                select(*self.OPTION_COLUMNS)
+                .where(Option.poll_id.in_([row.id for row in poll_rows]))
+                .order_by(Option.id)
+            ).all()
+        return poll_rows, option_rows
+
+    def get_poll_rows_page(self, after_id: Optional[int], limit: int) -> Union[Tuple[List[tuple], List[tuple]], dict]:
+        """
+        Keyset page of polls, newest first, as plain (poll rows, option rows): one query
+        for up to `limit` polls with id < after_id and one for their options, no ORM objects.
+        """
         try:
-            return self.db.query(Poll).filter(Poll.id == poll_id).first()
+            query = select(*self.POLL_COLUMNS)
+            if after_id is not None:
+                query = query.where(Poll.id < after_id)
+            return self._with_option_rows(self.db.execute(query.order_by(Poll.id.desc()).limit(limit)).all())
         except SQLAlchemyError:
-            return {"error": "Unable to fetch this poll. Please try again later."}
-
+            return {"error": "Unable to fetch polls at the moment. Please refresh or try again later."}
 
+    def get_poll_ids_page(self, after_id: Optional[int], limit: int) -> Union[List[int], dict]:
+        """Keyset page of poll ids only, newest first; served from the primary key index."""
+        try:
+            query = select(Poll.id)
+            if after_id is not None:
+                query = query.where(Poll.id < after_id)
+            return list(self.db.execute(query.order_by(Poll.id.desc()).limit(limit)).scalars())
+        except SQLAlchemyError:
+            return {"error": "Unable to fetch polls at the moment. Please refresh or try again later."}
 
-    def increment_vote(self, poll_id: int, option_id: int, voter: str) -> Union[dict, Option]:
+    def get_poll_rows_by_ids(self, poll_ids: List[int]) -> Union[Tuple[List[tuple], List[tuple]], dict]:
         try:
-            existing_vote = (
-                self.db.query(Vote)
-                .filter(Vote.poll_id == poll_id, Vote.voter == voter)
-                .first()
+            return self._with_option_rows(
+                self.db.execute(select(*self.POLL_COLUMNS).where(Poll.id.in_(poll_ids))).all()
             )
+        except SQLAlchemyError:
+            return {"error": "Unable to fetch polls at the moment. Please refresh or try again later."}
 
-            new_option = (
-                self.db.query(Option)
-                .filter(Option.id == option_id, Option.poll_id == poll_id)
-                .first()
+    def search_poll_ids(self, terms: List[str], offset: int, limit: int) -> Union[List[int], dict]:
+        """
+        Ids of polls matching every term (the last as a prefix) from the FTS5 table, best
+        score() first. Only the newest SEARCH_CANDIDATES matches are ranked: FTS5 walks its
+        doclists in rowid order and stops there, however common the words are. (bm25() is
+        avoided because it counts every match of every term to weigh them.)
+        """
+        try:
+            rows = self.db.execute(
+                text(
+                    "SELECT rowid, highlight(poll_search, 0, char(2), char(3)) FROM poll_search "
+                    "WHERE poll_search MATCH :query ORDER BY rowid DESC LIMIT :candidates"
+                ),
+                {"query": fts_query(terms), "candidates": settings.SEARCH_CANDIDATES},
             )
-            if not new_option:
-                return {"error": "The selected option does not exist."}
+            scores = {poll_id: score(terms, highlighted_tokens(question)) for poll_id, question in rows}
+            return top(scores, offset, limit)
+        except SQLAlchemyError:
+            self.db.rollback()
+            return {"error": "Search is unavailable at the moment. Please try again later."}
 
-            old_option = None
+    @staticmethod
+    def _search_rows(after_id: int = 0) -> Select:
+        return (
+            select(Poll.id, Poll.question, Option.text)
+            .outerjoin(Option, Option.poll_id == Poll.id)
+            .where(Poll.id > after_id)
+            .order_by(Poll.id)
+        )
 
-            if existing_vote:
-                if existing_vote.option_id == option_id:
-                    return {"error": "You have already voted for this option."}
+    def iter_search_rows(self, batch_size: int = 10000) -> Iterator[tuple]:
+        """Stream (poll id, question, option text) rows ordered by poll id, to build the in-memory search index."""
+        yield from self.db.execute(self._search_rows().execution_options(yield_per=batch_size))
 
-                # Fetch old option to decrement vote
-                old_option = self.db.query(Option).filter(Option.id == existing_vote.option_id).first()
-                if old_option and old_option.votes_count > 0:
-                    old_option.votes_count -= 1
-                    self.db.add(old_option)
+    def get_search_rows(self, after_id: int) -> Union[List[tuple], dict]:
+        """Search index rows of the polls past `after_id`, for an index that catches up from the DB."""
+        try:
+            return self.db.execute(self._search_rows(after_id)).all()
+        except SQLAlchemyError:
+            self.db.rollback()
+            return {"error": "Search is unavailable at the moment. Please try again later."}
 
-                # Update existing vote
-                existing_vote.option_id = option_id
-                new_option.votes_count = (new_option.votes_count or 0) + 1
-                self.db.add(existing_vote)
-                self.db.add(new_option)
+    def _insert(self, model):
+        """Dialect-specific INSERT so votes can use ON CONFLICT upserts."""
+        # imported here so a SQLite deployment never loads the PostgreSQL dialect (and vice versa)
+        if self.db.get_bind().dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as postgresql_insert
 
-            else:
-                # First-time vote
-                vote = Vote(poll_id=poll_id, option_id=option_id, voter=voter)
-                new_option.votes_count = (new_option.votes_count or 0) + 1
-                self.db.add(vote)
-                self.db.add(new_option)
+            return postgresql_insert(model)
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+        return sqlite_insert(model)
 
+    def increment_vote(self, poll_id: int, option_id: int, voter: str, shards: int = 0) -> dict:
+        """
+        Record or move a voter's vote in one short transaction without reading rows into Python:
+        upsert the vote on (poll_id, voter), then decrement the previous option and increment
+        the new one. Counters only change through count = count ± 1 in the database.
+
+        With `shards` (a promoted poll) the ±1 goes to the voter's counter slot instead of
+        the option row, so concurrent votes on one option mostly touch different rows.
+        """
+        try:
+            recorded, previous_option_id = self._upsert_vote(poll_id, option_id, voter)
+            if not recorded:
+                self.db.rollback()
+                return {"error": "You have already voted for this option."}
+
+            if shards:
+                return self._increment_sharded_vote(poll_id, option_id, previous_option_id, counter_slot(voter, shards))
+
+            old_option = None
+            if previous_option_id is not None:
+                old_option = self.db.execute(
+                    update(Option)
+                    .where(Option.id == previous_option_id, OPTION_VOTES > 0)
+                    .values(votes_count=Option.votes_count - 1)
+                    .returning(Option.id, OPTION_VOTES)
+                ).first()
+
+            new_option = self.db.execute(
+                update(Option)
+                .where(Option.id == option_id, Option.poll_id == poll_id)
+                .values(votes_count=Option.votes_count + 1)
+                .returning(Option.id, OPTION_VOTES)
+            ).first()
+            if new_option is None:
+                self.db.rollback()
+                return {"error": "The selected option does not exist."}
+
+            deltas = {new_option.id: 1}
+            if old_option:
+                deltas[old_option.id] = -1
+            self._record_vote_history(deltas)
+            version = next_write_version()  # while the option rows are still locked
             self.db.commit()
-            self.db.refresh(new_option)
             if old_option:
-                self.db.refresh(old_option)
-                return {"new_option": new_option, "old_option": old_option}
-            else:
-                return {"new_option": new_option}
+                return {"new_option": new_option, "old_option": old_option, "version": version}
+            return {"new_option": new_option, "version": version}
 
         except SQLAlchemyError:
             self.db.rollback()
             return {"error": "Database error occurred."}
 
+    def _upsert_vote(self, poll_id: int, option_id: int, voter: str) -> Tuple[bool, Optional[int]]:
+        """
+        Insert or move the voter's vote. Returns (recorded, previous option id); recorded is
+        False if the vote already points at option_id.
+
+        The insert goes first so a concurrent vote by the same voter waits on the unique
+        index, and an existing row is read FOR UPDATE, so the previous option is always the
+        committed one and two racing votes can't both decrement (or skip decrementing) it.
+        """
+        inserted = self.db.execute(
+            self._insert(Vote)
+            .values(poll_id=poll_id, option_id=option_id, voter=voter)
+            .on_conflict_do_nothing(index_elements=[Vote.poll_id, Vote.voter])
+            .returning(Vote.id)
+        ).first()
+        if inserted is not None:
+            return True, None
+
+        existing = self.db.execute(
+            select(Vote.id, Vote.option_id)
+            .where(Vote.poll_id == poll_id, Vote.voter == voter)
+            .with_for_update()
+        ).first()
+        if existing is None or existing.option_id == option_id:
+            return False, None
+        self.db.execute(
+            update(Vote).where(Vote.id == existing.id).values(option_id=option_id, voted_at=func.now())
+        )
+        return True, existing.option_id
+
+    def _increment_sharded_vote(
+        self, poll_id: int, option_id: int, previous_option_id: Optional[int], slot: int
+    ) -> dict:
+        old_option = None
+        if previous_option_id is not None:
+            option_total = (
+                select(OPTION_VOTES).where(Option.id == OptionCounterShard.option_id).scalar_subquery()
+            )
+            old_option = self.db.execute(
+                update(OptionCounterShard)
+                .where(
+                    OptionCounterShard.option_id == previous_option_id,
+                    OptionCounterShard.shard == slot,
+                    option_total > 0,
+                )
+                .values(count=OptionCounterShard.count - 1)
+                .returning(OptionCounterShard.option_id)
+            ).first()
+
+        new_option = self.db.execute(
+            update(OptionCounterShard)
+            .where(
+                OptionCounterShard.option_id == option_id,
+                OptionCounterShard.poll_id == poll_id,
+                OptionCounterShard.shard == slot,
+            )
+            .values(count=OptionCounterShard.count + 1)
+            .returning(OptionCounterShard.option_id)
+        ).first()
+        if new_option is None:
+            self.db.rollback()
+            return {"error": "The selected option does not exist."}
+
+        deltas = {option_id: 1}
+        if old_option:
+            deltas[old_option.option_id] = -1
+        totals = {
+            row.id: row
+            for row in self.db.execute(select(Option.id, OPTION_VOTES).where(Option.id.in_(deltas))).all()
+        }
+        self._record_vote_history(deltas, shard=slot)
+        version = next_write_version()
+        self.db.commit()
+        if old_option:
+            return {"new_option": totals[option_id], "old_option": totals[old_option.option_id], "version": version}
+        return {"new_option": totals[option_id], "version": version}
 
-    def toggle_like(self, poll_id: int, user_identifier: str) -> Union[int, dict]:
+    def promote_to_sharded_counters(self, poll_id: int, shards: int) -> Union[int, dict]:
+        """
+        Give every option of the poll `shards` zeroed counter slots. Existing counts stay
+        in votes_count, so promoting twice (or from two workers at once) is harmless.
+        Returns the number of slots per option.
+        """
         try:
-            existing = (
-                self.db.query(Like)
-                .filter(Like.poll_id == poll_id, Like.user_identifier == user_identifier)
-                .first()
+            option_ids = self.db.execute(select(Option.id).where(Option.poll_id == poll_id)).scalars().all()
+            if not option_ids:
+                return {"error": "Poll not found."}
+            stmt = self._insert(OptionCounterShard).on_conflict_do_nothing(
+                index_elements=[OptionCounterShard.option_id, OptionCounterShard.shard]
             )
-            if existing:
-                self.db.delete(existing)
+            self.db.connection().execute(stmt, [
+                {"poll_id": poll_id, "option_id": option_id, "shard": shard, "count": 0}
+                for option_id in option_ids
+                for shard in range(shards)
+            ])
+            self.db.commit()
+            return shards
+        except SQLAlchemyError:
+            self.db.rollback()
+            return {"error": "Unable to shard vote counters."}
+
+    def get_sharded_polls(self) -> Dict[int, int]:
+        """{poll_id: slots per option} for every poll promoted to sharded counters."""
+        return dict(self.db.execute(
+            select(OptionCounterShard.poll_id, func.max(OptionCounterShard.shard) + 1)
+            .group_by(OptionCounterShard.poll_id)
+        ).all())
+
+    def _record_vote_history(self, deltas: Dict[int, int], now: Optional[float] = None, shard: int = 0):
+        """
+        Add per-option vote deltas to the current minute and hour buckets in one upsert.
+        Sharded votes pass their counter slot, so they spread over as many bucket rows as counter rows.
+        """
+        if not settings.VOTE_HISTORY_ENABLED:
+            return
+        now = int(time.time() if now is None else now)
+        rows = [
+            {
+                "option_id": option_id, "bucket_s": width, "bucket_start": now - now % width,
+                "shard": shard, "delta": delta,
+            }
+            for option_id, delta in deltas.items() if delta
+            for width in VOTE_HISTORY_BUCKETS.values()
+        ]
+        if not rows:
+            return
+        stmt = self._insert(OptionVoteBucket)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[
+                OptionVoteBucket.option_id, OptionVoteBucket.bucket_s, OptionVoteBucket.bucket_start, OptionVoteBucket.shard,
+            ],
+            set_={"delta": OptionVoteBucket.delta + stmt.excluded.delta},
+        )
+        self.db.connection().execute(stmt, rows)
+
+    def get_vote_buckets(self, poll_id: int, bucket_s: int, since: int) -> List[tuple]:
+        """(option_id, bucket_start, delta) rollup rows of a poll from `since` on, oldest first, shards summed."""
+        return self.db.execute(
+            select(OptionVoteBucket.option_id, OptionVoteBucket.bucket_start, func.sum(OptionVoteBucket.delta))
+            .join(Option, Option.id == OptionVoteBucket.option_id)
+            .where(
+                Option.poll_id == poll_id,
+                OptionVoteBucket.bucket_s == bucket_s,
+                OptionVoteBucket.bucket_start >= since,
+            )
+            .group_by(OptionVoteBucket.option_id, OptionVoteBucket.bucket_start)
+            .order_by(OptionVoteBucket.bucket_start)
+        ).all()
+
+    def get_voter_choice(self, poll_id: int, voter: str) -> Optional[int]:
+        return self.db.execute(
+            select(Vote.option_id).where(Vote.poll_id == poll_id, Vote.voter == voter)
+        ).scalar()
+
+    def get_option_counts(self, poll_id: int, option_ids: List[int]) -> Dict[int, int]:
+        rows = self.db.execute(
+            select(Option.id, OPTION_VOTES).where(Option.id.in_(option_ids), Option.poll_id == poll_id)
+        ).all()
+        return {option_id: votes_count for option_id, votes_count in rows}
+
+    def get_voter_choices(self, keys: Sequence[Tuple[int, str]]) -> Dict[Tuple[int, str], int]:
+        """Current option of every (poll_id, voter) in `keys` that has voted."""
+        if not keys:
+            return {}
+        rows = self.db.execute(
+            select(Vote.poll_id, Vote.voter, Vote.option_id).where(tuple_(Vote.poll_id, Vote.voter).in_(keys))
+        ).all()
+        return {(poll_id, voter): option_id for poll_id, voter, option_id in rows}
+
+    def get_polls_option_counts(self, poll_ids: Sequence[int]) -> Dict[int, Tuple[int, int]]:
+        """{option_id: (poll_id, votes_count)} for every option of the given polls."""
+        rows = self.db.execute(
+            select(Option.id, Option.poll_id, OPTION_VOTES).where(Option.poll_id.in_(poll_ids))
+        ).all()
+        return {option_id: (poll_id, votes_count) for option_id, poll_id, votes_count in rows}
+
+    def apply_vote_batch(
+        self, choices: Dict[Tuple[int, str], int], deltas: Dict[int, int], commit: bool = True
+    ) -> Optional[dict]:
+        """
+        Persist a batch of buffered votes in one transaction: upsert every voter's latest
+        choice and apply the summed per-option deltas with executemany UPDATEs. With
+        commit=False the caller commits (or rolls back) the open transaction.
+        """
+        try:
+            conn = self.db.connection()
+            if choices:
+                stmt = self._insert(Vote)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[Vote.poll_id, Vote.voter],
+                    set_={"option_id": stmt.excluded.option_id, "voted_at": func.now()},
+                )
+                conn.execute(stmt, [
+                    {"poll_id": poll_id, "voter": voter, "option_id": option_id}
+                    for (poll_id, voter), option_id in choices.items()
+                ])
+            changed = [{"b_id": option_id, "b_delta": delta} for option_id, delta in deltas.items() if delta]
+            if changed:
+                conn.execute(
+                    update(Option.__table__)
+                    .where(Option.__table__.c.id == bindparam("b_id"))
+                    .values(votes_count=Option.__table__.c.votes_count + bindparam("b_delta")),
+                    changed,
+                )
+            self._record_vote_history(deltas)
+            if commit:
                 self.db.commit()
+            return None
+        except SQLAlchemyError:
+            self.db.rollback()
+            return {"error": "Unable to flush buffered votes."}
+
+    def apply_votes_bulk(
+        self, items: List[Tuple[int, int, str]]
+    ) -> Union[Tuple[List[str], Dict[int, Tuple[int, int]], int], dict]:
+        """
+        Apply many (poll_id, option_id, voter) votes in one transaction with set-based
+        statements: one query validates the options, one reads every voter's current
+        choice, then apply_vote_batch upserts the votes and moves the counters.
+        Items are processed in order, so a voter's later item wins.
+
+        Returns a status per item ("recorded", "moved", "duplicate" or "invalid_option"),
+        {option_id: (poll_id, votes_count)} for every option whose count changed and the
+        write version of those counts (see app.core.poll_cache.next_write_version).
+        """
+        try:
+            statuses = ["invalid_option"] * len(items)
+            option_ids = {option_id for _, option_id, _ in items}
+            option_polls = dict(
+                self.db.execute(select(Option.id, Option.poll_id).where(Option.id.in_(option_ids))).all()
+            )
+            valid = [(i, item) for i, item in enumerate(items) if option_polls.get(item[1]) == item[0]]
+            if not valid:
+                return statuses, {}, 0
+
+            # take the write lock on these polls' counters first, so the choices read
+            # below cannot change before this transaction commits
+            poll_ids = {poll_id for _, (poll_id, _, _) in valid}
+            self.db.execute(
+                update(Option).where(Option.poll_id.in_(poll_ids)).values(votes_count=Option.votes_count)
+            )
+            self.db.execute(
+                update(OptionCounterShard)
+                .where(OptionCounterShard.poll_id.in_(poll_ids))
+                .values(count=OptionCounterShard.count)
+            )
+            current = self.get_voter_choices(list({(poll_id, voter) for _, (poll_id, _, voter) in valid}))
+
+            choices: Dict[Tuple[int, str], int] = {}
+            deltas: Dict[int, int] = defaultdict(int)
+            for i, (poll_id, option_id, voter) in valid:
+                previous = current.get((poll_id, voter))
+                if previous == option_id:
+                    statuses[i] = "duplicate"
+                    continue
+                if previous is not None:
+                    deltas[previous] -= 1
+                    statuses[i] = "moved"
+                else:
+                    statuses[i] = "recorded"
+                deltas[option_id] += 1
+                current[(poll_id, voter)] = option_id
+                choices[(poll_id, voter)] = option_id
+
+            error = self.apply_vote_batch(choices, deltas, commit=False)
+            if error:
+                return error
+            touched = [option_id for option_id, delta in deltas.items() if delta]
+            counts = {}
+            if touched:
+                rows = self.db.execute(
+                    select(Option.id, Option.poll_id, OPTION_VOTES).where(Option.id.in_(touched))
+                ).all()
+                counts = {option_id: (poll_id, votes_count) for option_id, poll_id, votes_count in rows}
+            version = next_write_version()
+            self.db.commit()
+            return statuses, counts, version
+        except SQLAlchemyError:
+            self.db.rollback()
+            return {"error": "Database error occurred."}
+
+    EXPORT_COLUMNS = {
+        "polls": (Poll.id, Poll.question, Poll.created_by, Poll.likes_count),
+        "options": (Option.poll_id, Option.id.label("option_id"), Option.text, OPTION_VOTES),
+        "votes": (Vote.poll_id, Vote.option_id),
+    }
+
+    @classmethod
+    def export_statement(cls, resource: str, poll_id: Optional[int] = None) -> Select:
+        """
+        Flat, id-ordered rows for one export resource ("polls", "options" or "votes").
+        Votes carry the voter's email only with EXPORT_VOTER_EMAILS.
+        """
+        columns = cls.EXPORT_COLUMNS[resource]
+        if resource == "votes" and settings.EXPORT_VOTER_EMAILS:
+            columns += (Vote.voter,)
+        model = columns[0].class_
+        stmt = select(*columns).order_by(model.id)
+        if poll_id is not None:
+            stmt = stmt.where((Poll.id if model is Poll else model.poll_id) == poll_id)
+        return stmt
+
+    def iter_export_batches(
+        self, resource: str, poll_id: Optional[int] = None, batch_size: int = 5000
+    ) -> Iterator[Sequence[tuple]]:
+        """Stream export rows in batches over a server-side cursor, without building ORM objects."""
+        stmt = self.export_statement(resource, poll_id).execution_options(yield_per=batch_size)
+        yield from self.db.execute(stmt).partitions()
+
+    def reconcile_vote_counts(self) -> Union[int, dict]:
+        """
+        Rebuild every Option.votes_count from the votes table and zero the sharded counter
+        slots it now includes. Returns the number of options updated.
+        """
+        try:
+            vote_count = (
+                select(func.count(Vote.id))
+                .where(Vote.option_id == Option.id)
+                .scalar_subquery()
+            )
+            updated = self.db.execute(update(Option).values(votes_count=vote_count)).rowcount
+            self.db.execute(update(OptionCounterShard).values(count=0))
+            self.db.commit()
+            return updated
+        except SQLAlchemyError:
+            self.db.rollback()
+            return {"error": "Unable to reconcile vote counts."}
+
+    def toggle_like(self, poll_id: int, user_identifier: str) -> Union[Tuple[int, bool, Optional[int]], dict]:
+        """
+        Add or remove the user's like and move Poll.likes_count by one in the same transaction.
+        Returns (likes_count, whether the user now likes the poll, write version of the count;
+        None when it was read after a lost race). The unique (poll_id, user_identifier) index
+        makes a racing duplicate insert fail instead of double counting.
+        """
+        try:
+            deleted = self.db.execute(
+                delete(Like).where(Like.poll_id == poll_id, Like.user_identifier == user_identifier)
+            ).rowcount
+            if deleted:
+                delta = -1
             else:
-                like = Like(poll_id=poll_id, user_identifier=user_identifier)
-                self.db.add(like)
-                self.db.commit()
+                self.db.execute(insert(Like).values(poll_id=poll_id, user_identifier=user_identifier))
+                delta = 1
+
+            count = self.db.execute(
+                update(Poll)
+                .where(Poll.id == poll_id)
+                .values(likes_count=Poll.likes_count + delta)
+                .returning(Poll.likes_count)
+            ).scalar()
+            if count is None:
+                self.db.rollback()
+                return {"error": "Poll not found."}
 
-            count = self.db.query(Like).filter(Like.poll_id == poll_id).count()
-            return count
+            version = next_write_version()
+            self.db.commit()
+            return count, delta > 0, version
+        except IntegrityError:
+            # a concurrent request inserted the same like first (or, on PostgreSQL, the poll
+            # doesn't exist and the foreign key rejected the like): report the settled state
+            self.db.rollback()
+            count = self.db.execute(select(Poll.likes_count).where(Poll.id == poll_id)).scalar()
+            if count is None:
+                return {"error": "Poll not found."}
+            liked = self.db.execute(
+                select(Like.id).where(Like.poll_id == poll_id, Like.user_identifier == user_identifier)
+            ).first()
+            if liked is None:
+                return {"error": "Something went wrong while updating the like. Please try again."}
+            return count, True, None
         except SQLAlchemyError:
             self.db.rollback()
             return {"error": "Something went wrong while updating the like. Please try again."}
+
+    def iter_activity_since(self, since: datetime, batch_size: int = 10000) -> Iterator[Tuple[str, int, datetime]]:
+        """Stream ("vote" | "like", poll_id, timestamp) for current votes and likes made after `since`."""
+        for kind, model, column in (("vote", Vote, Vote.voted_at), ("like", Like, Like.liked_at)):
+            stmt = select(model.poll_id, column).where(column >= since).execution_options(yield_per=batch_size)
+            for poll_id, at in self.db.execute(stmt):
+                yield kind, poll_id, at
+
+    def reconcile_like_counts(self) -> Union[int, dict]:
+        """Rebuild every Poll.likes_count from the likes table. Returns the number of polls updated."""
+        try:
+            like_count = (
+                select(func.count(Like.id))
+                .where(Like.poll_id == Poll.id)
+                .scalar_subquery()
+            )
+            updated = self.db.execute(update(Poll).values(likes_count=like_count)).rowcount
+            self.db.commit()
+            return updated
+        except SQLAlchemyError:
+            self.db.rollback()
+            return {"error": "Unable to reconcile like counts."}
@@ -1,7 +1,9 @@
 # app/repositories/user_repository.py
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict
+from typing import Iterable, Iterator, List, Optional, Dict, Set
+from app.core.user_cache import user_cache
 from app.models.user import User
+from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
 
 
@@ -14,6 +16,7 @@ class UserRepository:
             # Check if user already exists
             existing_user = self.db.query(User).filter(User.email == email).first()
             if existing_user:
+                user_cache.remember(existing_user.email, True)
                 return {"status": "info", "message": "User already exists", "email": existing_user.email}
 
             # Create new user
@@ -21,6 +24,7 @@ class UserRepository:
             self.db.add(user)
             self.db.commit()
             self.db.refresh(user)
+            user_cache.mark_created(user.email)
 
             return {"status": "success", "message": "User created successfully", "user_id": user.id, "email": user.email}
 
@@ -29,4 +33,18 @@ class UserRepository:
             return {"status": "error", "message": f"User not created: {str(e)}"}
     
     def get_user_by_email(self, email: str) -> Optional[User]:
-        return self.db.query(User).filter(User.email == email).first()
\ No newline at end of file
+        return self.db.query(User).filter(User.email == email).first()
+
+    def get_existing_emails(self, emails: Iterable[str]) -> Set[str]:
+        """Which of these emails belong to users, in a single IN query."""
+        emails = list(emails)
+        if not emails:
+            return set()
+        return set(self.db.execute(select(User.email).where(User.email.in_(emails))).scalars())
+
+    def iter_emails(self, batch_size: int = 10000) -> Iterator[str]:
+        """Stream every user email in batches without loading User objects."""
+        result = self.db.execute(select(User.email).execution_options(yield_per=batch_size))
+        for email in result.scalars():
+            if email:
+                yield email
@@ -28,9 +28,18 @@ class PollOut(BaseModel):
     class Config:
         orm_mode = True
 
+class PollPage(BaseModel):
+    items: List[PollOut]
+    next_cursor: Optional[str] = None
+
 class VoteCreate(BaseModel):
     option_id: int
     voter: EmailStr
 
 class LikeToggle(BaseModel):
     user_identifier: EmailStr
+
+class BulkVoteItem(BaseModel):
+    poll_id: int
+    option_id: int
+    voter: EmailStr
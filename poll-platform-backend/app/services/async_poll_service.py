@@ -0,0 +1,50 @@
+# app/services/async_poll_service.py
+from typing import List, Optional, Tuple
+from app.core.database import DbRunner
+from app.core.poll_cache import PollCache
+from app.services.poll_service import PollService, DEFAULT_CACHE
+
+
+class AsyncPollService:
+    """
+    Awaitable PollService for async route handlers. Each call runs the synchronous
+    service/repository code through a DbRunner (AsyncSession.run_sync on the async
+    engine, or the threadpool), so DB round trips never block the event loop.
+    """
+
+    def __init__(self, run: DbRunner, cache: Optional[PollCache] = DEFAULT_CACHE):
+        self.run = run
+        self.cache = cache
+
+    def _service(self, db) -> PollService:
+        return PollService(db, cache=self.cache)
+
+    async def create_poll(self, question: str, options: List[str], created_by: str):
+        return await self.run(lambda db: self._service(db).create_poll(question, options, created_by))
+
+    async def list_polls(self, after_id: Optional[int] = None, limit: int = 20):
+        return await self.run(lambda db: self._service(db).list_polls(after_id=after_id, limit=limit))
+
+    async def get_poll(self, poll_id: int):
+        return await self.run(lambda db: self._service(db).get_poll(poll_id))
+
+    async def search_polls(self, query: str, offset: int = 0, limit: int = 20):
+        return await self.run(lambda db: self._service(db).search_polls(query, offset=offset, limit=limit))
+
+    async def trending_polls(self, limit: int = 20):
+        return await self.run(lambda db: self._service(db).trending_polls(limit=limit))
+
+    async def resume_snapshot(self, poll_ids: List[int], newer_than: Optional[int] = None):
+        return await self.run(lambda db: self._service(db).resume_snapshot(poll_ids, newer_than=newer_than))
+
+    async def vote(self, poll_id: int, option_id: int, voter: str):
+        return await self.run(lambda db: self._service(db).vote(poll_id, option_id, voter))
+
+    async def bulk_vote(self, items: List[Tuple[int, int, str]]):
+        return await self.run(lambda db: self._service(db).bulk_vote(items))
+
+    async def vote_history(self, poll_id: int, bucket: str = "minute", since: Optional[int] = None):
+        return await self.run(lambda db: self._service(db).vote_history(poll_id, bucket=bucket, since=since))
+
+    async def toggle_like(self, poll_id: int, user_identifier: str):
+        return await self.run(lambda db: self._service(db).toggle_like(poll_id, user_identifier))
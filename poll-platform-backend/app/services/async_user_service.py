@@ -0,0 +1,17 @@
+# app/services/async_user_service.py
+from typing import Optional
+from app.core.database import DbRunner
+from app.services.user_service import UserService
+
+
+class AsyncUserService:
+    """Awaitable UserService; see AsyncPollService."""
+
+    def __init__(self, run: DbRunner):
+        self.run = run
+
+    async def create_user(self, email: str, name: Optional[str] = None):
+        return await self.run(lambda db: UserService(db).create_user(email=email, name=name))
+
+    async def user_exists(self, email: str) -> bool:
+        return await self.run(lambda db: UserService(db).user_exists(email))
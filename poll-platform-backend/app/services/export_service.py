@@ -0,0 +1,65 @@
+# app/services/export_service.py
+import csv
+import io
+from typing import AsyncIterator, Iterator, List, Optional, Sequence
+
+from app.core.config import settings
+from app.core.database import SessionLocal, get_async_session_factory
+from app.repositories.poll_repository import PollRepository
+from app.utils.serialization import dumps_bytes
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+class ExportEncoder:
+    """Turns batches of flat rows into NDJSON or CSV bytes, one chunk per batch."""
+
+    def __init__(self, columns: List[str], fmt: str):
+        self.columns = columns
+        self.fmt = fmt
+
+    def header(self) -> bytes:
+        return self._csv([self.columns]) if self.fmt == "csv" else b""
+
+    def encode(self, rows: Sequence[tuple]) -> bytes:
+        if self.fmt == "csv":
+            return self._csv(rows)
+        return b"".join(dumps_bytes(dict(zip(self.columns, row))) + b"\n" for row in rows)
+
+    @staticmethod
+    def _csv(rows) -> bytes:
+        out = io.StringIO()
+        csv.writer(out).writerows(rows)
+        return out.getvalue().encode()
+
+
+def _encoder(resource: str, fmt: str) -> ExportEncoder:
+    columns = [column.key for column in PollRepository.export_statement(resource).selected_columns]
+    return ExportEncoder(columns, fmt)
+
+
+def stream_export(
+    resource: str, fmt: str, poll_id: Optional[int] = None, batch_size: int = settings.EXPORT_BATCH_SIZE
+) -> Iterator[bytes]:
+    """Sync export generator on its own session; StreamingResponse drives it from the threadpool."""
+    encoder = _encoder(resource, fmt)
+    yield encoder.header()
+    db = SessionLocal()
+    try:
+        for rows in PollRepository(db).iter_export_batches(resource, poll_id, batch_size):
+            yield encoder.encode(rows)
+    finally:
+        db.close()
+
+
+async def stream_export_async(
+    resource: str, fmt: str, poll_id: Optional[int] = None, batch_size: int = settings.EXPORT_BATCH_SIZE
+) -> AsyncIterator[bytes]:
+    """stream_export on the async engine (DATABASE_ASYNC)."""
+    encoder = _encoder(resource, fmt)
+    yield encoder.header()
+    stmt = PollRepository.export_statement(resource, poll_id).execution_options(yield_per=batch_size)
+    async with get_async_session_factory()() as session:
+        result = await session.stream(stmt)
+        async for rows in result.partitions():
+            yield encoder.encode(rows)
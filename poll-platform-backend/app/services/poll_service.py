@@ -1,15 +1,30 @@
 # app/services/poll_service.py
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from app.repositories.poll_repository import PollRepository
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.counter_shards import hot_counters
+from app.core.poll_cache import PollCache, poll_cache, snapshot_from_poll, snapshots_from_rows
+from app.core.pubsub import events_reach_all_workers
+from app.core.search import MAX_TERMS, search_index, tokenize
+from app.core.trending import trending
+import time
+from app.repositories.poll_repository import PollRepository, VOTE_HISTORY_BUCKETS
 from app.services.user_service import UserService
+from app.core.vote_buffer import vote_buffer
+
+# a worker that never hears about other workers' writes would serve their stale counts for POLL_CACHE_TTL_S
+DEFAULT_CACHE = poll_cache if settings.POLL_CACHE_ENABLED and events_reach_all_workers() else None
+
+# how far back a history request reaches when no `since` is given
+HISTORY_WINDOWS_S = {"minute": 6 * 3600, "hour": 7 * 24 * 3600}
 
 
 class PollService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, cache: Optional[PollCache] = DEFAULT_CACHE):
         self.db = db
         self.repo = PollRepository(db)
         self.user_service = UserService(db)
+        self.cache = cache
 
     def _validate_user(self, email: str):
         """Private method to ensure the user exists before proceeding."""
@@ -20,20 +35,202 @@ class PollService:
     def create_poll(self, question: str, options: List[str], created_by: str):
         if(not self._validate_user(created_by)):
             return {"error": "User does not exist."}
-        return self.repo.create_poll(question=question, options=options, created_by=created_by)
+        poll = self.repo.create_poll(question=question, options=options, created_by=created_by)
+        if isinstance(poll, dict):
+            return poll
+        snapshot = snapshot_from_poll(poll)
+        if self.cache is not None:
+            self.cache.put(snapshot)
+        return snapshot
+
+    def list_polls(self, after_id: Optional[int] = None, limit: int = 20):
+        """Page of poll snapshots, newest first. With a cache only the id page and misses hit the DB."""
+        if self.cache is None:
+            rows = self.repo.get_poll_rows_page(after_id=after_id, limit=limit)
+            if isinstance(rows, dict):
+                return rows
+            return snapshots_from_rows(*rows)
+
+        poll_ids = self.repo.get_poll_ids_page(after_id=after_id, limit=limit)
+        if isinstance(poll_ids, dict):
+            return poll_ids
+        return self.get_polls(poll_ids)
+
+    def get_polls(self, poll_ids: List[int]):
+        """Snapshots of the given polls in the given order, skipping unknown ids; cache first."""
+        found = self.cache.get_many(poll_ids) if self.cache is not None else {}
+        missing = [poll_id for poll_id in poll_ids if poll_id not in found]
+        if missing:
+            token = self.cache.fill_token() if self.cache is not None else None
+            rows = self.repo.get_poll_rows_by_ids(missing)
+            if isinstance(rows, dict):
+                return rows
+            for snapshot in snapshots_from_rows(*rows):
+                if self.cache is not None:
+                    self.cache.put(snapshot, token)
+                found[snapshot["id"]] = snapshot
+        return [found[poll_id] for poll_id in poll_ids if poll_id in found]
+
+    def search_polls(self, query: str, offset: int = 0, limit: int = 20):
+        """Snapshots of the polls matching `query`, best match first (see app.core.search)."""
+        terms = tokenize(query)[:MAX_TERMS]
+        if not terms:
+            return []
+        if search_index.enabled:
+            after_id = search_index.catch_up_from()
+            if after_id is not None:
+                rows = self.repo.get_search_rows(after_id)
+                if isinstance(rows, dict):
+                    return rows
+                search_index.catch_up(rows)
+            poll_ids = search_index.search(terms, offset=offset, limit=limit)
+        else:
+            poll_ids = self.repo.search_poll_ids(terms, offset=offset, limit=limit)
+            if isinstance(poll_ids, dict):
+                return poll_ids
+        return self.get_polls(poll_ids)
+
+    def trending_polls(self, limit: int = 20):
+        """Snapshots of the top trending polls, best first, each with its current trending_score."""
+        ranking = trending.ranking(limit)
+        polls = self.get_polls([entry["poll_id"] for entry in ranking])
+        if isinstance(polls, dict):
+            return polls
+        scores = {entry["poll_id"]: entry["score"] for entry in ranking}
+        return [{**poll, "trending_score": scores[poll["id"]]} for poll in polls]
 
-    def list_polls(self):
-        return self.repo.get_all_polls()
+    def resume_snapshot(self, poll_ids: List[int], newer_than: Optional[int] = None, limit: int = 20):
+        """
+        What a reconnecting WebSocket client needs when its missed events are gone: the
+        current counts of its polls and, with `newer_than`, up to `limit` polls created since.
+        """
+        polls = self.get_polls(poll_ids)
+        if isinstance(polls, dict):
+            return polls
+        new_polls = []
+        if newer_than is not None:
+            new_polls = self.list_polls(limit=limit)
+            if isinstance(new_polls, dict):
+                return new_polls
+            new_polls = [poll for poll in new_polls if poll["id"] > newer_than]
+        return {
+            "polls": [
+                {
+                    "id": poll["id"],
+                    "likes_count": poll["likes_count"],
+                    "options": [{"id": o["id"], "votes_count": o["votes_count"]} for o in poll["options"]],
+                }
+                for poll in polls
+            ],
+            "new_polls": new_polls,
+        }
 
     def get_poll(self, poll_id: int):
-        return self.repo.get_poll(poll_id)
+        if self.cache is not None:
+            snapshot = self.cache.get(poll_id)
+            if snapshot is not None:
+                return snapshot
+        token = self.cache.fill_token() if self.cache is not None else None
+        rows = self.repo.get_poll_rows_by_ids([poll_id])
+        if isinstance(rows, dict):
+            return rows
+        snapshots = snapshots_from_rows(*rows)
+        if not snapshots:
+            return None
+        if self.cache is not None:
+            self.cache.put(snapshots[0], token)
+        return snapshots[0]
 
     def vote(self, poll_id: int, option_id: int, voter: str):
         if(not self._validate_user(voter)):
-            return {"error": "User does not exist."}        
-        return self.repo.increment_vote(poll_id=poll_id, option_id=option_id, voter=voter)
+            return {"error": "User does not exist."}
+        if vote_buffer.enabled:
+            result = vote_buffer.record(self.repo, poll_id=poll_id, option_id=option_id, voter=voter)
+        elif settings.COUNTER_SHARDS_ENABLED:
+            result = self._sharded_vote(poll_id, option_id, voter)
+        else:
+            result = self.repo.increment_vote(poll_id=poll_id, option_id=option_id, voter=voter)
+        if self.cache is not None and "error" not in result:
+            for option in (result.get("old_option"), result["new_option"]):
+                if option is not None:
+                    self.cache.set_option_count(poll_id, option.id, option.votes_count, result["version"])
+        return result
+
+    def _sharded_vote(self, poll_id: int, option_id: int, voter: str) -> dict:
+        """Vote through the poll's counter slots if it has them; promote it once it runs hot."""
+        shards = hot_counters.shards_for(poll_id)
+        result = self.repo.increment_vote(poll_id=poll_id, option_id=option_id, voter=voter, shards=shards)
+        if not shards and "error" not in result and hot_counters.note_vote(poll_id):
+            promoted = self.repo.promote_to_sharded_counters(poll_id, hot_counters.shards)
+            if not isinstance(promoted, dict):
+                hot_counters.mark_sharded(poll_id, promoted)
+                result["promoted_shards"] = promoted
+        return result
+
+    def bulk_vote(self, items: List[Tuple[int, int, str]]) -> dict:
+        """
+        Apply one chunk of (poll_id, option_id, voter) votes in a single transaction
+        (or into the vote buffer, when buffered tallies are on).
+        Returns {"statuses": [...], "counts": {option_id: (poll_id, votes_count)}}.
+        """
+        known = self.user_service.existing_users(voter for _, _, voter in items)
+        statuses = ["unknown_voter"] * len(items)
+        valid = [i for i, (_, _, voter) in enumerate(items) if voter in known]
+        if not valid:
+            return {"statuses": statuses, "counts": {}}
+
+        if vote_buffer.enabled:
+            # through the buffer, so buffered votes and this chunk see one choice per voter
+            result = vote_buffer.record_many(self.repo, [items[i] for i in valid])
+        else:
+            result = self.repo.apply_votes_bulk([items[i] for i in valid])
+        if isinstance(result, dict):
+            return result
+        applied, counts, version = result
+        for i, status in zip(valid, applied):
+            statuses[i] = status
+        if self.cache is not None:
+            for option_id, (poll_id, votes_count) in counts.items():
+                self.cache.set_option_count(poll_id, option_id, votes_count, version)
+        return {"statuses": statuses, "counts": counts}
+
+    def vote_history(self, poll_id: int, bucket: str = "minute", since: Optional[int] = None):
+        """
+        Per-option time series from the vote rollups. Each point carries the net votes
+        gained in the bucket and the option's count at the end of it, worked backwards
+        from the current count so votes cast before the rollups existed still add up.
+        """
+        poll = self.get_poll(poll_id)
+        if poll is None or "error" in poll:
+            return poll
+        if since is None:
+            since = int(time.time()) - HISTORY_WINDOWS_S[bucket]
+        rows = self.repo.get_vote_buckets(poll_id, VOTE_HISTORY_BUCKETS[bucket], since)
+
+        points: Dict[int, list] = {option["id"]: [] for option in poll["options"]}
+        for option_id, bucket_start, delta in rows:
+            points[option_id].append({"bucket_start": bucket_start, "delta": delta})
+        options = []
+        for option in poll["options"]:
+            running = option["votes_count"]
+            for point in reversed(points[option["id"]]):
+                point["votes_count"] = running
+                running -= point["delta"]
+            options.append({
+                "option_id": option["id"],
+                "text": option["text"],
+                "votes_count": option["votes_count"],
+                "points": points[option["id"]],
+            })
+        return {"poll_id": poll_id, "bucket": bucket, "since": since, "options": options}
 
     def toggle_like(self, poll_id: int, user_identifier: str):
         if(not self._validate_user(user_identifier)):
             return {"error": "User does not exist."}
-        return self.repo.toggle_like(poll_id=poll_id, user_identifier=user_identifier)
+        result = self.repo.toggle_like(poll_id=poll_id, user_identifier=user_identifier)
+        if isinstance(result, dict):
+            return result
+        count, liked, version = result
+        if self.cache is not None:
+            self.cache.set_likes_count(poll_id, count, version)
+        return count, liked
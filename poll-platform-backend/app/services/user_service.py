@@ -1,6 +1,7 @@
 # app/services/poll_service.py
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Iterable, Optional, Set
+from app.core.user_cache import user_cache
 from app.repositories.user_repository import UserRepository
 
 
@@ -12,5 +13,25 @@ class UserService:
         return self.repo.create_user(email=email, name=name)
     
     def user_exists(self, email: str) -> bool:
-        user = self.repo.get_user_by_email(email)
-        return user is not None
\ No newline at end of file
+        cached = user_cache.lookup(email)
+        if cached is not None:
+            return cached
+        exists = self.repo.get_user_by_email(email) is not None
+        user_cache.remember(email, exists)
+        return exists
+
+    def existing_users(self, emails: Iterable[str]) -> Set[str]:
+        """Set-based user_exists: cached answers first, then one query for the rest."""
+        found, unknown = set(), []
+        for email in set(emails):
+            cached = user_cache.lookup(email)
+            if cached is None:
+                unknown.append(email)
+            elif cached:
+                found.add(email)
+        if unknown:
+            existing = self.repo.get_existing_emails(unknown)
+            for email in unknown:
+                user_cache.remember(email, email in existing)
+            found |= existing
+        return found
@@ -0,0 +1,43 @@
+# app/utils/ndjson.py
+from typing import AsyncIterable, AsyncIterator, Optional
+
+
+class PayloadTooLarge(ValueError):
+    """A request body or one of its lines is over the configured size."""
+
+
+async def iter_limited(chunks: AsyncIterable[bytes], max_bytes: int) -> AsyncIterator[bytes]:
+    """Pass chunks through, raising PayloadTooLarge once more than `max_bytes` have arrived."""
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > max_bytes:
+            raise PayloadTooLarge(f"Body is larger than {max_bytes} bytes")
+        yield chunk
+
+
+async def iter_ndjson_lines(
+    chunks: AsyncIterable[bytes], max_line_bytes: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """
+    Split a byte stream into non-empty newline-delimited lines as it arrives. Only the
+    new chunk is scanned, so a line spread over many chunks costs linear time, and a
+    line longer than `max_line_bytes` raises PayloadTooLarge instead of being buffered.
+    """
+    partial = bytearray()
+    async for chunk in chunks:
+        *lines, rest = chunk.split(b"\n")
+        if lines:
+            partial += lines[0]
+            lines[0] = bytes(partial)
+            partial = bytearray()
+        partial += rest
+        for line in lines:
+            if max_line_bytes is not None and len(line) > max_line_bytes:
+                raise PayloadTooLarge(f"Line is larger than {max_line_bytes} bytes")
+            if line.strip():
+                yield line
+        if max_line_bytes is not None and len(partial) > max_line_bytes:
+            raise PayloadTooLarge(f"Line is larger than {max_line_bytes} bytes")
+    if partial.strip():
+        yield bytes(partial)
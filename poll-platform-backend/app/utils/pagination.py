@@ -0,0 +1,24 @@
+# app/utils/pagination.py
+import base64
+from typing import Optional
+
+
+def encode_cursor(value: int, prefix: str = "p") -> str:
+    """Encode the last seen poll id (or, for searches, an offset) into an opaque, URL-safe cursor."""
+    raw = f"{prefix}:{value}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], prefix: str = "p") -> Optional[int]:
+    """Decode a cursor produced by encode_cursor with the same prefix. Raises ValueError if it is malformed."""
+    if not cursor:
+        return None
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    kind, _, value = raw.partition(":")
+    if kind != prefix or not value.isdigit():
+        raise ValueError("Invalid cursor")
+    return int(value)
@@ -0,0 +1,41 @@
+# app/utils/serialization.py
+"""
+JSON encoding for API responses and WebSocket frames: orjson when it is installed,
+the standard library otherwise. Both produce compact JSON.
+"""
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+
+if orjson is not None:
+    def dumps_bytes(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    loads = orjson.loads
+else:
+    def dumps_bytes(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+    loads = json.loads
+
+
+def dumps(obj: Any) -> str:
+    """Encode to str, for text WebSocket frames."""
+    return dumps_bytes(obj).decode()
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Response for payloads that already have the response model's shape (snapshots built
+    from database rows): encoded directly, without pydantic re-validation.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
@@ -0,0 +1,78 @@
+# benchmarks/common.py
+import os
+import random
+import statistics
+import tempfile
+from typing import List, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base, build_engine
+from app.models.poll import Option, Poll, Vote
+from app.models.user import User
+
+
+def temp_database(url: str = None, profile: str = "tuned"):
+    """Fresh schema in a throwaway SQLite file, using the given storage profile. Returns (engine, Session)."""
+    if url is None:
+        url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    engine = build_engine(url, profile)
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+
+def seed(
+    Session, users: int, polls: int, options_per_poll: int = 4, random_counts: bool = True, seed: int = 7,
+    votes: int = 0,
+) -> Tuple[List[str], List[int]]:
+    """
+    Bulk-insert users and polls with options. With random_counts the options get
+    pre-existing vote counts (without matching vote rows). `votes` adds that many vote
+    rows from distinct (poll, voter) pairs and counts them on their options.
+    Returns (user emails, poll ids).
+    """
+    rng = random.Random(seed)
+    emails = [f"user{i}@bench.io" for i in range(users)]
+    counts = [rng.randrange(1000) if random_counts else 0 for _ in range(polls * options_per_poll)]
+    vote_rows, voted = [], set()
+    while len(vote_rows) < min(votes, users * polls):
+        poll_index, user_index = rng.randrange(polls), rng.randrange(users)
+        if (poll_index, user_index) in voted:
+            continue
+        voted.add((poll_index, user_index))
+        # option ids are assigned sequentially on a fresh database
+        option_index = poll_index * options_per_poll + rng.randrange(options_per_poll)
+        counts[option_index] += 1
+        vote_rows.append({"poll_id": poll_index + 1, "option_id": option_index + 1, "voter": emails[user_index]})
+
+    db = Session()
+    try:
+        db.execute(insert(User), [{"email": email, "name": None} for email in emails])
+        db.execute(insert(Poll), [
+            {"id": i + 1, "question": f"Poll {i}?", "created_by": emails[i % users], "likes_count": 0}
+            for i in range(polls)
+        ])
+        db.execute(insert(Option), [
+            {"poll_id": i + 1, "text": f"option {j}", "votes_count": counts[i * options_per_poll + j]}
+            for i in range(polls) for j in range(options_per_poll)
+        ])
+        if vote_rows:
+            db.execute(insert(Vote), vote_rows)
+        db.commit()
+    finally:
+        db.close()
+    return emails, list(range(1, polls + 1))
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def latency_summary(samples_ms) -> dict:
+    return {
+        "p50_ms": round(statistics.median(samples_ms), 4),
+        "p99_ms": round(percentile(samples_ms, 99), 4),
+        "mean_ms": round(statistics.fmean(samples_ms), 4),
+    }
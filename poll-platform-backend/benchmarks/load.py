@@ -0,0 +1,343 @@
+# benchmarks/load.py
+"""
+End-to-end load test: runs the app from create_app() under uvicorn in a child process
+against a fresh, seeded SQLite database, drives one scenario at a time over real HTTP
+and WebSocket connections, and prints one JSON line per scenario with p50/p99 latency,
+throughput and the server's peak RSS. Workloads are seeded, so runs are comparable
+between commits.
+
+Scenarios:
+    list_reads   list_polls pages and get_poll by id (9:1)
+    vote_storm   every request votes on the same hot poll
+    like_toggle  like/unlike on the 100 newest polls
+    ws_fanout    --subscribers sockets watch the hot poll while votes stream in;
+                 also reports vote-to-frame delivery latency
+
+Usage:
+    python -m benchmarks.load --scenario all --requests 5000 --concurrency 32
+    python -m benchmarks.load --scenario vote_storm --set VOTE_BUFFER_ENABLED=true
+    python -m benchmarks.load --scenario ws_fanout --subscribers 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+import h11
+
+# app modules are imported lazily: the server process must switch to its temporary
+# directory and apply --set overrides before anything builds the engine from settings
+
+SCENARIOS = ("list_reads", "vote_storm", "like_toggle", "ws_fanout")
+OPTIONS_PER_POLL = 4
+
+
+# -------------------------
+# Server side (child process)
+# -------------------------
+def apply_overrides(settings, overrides: List[str]):
+    for item in overrides:
+        key, _, value = item.partition("=")
+        current = getattr(settings, key)
+        if isinstance(current, bool):
+            value = value.lower() in ("1", "true", "yes", "on")
+        elif isinstance(current, (int, float)):
+            value = type(current)(value)
+        setattr(settings, key, value)
+
+
+def serve(port: int, users: int, polls: int, votes: int, overrides: List[str]):
+    os.chdir(tempfile.mkdtemp())  # the default DATABASE_URL is ./polls.db
+    from app.core.config import settings
+
+    # before anything else imports settings-derived defaults
+    apply_overrides(settings, overrides)
+
+    import uvicorn
+    from app.core.database import SessionLocal, init_db
+    from app.main import create_app
+    from benchmarks.common import seed
+
+    init_db()
+    seed(SessionLocal, users=users, polls=polls, options_per_poll=OPTIONS_PER_POLL, random_counts=False, votes=votes)
+    uvicorn.run(create_app(), host="127.0.0.1", port=port, log_level="warning")
+
+
+class Server:
+    """The app in a child process; peak RSS is read from /proc before it is stopped."""
+
+    def __init__(self, args, overrides: List[str]):
+        self.log = open(args.server_log, "a") if args.server_log else subprocess.DEVNULL
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.process = subprocess.Popen(
+            [
+                sys.executable, "-m", "benchmarks.load", "--serve", str(self.port),
+                "--users", str(args.users), "--polls", str(args.polls), "--votes", str(args.votes),
+                *[flag for item in overrides for flag in ("--set", item)],
+            ],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            stdout=self.log,
+            stderr=self.log,
+        )
+
+    async def wait_ready(self, timeout: float = 120.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("benchmark server exited during startup")
+            try:
+                client = await HttpClient.connect(self.port)
+                status, _ = await client.request("GET", "/health")
+                await client.close()
+                if status == 200:
+                    return
+            except OSError:
+                pass
+            await asyncio.sleep(0.2)
+        raise RuntimeError("benchmark server did not start")
+
+    def peak_rss_mb(self) -> Optional[float]:
+        try:
+            with open(f"/proc/{self.process.pid}/status") as status:
+                for line in status:
+                    if line.startswith("VmHWM:"):
+                        return round(int(line.split()[1]) / 1024, 1)
+        except OSError:
+            pass
+        return None
+
+    def stop(self):
+        self.process.send_signal(signal.SIGINT)
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        if self.log is not subprocess.DEVNULL:
+            self.log.close()
+
+
+# -------------------------
+# Client side
+# -------------------------
+class HttpClient:
+    """Minimal keep-alive HTTP/1.1 client on asyncio streams (h11 ships with uvicorn)."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.conn = h11.Connection(our_role=h11.CLIENT)
+
+    @classmethod
+    async def connect(cls, port: int) -> "HttpClient":
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        return cls(reader, writer)
+
+    async def request(self, method: str, path: str, body: Optional[dict] = None) -> Tuple[int, bytes]:
+        if self.conn.our_state is h11.DONE and self.conn.their_state is h11.DONE:
+            self.conn.start_next_cycle()
+        data = json.dumps(body).encode() if body is not None else b""
+        headers = [("host", "127.0.0.1"), ("content-length", str(len(data)))]
+        if body is not None:
+            headers.append(("content-type", "application/json"))
+        self.writer.write(self.conn.send(h11.Request(method=method, target=path, headers=headers)))
+        if data:
+            self.writer.write(self.conn.send(h11.Data(data=data)))
+        self.writer.write(self.conn.send(h11.EndOfMessage()))
+        await self.writer.drain()
+
+        status, chunks = 0, []
+        while True:
+            event = self.conn.next_event()
+            if event is h11.NEED_DATA:
+                received = await self.reader.read(65536)
+                if not received:
+                    raise ConnectionError("server closed the connection")
+                self.conn.receive_data(received)
+            elif isinstance(event, h11.Response):
+                status = event.status_code
+            elif isinstance(event, h11.Data):
+                chunks.append(bytes(event.data))
+            elif isinstance(event, h11.EndOfMessage):
+                return status, b"".join(chunks)
+
+    async def close(self):
+        self.writer.close()
+
+
+class Workload:
+    """Deterministic request generator for one scenario; `next(rng)` -> (method, path, body)."""
+
+    def __init__(self, scenario: str, users: int, polls: int):
+        self.scenario = scenario
+        self.users = users
+        self.polls = polls
+        self.hot_poll = polls  # the newest poll takes the storm
+
+    def email(self, rng: random.Random) -> str:
+        return f"user{rng.randrange(self.users)}@bench.io"
+
+    def option_of(self, poll_id: int, rng: random.Random) -> int:
+        return (poll_id - 1) * OPTIONS_PER_POLL + rng.randrange(OPTIONS_PER_POLL) + 1
+
+    def next(self, rng: random.Random) -> Tuple[str, str, Optional[dict]]:
+        from app.utils.pagination import encode_cursor
+
+        if self.scenario == "list_reads":
+            if rng.random() < 0.9:
+                cursor = encode_cursor(rng.randrange(2, self.polls + 2))
+                return "GET", f"/polls/list_polls?limit=20&after_id={cursor}", None
+            return "GET", f"/polls/{rng.randrange(1, self.polls + 1)}", None
+        if self.scenario == "like_toggle":
+            poll_id = rng.randrange(max(1, self.polls - 99), self.polls + 1)
+            return "POST", f"/polls/{poll_id}/like", {"user_identifier": self.email(rng)}
+        # vote_storm / ws_fanout
+        poll_id = self.hot_poll
+        return "POST", f"/polls/{poll_id}/vote", {"option_id": self.option_of(poll_id, rng), "voter": self.email(rng)}
+
+
+async def drive(port: int, workload: Workload, requests: int, concurrency: int, seed: int,
+                sent_at: Optional[Dict[Tuple[int, int], float]] = None) -> dict:
+    """Issue `requests` requests from `concurrency` keep-alive connections."""
+    from benchmarks.common import latency_summary
+
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    per_worker = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+
+    async def worker(index: int):
+        rng = random.Random(seed * 1000 + index)
+        client = await HttpClient.connect(port)
+        try:
+            for _ in range(per_worker[index]):
+                method, path, body = workload.next(rng)
+                started = time.perf_counter()
+                status, payload = await client.request(method, path, body)
+                latencies.append((time.perf_counter() - started) * 1000)
+                statuses[status] = statuses.get(status, 0) + 1
+                if sent_at is not None and status == 200:
+                    # counts can revisit a value when votes move; keep the first time it was reached
+                    option = json.loads(payload)["new_option"]
+                    sent_at.setdefault((option["option_id"], option["votes_count"]), started)
+        finally:
+            await client.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        **latency_summary(latencies),
+    }
+
+
+async def ws_fanout(port: int, workload: Workload, args) -> dict:
+    """Votes on the hot poll while `subscribers` sockets watch it; matches frames to votes."""
+    import websockets
+
+    from benchmarks.common import percentile
+
+    sent_at: Dict[Tuple[int, int], float] = {}
+    received: List[Tuple[Tuple[int, int], float]] = []
+    frames = 0
+    sockets = []
+    for _ in range(args.subscribers):
+        ws = await websockets.connect(f"ws://127.0.0.1:{port}/ws", max_queue=None)
+        await ws.send(json.dumps({"action": "subscribe", "polls": [workload.hot_poll]}))
+        sockets.append(ws)
+
+    async def listen(ws, record: bool):
+        nonlocal frames
+        seen = set()
+        try:
+            async for text in ws:
+                message = json.loads(text)
+                if message.get("type") != "vote":
+                    continue
+                frames += 1
+                key = (message["payload"]["option_id"], message["payload"]["votes_count"])
+                if record and key not in seen:
+                    seen.add(key)
+                    received.append((key, time.perf_counter()))
+        except websockets.ConnectionClosed:
+            pass
+
+    # every socket counts frames; a sample of them also records delivery times
+    listeners = [asyncio.create_task(listen(ws, i % 50 == 0)) for i, ws in enumerate(sockets)]
+    await asyncio.sleep(0.5)  # let subscriptions settle
+    result = await drive(port, workload, args.requests, args.concurrency, args.seed, sent_at=sent_at)
+    await asyncio.sleep(1.0)  # drain the last ticks
+    for ws in sockets:
+        await ws.close()
+    await asyncio.gather(*listeners, return_exceptions=True)
+
+    delivery = [(at - sent_at[key]) * 1000 for key, at in received if key in sent_at]
+    result.update({
+        "subscribers": args.subscribers,
+        "frames_received": frames,
+        "delivery_p50_ms": round(percentile(delivery, 50), 3) if delivery else None,
+        "delivery_p99_ms": round(percentile(delivery, 99), 3) if delivery else None,
+    })
+    return result
+
+
+async def run_scenario(scenario: str, args) -> dict:
+    server = Server(args, args.set)
+    try:
+        await server.wait_ready()
+        workload = Workload(scenario, args.users, args.polls)
+        if scenario == "ws_fanout":
+            result = await ws_fanout(server.port, workload, args)
+        else:
+            result = await drive(server.port, workload, args.requests, args.concurrency, args.seed)
+        result["server_peak_rss_mb"] = server.peak_rss_mb()
+    finally:
+        server.stop()
+    return {
+        "scenario": scenario,
+        "concurrency": args.concurrency,
+        "seeded": {"users": args.users, "polls": args.polls, "votes": args.votes},
+        "settings": args.set,
+        **result,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--polls", type=int, default=5000)
+    parser.add_argument("--votes", type=int, default=50000, help="vote rows seeded before the run")
+    parser.add_argument("--requests", type=int, default=5000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32, help="keep-alive client connections")
+    parser.add_argument("--subscribers", type=int, default=1000, help="WebSocket clients in ws_fanout")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="override a setting in app/core/config.py for the server (repeatable)")
+    parser.add_argument("--server-log", help="append the server's output (e.g. slow request logs) to this file")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.users, args.polls, args.votes, args.set)
+        return
+    scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+    for scenario in scenarios:
+        print(json.dumps(asyncio.run(run_scenario(scenario, args))), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# benchmarks/poll_cache.py
+"""
+Read latency of get_poll / list_polls with and without the poll snapshot cache,
+under a 50:1 read/write mix.
+
+Usage:
+    python -m benchmarks.poll_cache --polls 20000 --reads 20000
+"""
+import argparse
+import json
+import random
+import time
+
+from app.core.poll_cache import PollCache
+from app.services.poll_service import PollService
+from benchmarks.common import latency_summary, seed, temp_database
+
+
+def run(cache, polls: int, reads: int, hot: int) -> dict:
+    engine, Session = temp_database()
+    emails, poll_ids = seed(Session, users=200, polls=polls)
+    rng = random.Random(11)
+    hot_ids = poll_ids[-hot:]  # recent polls get the traffic
+
+    get_ms, list_ms = [], []
+    for i in range(reads):
+        db = Session()
+        try:
+            service = PollService(db, cache=cache)
+            if i % 50 == 0:
+                poll_id = rng.choice(hot_ids)
+                service.toggle_like(poll_id, rng.choice(emails))
+            start = time.perf_counter()
+            if i % 10 == 0:
+                service.list_polls(limit=20)
+                list_ms.append((time.perf_counter() - start) * 1000)
+            else:
+                service.get_poll(rng.choice(hot_ids))
+                get_ms.append((time.perf_counter() - start) * 1000)
+        finally:
+            db.close()
+    engine.dispose()
+
+    result = {
+        "mode": "cached" if cache is not None else "uncached",
+        "get_poll": latency_summary(get_ms),
+        "list_polls": latency_summary(list_ms),
+    }
+    if cache is not None:
+        result["cache"] = cache.stats()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--polls", type=int, default=20000)
+    parser.add_argument("--reads", type=int, default=20000)
+    parser.add_argument("--hot", type=int, default=500, help="number of recent polls receiving reads")
+    args = parser.parse_args()
+
+    print(json.dumps(run(None, args.polls, args.reads, args.hot)))
+    print(json.dumps(run(PollCache(max_entries=args.hot * 2, ttl_s=300), args.polls, args.reads, args.hot)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# benchmarks/search.py
+"""
+Poll search latency over the FTS5 table and the in-memory inverted index, for a rare
+word, a common word, two words and prefixes, plus index build time and size.
+
+Usage:
+    python -m benchmarks.search --polls 1000000 --queries 200
+"""
+import argparse
+import itertools
+import json
+import random
+import time
+
+from sqlalchemy import insert
+
+from app.core.migrations import run_migrations
+from app.core.search import InvertedIndex, fts_available
+from app.models.poll import Option, Poll
+from app.repositories.poll_repository import PollRepository
+from benchmarks.common import latency_summary, temp_database
+
+# Zipf-distributed words: word0 is in most polls, the tail words in a few hundred per million
+VOCABULARY = [f"word{i}" for i in range(5000)]
+CUMULATIVE_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(VOCABULARY))))
+QUERIES = {
+    "rare": ["word4321"],
+    "common": ["word0"],
+    "two_words": ["word2", "word17"],
+    "prefix": ["word12"],  # searched as a prefix: word12, word120..word129, word1200..
+    "short_prefix": ["wo"],  # every word
+}
+
+
+def text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choices(VOCABULARY, cum_weights=CUMULATIVE_WEIGHTS, k=words))
+
+
+def seed_documents(Session, polls: int, options_per_poll: int = 4, batch: int = 50000):
+    rng = random.Random(5)
+    db = Session()
+    try:
+        for start in range(0, polls, batch):
+            ids = range(start + 1, min(polls, start + batch) + 1)
+            db.execute(insert(Poll), [
+                {"id": i, "question": text(rng, 8), "created_by": "bench@bench.io", "likes_count": 0} for i in ids
+            ])
+            db.execute(insert(Option), [
+                {"poll_id": i, "text": text(rng, 2), "votes_count": 0} for i in ids for _ in range(options_per_poll)
+            ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def time_queries(search, queries: int) -> dict:
+    result = {}
+    for name, terms in QUERIES.items():
+        samples = []
+        for _ in range(queries):
+            start = time.perf_counter()
+            hits = search(terms)
+            samples.append((time.perf_counter() - start) * 1000)
+        result[name] = {"hits": len(hits), **latency_summary(samples)}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--polls", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200, help="timed runs of each query")
+    parser.add_argument("--limit", type=int, default=20, help="results per page")
+    args = parser.parse_args()
+
+    engine, Session = temp_database()
+    seed_documents(Session, args.polls)
+
+    start = time.perf_counter()
+    run_migrations(engine)  # builds and backfills the FTS5 table
+    if fts_available(engine):
+        build_s = time.perf_counter() - start
+        db = Session()
+        try:
+            repo = PollRepository(db)
+            latencies = time_queries(lambda terms: repo.search_poll_ids(terms, offset=0, limit=args.limit), args.queries)
+        finally:
+            db.close()
+        print(json.dumps({"backend": "fts5", "polls": args.polls, "build_s": round(build_s, 2), **latencies}))
+
+    index = InvertedIndex()
+    db = Session()
+    try:
+        start = time.perf_counter()
+        index.load(PollRepository(db).iter_search_rows())
+        build_s = time.perf_counter() - start
+    finally:
+        db.close()
+    latencies = time_queries(lambda terms: index.search(terms, offset=0, limit=args.limit), args.queries)
+    print(json.dumps({"backend": "memory", "polls": args.polls, "build_s": round(build_s, 2), **index.stats(), **latencies}))
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
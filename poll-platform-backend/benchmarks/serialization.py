@@ -0,0 +1,88 @@
+# benchmarks/serialization.py
+"""
+Serialization cost of the poll read path and of broadcast frames.
+
+list_polls: the previous path (ORM objects with selectinload, PollOut/PollPage models,
+response_model re-validation, stdlib json) against snapshots built from row tuples
+and encoded directly. broadcast: encoding one vote event per socket with stdlib
+json against encoding it once with the fast encoder.
+
+Usage:
+    python -m benchmarks.serialization --polls 2000 --page 20 --iterations 500
+"""
+import argparse
+import json
+import time
+
+from pydantic import TypeAdapter
+from sqlalchemy.orm import selectinload
+
+from app.core.poll_cache import snapshot_from_poll, snapshots_from_rows
+from app.models.poll import Poll
+from app.repositories.poll_repository import PollRepository
+from app.schemas.poll_schema import PollOut, PollPage
+from app.utils.serialization import dumps, dumps_bytes, orjson
+from benchmarks.common import latency_summary, seed, temp_database
+
+
+def legacy_page(db, limit: int) -> bytes:
+    polls = db.query(Poll).options(selectinload(Poll.options)).order_by(Poll.id.desc()).limit(limit).all()
+    page = PollPage(items=[PollOut(**snapshot_from_poll(p)) for p in polls], next_cursor=None)
+    # what FastAPI does with a response_model: validate again, dump, then json.dumps
+    adapter = TypeAdapter(PollPage)
+    content = adapter.dump_python(adapter.validate_python(page), mode="json")
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def fast_page(db, limit: int) -> bytes:
+    rows = PollRepository(db).get_poll_rows_page(after_id=None, limit=limit)
+    return dumps_bytes({"items": snapshots_from_rows(*rows), "next_cursor": None})
+
+
+def time_calls(fn, iterations: int) -> list:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def bench_list_polls(polls: int, page: int, iterations: int):
+    engine, Session = temp_database()
+    seed(Session, users=100, polls=polls)
+    db = Session()
+    try:
+        for name, fn in (("legacy", legacy_page), ("fast", fast_page)):
+            fn(db, page)  # warm up
+            samples = time_calls(lambda: (fn(db, page), db.expunge_all()), iterations)
+            print(json.dumps({"bench": "list_polls", "mode": name, "page": page, **latency_summary(samples)}))
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def bench_broadcast(sockets: int, iterations: int):
+    event = {"type": "vote", "payload": {"poll_id": 12345, "option_id": 49381, "votes_count": 1702}}
+    per_socket = time_calls(lambda: [json.dumps(event) for _ in range(sockets)], iterations)
+    print(json.dumps({"bench": "broadcast_encode", "mode": "per_socket_json", "sockets": sockets, **latency_summary(per_socket)}))
+    for name, encode in (("once_json", json.dumps), ("once_fast", dumps)):
+        once = time_calls(lambda: encode(event), iterations * 10)
+        print(json.dumps({"bench": "broadcast_encode", "mode": name, "encoder": "orjson" if orjson and encode is dumps else "json",
+                          "us_per_event": round(sum(once) / len(once) * 1000, 3)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--polls", type=int, default=2000)
+    parser.add_argument("--page", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--sockets", type=int, default=1000, help="recipients of one broadcast event")
+    args = parser.parse_args()
+    for page in sorted({args.page, 100}):
+        bench_list_polls(args.polls, page, args.iterations)
+    bench_broadcast(args.sockets, args.iterations // 5)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/storage_profile.py
+"""
+Mixed read/write throughput of the "default" vs "tuned" storage profiles:
+worker threads each running get_poll reads and vote/like writes against one
+SQLite file, as concurrent requests would.
+
+Usage:
+    python -m benchmarks.storage_profile --threads 8 --seconds 5 --write-ratio 0.2
+"""
+import argparse
+import json
+import random
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from app.services.poll_service import PollService
+from benchmarks.common import latency_summary, seed, temp_database
+
+
+def run(profile: str, threads: int, seconds: float, write_ratio: float) -> dict:
+    engine, Session = temp_database(profile=profile)
+    emails, poll_ids = seed(Session, users=2000, polls=2000)
+    hot_ids = poll_ids[-100:]
+    deadline = time.perf_counter() + seconds
+    lock = threading.Lock()
+    totals = {"reads": 0, "writes": 0, "errors": 0}
+    samples = []
+
+    def worker(n: int):
+        rng = random.Random(n)
+        reads = writes = errors = 0
+        local_ms = []
+        while time.perf_counter() < deadline:
+            db = Session()
+            start = time.perf_counter()
+            try:
+                service = PollService(db, cache=None)
+                poll_id = rng.choice(hot_ids)
+                if rng.random() < write_ratio:
+                    if rng.random() < 0.5:
+                        result = service.toggle_like(poll_id, rng.choice(emails))
+                    else:
+                        option_id = (poll_id - 1) * 4 + rng.randrange(4) + 1
+                        result = service.vote(poll_id, option_id, rng.choice(emails))
+                    if isinstance(result, dict) and result.get("error", "").startswith(("Database", "Something")):
+                        errors += 1
+                    else:
+                        writes += 1
+                else:
+                    service.get_poll(poll_id)
+                    reads += 1
+            except OperationalError:
+                errors += 1
+            finally:
+                db.close()
+            local_ms.append((time.perf_counter() - start) * 1000)
+        with lock:
+            totals["reads"] += reads
+            totals["writes"] += writes
+            totals["errors"] += errors
+            samples.extend(local_ms)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    engine.dispose()
+
+    ops = totals["reads"] + totals["writes"]
+    return {
+        "profile": profile,
+        "ops_per_sec": round(ops / seconds, 1),
+        **totals,
+        **latency_summary(samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    for profile in ("default", "tuned"):
+        print(json.dumps(run(profile, args.threads, args.seconds, args.write_ratio)))
+
+
+if __name__ == "__main__":
+    main()
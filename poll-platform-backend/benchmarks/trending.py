@@ -0,0 +1,68 @@
+# benchmarks/trending.py
+"""
+Cost of a "hot polls" read: sorting every poll by votes + likes in SQL on each request
+vs. reading the incrementally maintained trending board, plus the board's cost per event.
+
+Usage:
+    python -m benchmarks.trending --polls 100000 --events 200000
+"""
+import argparse
+import json
+import random
+import time
+
+from sqlalchemy import func, select
+
+from app.core.trending import TrendingBoard
+from app.models.poll import Option, Poll
+from benchmarks.common import latency_summary, seed, temp_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--polls", type=int, default=100_000)
+    parser.add_argument("--events", type=int, default=200_000, help="votes/likes fed to the board")
+    parser.add_argument("--reads", type=int, default=50)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    engine, Session = temp_database()
+    seed(Session, users=100, polls=args.polls)
+    activity = (func.sum(Option.votes_count) + Poll.likes_count).label("activity")
+    totals = (
+        select(Poll.id, activity)
+        .join(Option, Option.poll_id == Poll.id)
+        .group_by(Poll.id)
+        .order_by(activity.desc())
+        .limit(args.top)
+    )
+    samples = []
+    with engine.connect() as conn:
+        for _ in range(args.reads):
+            start = time.perf_counter()
+            conn.execute(totals).all()
+            samples.append((time.perf_counter() - start) * 1000)
+    engine.dispose()
+    print(json.dumps({"mode": "sort_all_polls", "polls": args.polls, **latency_summary(samples)}))
+
+    board = TrendingBoard()
+    rng = random.Random(3)
+    # a few polls draw most of the activity
+    poll_ids = [min(int(rng.paretovariate(1.0)), args.polls) for _ in range(args.events)]
+    start = time.perf_counter()
+    for poll_id in poll_ids:
+        board.record(poll_id, board.vote_weight)
+    record_us = (time.perf_counter() - start) / args.events * 1e6
+    samples = []
+    for _ in range(args.reads):
+        start = time.perf_counter()
+        board.ranking(args.top)
+        samples.append((time.perf_counter() - start) * 1000)
+    print(json.dumps({
+        "mode": "trending_board", "events": args.events, "record_us": round(record_us, 3),
+        **board.stats(), **latency_summary(samples),
+    }))
+
+
+if __name__ == "__main__":
+    main()
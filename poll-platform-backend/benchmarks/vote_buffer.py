@@ -0,0 +1,86 @@
+# benchmarks/vote_buffer.py
+"""
+Votes/sec of the per-request commit path vs. the buffered tally mode.
+
+Usage:
+    python -m benchmarks.vote_buffer --votes 5000 --voters 2000
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from sqlalchemy import func
+
+from app.core.vote_buffer import vote_buffer
+from app.models.poll import Option, Vote
+from app.services.poll_service import PollService
+from benchmarks.common import seed, temp_database
+
+
+def make_database(voters: int):
+    engine, Session = temp_database()
+    seed(Session, users=voters, polls=1, random_counts=False)
+    db = Session()
+    option_ids = [o.id for o in db.query(Option).filter(Option.poll_id == 1)]
+    db.close()
+    return engine, Session, 1, option_ids
+
+
+def vote_plan(votes: int, voters: int, option_ids, seed: int = 7):
+    rng = random.Random(seed)
+    return [(f"user{rng.randrange(voters)}@bench.io", rng.choice(option_ids)) for _ in range(votes)]
+
+
+async def run(votes: int, voters: int, buffered: bool, flush_ms: int, max_votes: int) -> dict:
+    engine, Session, poll_id, option_ids = make_database(voters)
+    plan = vote_plan(votes, voters, option_ids)
+
+    if buffered:
+        vote_buffer.session_factory = Session
+        vote_buffer.flush_ms = flush_ms
+        vote_buffer.max_votes = max_votes
+        vote_buffer.start()
+
+    start = time.perf_counter()
+    for voter, option_id in plan:
+        db = Session()  # one session per simulated request, like get_db
+        try:
+            PollService(db).vote(poll_id=poll_id, option_id=option_id, voter=voter)
+        finally:
+            db.close()
+        await asyncio.sleep(0)  # let the flush task run as it would between requests
+    if buffered:
+        await vote_buffer.stop()
+    elapsed = time.perf_counter() - start
+
+    db = Session()
+    counted = db.query(func.coalesce(func.sum(Option.votes_count), 0)).scalar()
+    stored = db.query(func.count(Vote.id)).scalar()
+    db.close()
+    engine.dispose()
+    return {
+        "mode": "buffered" if buffered else "per_request_commit",
+        "votes": votes,
+        "seconds": round(elapsed, 3),
+        "votes_per_sec": round(votes / elapsed, 1),
+        "counters_match_votes": counted == stored,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--votes", type=int, default=5000)
+    parser.add_argument("--voters", type=int, default=2000)
+    parser.add_argument("--flush-ms", type=int, default=250)
+    parser.add_argument("--max-votes", type=int, default=500)
+    args = parser.parse_args()
+
+    for buffered in (False, True):
+        result = asyncio.run(run(args.votes, args.voters, buffered, args.flush_ms, args.max_votes))
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# benchmarks/ws_broadcast.py
+"""
+Handler-side cost and delivery of a vote burst to many WebSocket clients,
+some of them deliberately slow: legacy sequential broadcast vs. the
+coalescing, queue-per-connection pipeline in WebSocketManager.
+
+Usage:
+    python -m benchmarks.ws_broadcast --clients 5000 --slow-ratio 0.02
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+from app.core.websocket_manager import WebSocketManager
+
+
+class FakeWebSocket:
+    def __init__(self, ident: int, delay: float):
+        self.client = ("bench", ident)
+        self.delay = delay
+        self.frames = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.frames += 1
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+
+
+def make_clients(count: int, slow_ratio: float, slow_delay: float):
+    rng = random.Random(3)
+    return [FakeWebSocket(i, slow_delay if rng.random() < slow_ratio else 0.0) for i in range(count)]
+
+
+def vote_events(count: int, options: int = 4):
+    rng = random.Random(5)
+    counts = [0] * options
+    events = []
+    for _ in range(count):
+        idx = rng.randrange(options)
+        counts[idx] += 1
+        events.append({"type": "vote", "payload": {"poll_id": 1, "option_id": idx + 1, "votes_count": counts[idx]}})
+    return events
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def legacy(clients, events) -> dict:
+    """The original broadcast: encode per call, await every socket in turn."""
+    handler_ms = []
+    for message in events:
+        start = time.perf_counter()
+        text = json.dumps(message)
+        for ws in clients:
+            await ws.send_text(text)
+        handler_ms.append((time.perf_counter() - start) * 1000)
+    return {
+        "mode": "legacy_sequential",
+        "events": len(events),
+        "handler_p50_ms": round(statistics.median(handler_ms), 3),
+        "handler_p99_ms": round(percentile(handler_ms, 99), 3),
+        "frames_sent": sum(ws.frames for ws in clients),
+    }
+
+
+async def pipeline(clients, events, tick_ms: int, queue_size: int, policy: str) -> dict:
+    manager = WebSocketManager(queue_size=queue_size, tick_ms=tick_ms, slow_consumer_policy=policy)
+    for ws in clients:
+        await manager.connect(ws)
+
+    handler_ms = []
+    start_burst = time.perf_counter()
+    for message in events:
+        start = time.perf_counter()
+        manager.publish(message)
+        handler_ms.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.001)  # requests arrive ~1ms apart
+
+    fast = [ws for ws in clients if not ws.delay]
+    # wait until every fast client has drained its queue
+    while any(manager.active_connections[ws].queue.qsize() for ws in fast if ws in manager.active_connections):
+        await asyncio.sleep(0.005)
+    await asyncio.sleep(tick_ms / 1000 * 2)
+    delivered_s = time.perf_counter() - start_burst
+    await manager.stop()
+
+    return {
+        "mode": "pipeline",
+        "events": len(events),
+        "handler_p50_ms": round(statistics.median(handler_ms), 4),
+        "handler_p99_ms": round(percentile(handler_ms, 99), 4),
+        "fast_clients_delivered_s": round(delivered_s, 3),
+        "frames_sent": sum(ws.frames for ws in clients),
+        "frames_without_coalescing": len(events) * len(clients),
+        "slow_consumer_events": manager.slow_consumers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--slow-ratio", type=float, default=0.02)
+    parser.add_argument("--slow-delay-ms", type=float, default=20.0)
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--legacy-events", type=int, default=5, help="legacy mode is slow; sample fewer events")
+    parser.add_argument("--tick-ms", type=int, default=50)
+    parser.add_argument("--queue-size", type=int, default=32)
+    parser.add_argument("--policy", choices=["resync", "drop"], default="resync")
+    args = parser.parse_args()
+
+    slow_delay = args.slow_delay_ms / 1000
+    clients = make_clients(args.clients, args.slow_ratio, slow_delay)
+    print(json.dumps(asyncio.run(legacy(clients, vote_events(args.legacy_events)))))
+
+    clients = make_clients(args.clients, args.slow_ratio, slow_delay)
+    result = asyncio.run(pipeline(clients, vote_events(args.events), args.tick_ms, args.queue_size, args.policy))
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
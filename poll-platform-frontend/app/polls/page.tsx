@@ -2,7 +2,7 @@
 
 "use client";
 
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { usePolls } from "../../src/hooks/usePolls";
 import { useToast } from "../../src/components/Toast";
 import { votePoll, toggleLike } from "../../src/services/api";
@@ -21,10 +21,22 @@ const useUserIdentifier = () => {
 // ---------------------------------
 
 export default function PollsPage() {
-    const { polls, loading, error } = usePolls();
+    const { polls, loading, error, hasMore, loadingMore, loadMore } = usePolls();
     const { showToast } = useToast();
     const userIdentifier = useUserIdentifier();
     const [selectedVotes, setSelectedVotes] = useState<Map<number, number>>(new Map());
+    const loadMoreRef = useRef<HTMLDivElement | null>(null);
+
+    // fetch the next page when the bottom of the list scrolls into view
+    useEffect(() => {
+        const node = loadMoreRef.current;
+        if (!node || !hasMore) return;
+        const observer = new IntersectionObserver((entries) => {
+            if (entries.some((entry) => entry.isIntersecting)) loadMore();
+        }, { rootMargin: "200px" });
+        observer.observe(node);
+        return () => observer.disconnect();
+    }, [hasMore, loadMore, loading]);
 
     const handleOptionSelect = (pollId: number, optionId: number) => {
         setSelectedVotes((prev) => {
@@ -149,6 +161,18 @@ export default function PollsPage() {
                 );
             })}
 
+            {hasMore && (
+                <div ref={loadMoreRef} className="text-center my-4">
+                    <button
+                        onClick={() => loadMore()}
+                        disabled={loadingMore}
+                        className="px-4 py-2 rounded border text-sm text-gray-700 hover:bg-gray-100 transition"
+                    >
+                        {loadingMore ? "Loading..." : "Load more polls"}
+                    </button>
+                </div>
+            )}
+
             {polls.length === 0 && !loading && (
                 <p className="text-center text-gray-500">No polls available yet.</p>
             )}
@@ -10,6 +10,11 @@ function updatesReducer(state: PollUpdatesState, msg: PollUpdateMessage): PollUp
       return { ...state, latestVote: msg.payload };
     case "like":
       return { ...state, latestLike: msg.payload };
+    case "resync":
+    case "subscriptions":
+    case "resumed":
+    case "snapshot":
+      return state;
     default:
       console.warn("Unhandled WS message type:", msg.type);
       return state;
@@ -1,46 +1,97 @@
 // src/hooks/usePolls.ts
-import { useState, useEffect } from "react";
-import { fetchPolls } from "../services/api";
+import { useState, useEffect, useCallback, useRef } from "react";
+import { fetchPollsPage } from "../services/api";
+import { wsClient } from "../services/websocket";
 import { ListPollsResponse as PollOut } from "../types/interfaces";
 import { useWebSocketSingleton } from "./useWebSocketSingleton";
-import { PollUpdateMessage } from "../types/websocket";
+import { PollUpdateMessage, SnapshotMessage } from "../types/websocket";
+
+// polls per page; further pages are fetched on demand through loadMore
+const PAGE_SIZE = 20;
 
 interface UsePollsResult {
   polls: PollOut[];
   loading: boolean;
   error: string | null;
+  hasMore: boolean;
+  loadingMore: boolean;
+  loadMore: () => Promise<void>;
 }
 
 export const usePolls = (): UsePollsResult => {
   const [polls, setPolls] = useState<PollOut[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // the latest state for the callbacks below, without re-creating them on every update
+  const pollsRef = useRef<PollOut[]>([]);
+  const cursorRef = useRef<string | null>(null);
+  const loadingMoreRef = useRef(false);
+
+  useEffect(() => {
+    pollsRef.current = polls;
+  }, [polls]);
 
   const { onMessage } = useWebSocketSingleton(); // subscribe per-message
 
-  // --- Initial polls load ---
+  // --- First page load (initial, and again when the server asks us to resync) ---
+  const loadPolls = useCallback(async (isMounted: () => boolean = () => true) => {
+    setLoading(true);
+    setError(null);
+    try {
+      const page = await fetchPollsPage(null, PAGE_SIZE);
+      if (!isMounted()) return;
+      // backend already returns newest first
+      const ids = new Set(page.items.map((p) => p.id));
+      const dropped = pollsRef.current.filter((p) => !ids.has(p.id)).map((p) => p.id);
+      if (dropped.length) wsClient.unsubscribe(dropped);
+      setPolls(page.items);
+      cursorRef.current = page.next_cursor;
+      setNextCursor(page.next_cursor);
+      // only receive live updates for the polls we show, plus newly created ones
+      wsClient.subscribe(page.items.map((p) => p.id), true);
+    } catch (err) {
+      console.error("Failed to fetch polls:", err);
+      if (isMounted()) setError("Could not load polls. Please try again.");
+    } finally {
+      if (isMounted()) setLoading(false);
+    }
+  }, []);
+
+  // --- Next page (load more / infinite scroll) ---
+  const loadMore = useCallback(async () => {
+    const cursor = cursorRef.current;
+    if (!cursor || loadingMoreRef.current) return;
+    loadingMoreRef.current = true;
+    setLoadingMore(true);
+    try {
+      const page = await fetchPollsPage(cursor, PAGE_SIZE);
+      // a resync may have reset the list while this page was in flight
+      if (cursorRef.current !== cursor) return;
+      const shown = new Set(pollsRef.current.map((p) => p.id));
+      const fresh = page.items.filter((p) => !shown.has(p.id));
+      setPolls((prev) => [...prev, ...fresh.filter((p) => !prev.some((q) => q.id === p.id))]);
+      cursorRef.current = page.next_cursor;
+      setNextCursor(page.next_cursor);
+      if (fresh.length) wsClient.subscribe(fresh.map((p) => p.id));
+    } catch (err) {
+      // keep what we have; the cursor is unchanged so the next attempt retries this page
+      console.error("Failed to fetch more polls:", err);
+    } finally {
+      loadingMoreRef.current = false;
+      setLoadingMore(false);
+    }
+  }, []);
+
   useEffect(() => {
     let mounted = true;
-    (async () => {
-      setLoading(true);
-      setError(null);
-      try {
-        const data = await fetchPolls();
-        if (!mounted) return;
-        // keep original ordering you want (you had reverse before)
-        setPolls(data.reverse());
-      } catch (err) {
-        console.error("Failed to fetch polls:", err);
-        if (mounted) setError("Could not load polls. Please try again.");
-      } finally {
-        if (mounted) setLoading(false);
-      }
-    })();
+    loadPolls(() => mounted);
 
     return () => {
       mounted = false;
     };
-  }, []);
+  }, [loadPolls]);
 
   // --- Real-time per-message updates (most robust) ---
   useEffect(() => {
@@ -50,11 +101,38 @@ export const usePolls = (): UsePollsResult => {
       // debug: uncomment for trace
       // console.debug("WS msg processing in usePolls:", rawMsg);
 
+      // our socket fell behind and the server dropped its backlog: refetch current state
+      if (rawMsg.type === "resync") {
+        loadPolls();
+        return;
+      }
+      // subscription and resume acknowledgements carry no poll data
+      if (rawMsg.type === "subscriptions" || rawMsg.type === "resumed") return;
+
       setPolls((prevPolls) => {
         // Work on a shallow copy of the array
         const updatedPolls = prevPolls.map(p => ({ ...p, options: p.options.map(o => ({ ...o })) }));
 
         switch (rawMsg.type) {
+          case "snapshot": {
+            // we missed too much while disconnected: take the current counts as-is
+            const { polls: counts, new_polls } = rawMsg as SnapshotMessage;
+            const byId = new Map(counts.map((c) => [c.id, c]));
+            const patched = updatedPolls.map((p) => {
+              const c = byId.get(p.id);
+              if (!c) return p;
+              const votes = new Map(c.options.map((o) => [o.id, o.votes_count]));
+              return {
+                ...p,
+                likes_count: c.likes_count,
+                options: p.options.map((o) => ({ ...o, votes_count: votes.get(o.id) ?? o.votes_count })),
+              };
+            });
+            const fresh = new_polls.filter((np) => !patched.some((p) => p.id === np.id));
+            if (fresh.length) wsClient.subscribe(fresh.map((np) => np.id));
+            return [...fresh.map((np) => ({ ...np, options: np.options.map((o) => ({ ...o })) })), ...patched];
+          }
+
           case "poll_created": {
             const newPoll = rawMsg.payload;
             // avoid duplicates
@@ -67,6 +145,7 @@ export const usePolls = (): UsePollsResult => {
                 likes_count: newPoll.likes_count ?? 0,
                 created_by: newPoll.created_by,
               };
+              wsClient.subscribe([newPoll.id]);
               return [newPollOut, ...updatedPolls];
             }
             return updatedPolls;
@@ -115,7 +194,7 @@ export const usePolls = (): UsePollsResult => {
     return () => {
       if (typeof unsubscribe === "function") unsubscribe();
     };
-  }, [onMessage]);
+  }, [onMessage, loadPolls]);
 
-  return { polls, loading, error };
+  return { polls, loading, error, hasMore: nextCursor !== null, loadingMore, loadMore };
 };
@@ -1,6 +1,6 @@
 // src/services/api.ts
 import axios from "axios";
-import {  CreateUserResponse, ListPollsResponse } from "../types/interfaces";
+import {  CreateUserResponse, ListPollsResponse, PollPageResponse } from "../types/interfaces";
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
 
@@ -11,11 +11,27 @@ export const api = axios.create({
   },
 });
 
-// Fetch all polls
-export const fetchPolls = async (): Promise<ListPollsResponse[]> => {
+// Fetch one page of polls (newest first)
+export const fetchPollsPage = async (cursor?: string | null, limit = 20): Promise<PollPageResponse> => {
   // Your backend endpoint is '/list_polls' under the '/polls' prefix.
-  const res = await api.get<ListPollsResponse[]>("/polls/list_polls");
-  return res.data; // The response data should be an array of PollOut
+  const res = await api.get<PollPageResponse>("/polls/list_polls", {
+    params: { limit, ...(cursor ? { after_id: cursor } : {}) },
+  });
+  return res.data;
+};
+
+// Search polls by question and option text (best match first); the last word matches as a prefix
+export const searchPolls = async (q: string, cursor?: string | null, limit = 20): Promise<PollPageResponse> => {
+  const res = await api.get<PollPageResponse>("/polls/search", {
+    params: { q, limit, ...(cursor ? { cursor } : {}) },
+  });
+  return res.data;
+};
+
+// Most active polls right now (time-decayed votes and likes), best first
+export const fetchTrendingPolls = async (limit = 20): Promise<ListPollsResponse[]> => {
+  const res = await api.get<{ items: ListPollsResponse[] }>("/polls/trending", { params: { limit } });
+  return res.data.items;
 };
 
 // Create a new poll
@@ -4,10 +4,25 @@ type MessageHandler = (data: any) => void;
 
 // Uses environment variable or defaults to common FastAPI/Uvicorn WebSocket URL
 const WS_URL = process.env.NEXT_PUBLIC_WS_URL || "ws://localhost:8000/ws";
+// the server accepts at most WS_MAX_POLLS_PER_MESSAGE poll ids per subscribe/resume message
+const MAX_POLLS_PER_MESSAGE = 1000;
+
+function chunk(ids: number[]): number[][] {
+  const batches: number[][] = [];
+  for (let i = 0; i < ids.length; i += MAX_POLLS_PER_MESSAGE) {
+    batches.push(ids.slice(i, i + MAX_POLLS_PER_MESSAGE));
+  }
+  return batches;
+}
 
 export class WSClient {
   private ws: WebSocket | null = null;
   private handlers: MessageHandler[] = [];
+  private subscribedPolls = new Set<number>();
+  private newPolls = false;
+  // position in the server's event sequence, used to resume after a reconnect
+  private epoch: string | null = null;
+  private lastSeq = 0;
 
   /**
    * Attempts to establish a WebSocket connection.
@@ -26,12 +41,34 @@ export class WSClient {
 
     this.ws.onopen = () => {
       console.log("✅ WebSocket connected");
+      // subscriptions live on the server connection, so restore them after every (re)connect;
+      // resuming also gets us the events we missed (or a snapshot) instead of a full reload
+      if (this.epoch !== null) {
+        this.resume();
+      } else if (this.subscribedPolls.size || this.newPolls) {
+        this.sendSubscribe([...this.subscribedPolls], this.newPolls);
+      }
     };
 
     this.ws.onmessage = (event) => {
       try {
         // All messages are expected to be JSON strings
         const data = JSON.parse(event.data);
+        // answer server heartbeats; a connection that never does is closed as idle
+        if (data.type === "ping") {
+          this.send({ action: "pong" });
+          return;
+        }
+        if (typeof data.epoch === "string") this.epoch = data.epoch;
+        if (typeof data.seq === "number") {
+          // a subscription ack may trail frames we have already seen
+          this.lastSeq = data.type === "subscriptions" ? Math.max(this.lastSeq, data.seq) : data.seq;
+        }
+        // we fell behind and the server dropped our backlog: ask for what we missed
+        if (data.type === "resync" && this.epoch !== null) {
+          this.resume();
+          return;
+        }
         console.log("📩 WebSocket message received:", data);
         // Broadcast the parsed data to all registered handlers
         this.handlers.forEach((handler) => handler(data));
@@ -40,11 +77,12 @@ export class WSClient {
       }
     };
 
-    this.ws.onclose = () => {
-      console.log("⚠️ WebSocket disconnected, retrying in 3s...");
+    this.ws.onclose = (event) => {
+      // 1013: the server is at its connection limit, so back off for longer
+      const delay = event.code === 1013 ? 15000 : 3000;
+      console.log(`⚠️ WebSocket disconnected, retrying in ${delay / 1000}s...`);
       this.ws = null;
-      // Implement simple exponential backoff/reconnect
-      setTimeout(() => this.connect(), 3000); 
+      setTimeout(() => this.connect(), delay);
     };
 
     this.ws.onerror = (err) => {
@@ -79,6 +117,51 @@ export class WSClient {
     this.handlers = this.handlers.filter((h) => h !== handler);
   }
   
+  /**
+   * Subscribes to updates for the given polls (and optionally the new-polls feed).
+   * Once subscribed, the server only sends events for these topics.
+   */
+  subscribe(pollIds: number[], newPolls: boolean = this.newPolls) {
+    pollIds.forEach((id) => this.subscribedPolls.add(id));
+    this.newPolls = newPolls;
+    if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+      this.sendSubscribe(pollIds, newPolls);
+    }
+  }
+
+  /**
+   * Stops receiving updates for the given polls.
+   */
+  unsubscribe(pollIds: number[]) {
+    pollIds.forEach((id) => this.subscribedPolls.delete(id));
+    if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+      chunk(pollIds).forEach((polls) => this.send({ action: "unsubscribe", polls }));
+    }
+  }
+
+  /**
+   * Restores subscriptions and asks for every event after the last one seen.
+   */
+  private resume() {
+    // every batch but the last only subscribes; the last one replays what we missed on all of them
+    const batches = chunk([...this.subscribedPolls]);
+    const last = batches.pop() ?? [];
+    batches.forEach((polls) => this.send({ action: "resume", polls, more: true }));
+    this.send({
+      action: "resume",
+      epoch: this.epoch,
+      seq: this.lastSeq,
+      polls: last,
+      new_polls: this.newPolls,
+    });
+  }
+
+  private sendSubscribe(pollIds: number[], newPolls: boolean) {
+    const batches = chunk(pollIds);
+    if (!batches.length) batches.push([]);
+    batches.forEach((polls, i) => this.send({ action: "subscribe", polls, new_polls: newPolls && i === 0 }));
+  }
+
   /**
    * Sends JSON data through the WebSocket connection.
    * @param data The object to send (will be stringified).
@@ -21,4 +21,9 @@ export interface ListPollsResponse {
   created_by: string;
   options: PollOption[];
   likes_count: number;
-}
\ No newline at end of file
+}
+
+export interface PollPageResponse {
+  items: ListPollsResponse[];
+  next_cursor: string | null;
+}
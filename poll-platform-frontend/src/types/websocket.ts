@@ -29,11 +29,28 @@ export interface LikePayload {
   likes_count: number;
 }
 
+// Current counts of a poll, sent in a resume snapshot
+export interface PollCounts {
+  id: number;
+  likes_count: number;
+  options: { id: number; votes_count: number }[];
+}
+
+// Sent instead of the missed events when the server no longer has them
+export interface SnapshotMessage {
+  type: "snapshot";
+  epoch: string;
+  seq: number;
+  polls: PollCounts[];
+  new_polls: PollCreatedPayload[];
+}
+
 // Union type for all possible message structures received via WebSocket
 export type PollUpdateMessage =
   | { type: "poll_created"; payload: PollCreatedPayload }
   | { type: "vote"; payload: VotePayload }
   | { type: "like"; payload: LikePayload }
+  | SnapshotMessage
   | { type: string; payload: any }; // Fallback for unhandled types
 
 // The structure of the state returned by the usePollUpdates hook